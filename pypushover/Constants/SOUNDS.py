@@ -36,8 +36,12 @@ class CurrentSounds(object):
     """
     Dynamic class for selecting sounds directly queried from the Pushover Api.
     """
-    def __init__(self, app_token):
-        res = send(_sounds_url, {'token': app_token})
+    def __init__(self, app_token, **send_options):
+        res = send(_sounds_url, {'token': app_token}, **send_options)
+
+        from pypushover.validation import add_sounds
+        add_sounds(*res['sounds'])
+
         for k, v in res['sounds'].items():
             p = v.replace('(', '').replace(')', '').replace(' ', '_')
             setattr(self, p, k)
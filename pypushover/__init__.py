@@ -1,10 +1,16 @@
 __version__ = "0.2.7"
 
 from pypushover.Constants import PRIORITIES, SOUNDS, OS
-from pypushover._base import BaseManager, send, base_url, PushoverError
-from pypushover import client, groups, license, message, verification
-
-
-__all__ = ['PRIORITIES', 'SOUNDS', 'OS', 'client', 'groups', 'license', 'message', 'verification']
+from pypushover._base import BaseManager, send, base_url, PushoverError, DeadlineExceededError, CircuitOpenError, \
+    BlockedRecipientError, ValidationError, Deadline, Form, Fragment, RequestEvent, RequestObserver, add_observer, \
+    remove_observer, endpoint_name
+from pypushover.response import PushoverResponse
+from pypushover import attachment, breaker, buffer, client, deadletter, digest, fanout, groups, license, message, \
+    metrics, registry, response, retry, transport, validation, verification
 
+# the tools (callback, cassette, cli, dispatcher, limiter, loadtest and scheduler) are imported explicitly, e.g.
+# `import pypushover.scheduler`, so that `import pypushover` does not load asyncio, http.server, sqlite3, ...
 
+__all__ = ['PRIORITIES', 'SOUNDS', 'OS', 'attachment', 'breaker', 'buffer', 'client', 'deadletter', 'digest', 'fanout',
+           'groups', 'license', 'message', 'metrics', 'registry', 'response', 'retry', 'transport', 'validation',
+           'verification']
@@ -0,0 +1,5 @@
+import sys
+
+from pypushover.cli import main
+
+sys.exit(main())
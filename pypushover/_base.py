@@ -1,37 +1,335 @@
+import logging
+import re
+import threading
+import time
 import requests
-try:
-    from json import JSONDecodeError as decode_error
-except ImportError as e:
-    decode_error = ValueError
+from timeit import default_timer
+
+from urllib.parse import urlencode
+
+from pypushover import breaker as _breaker, retry as _retry, transport as _transport
+from pypushover.attachment import Attachment, MultipartBody
+
+decode_error = ValueError  # json, orjson and ujson all raise subclasses of ValueError
 
 base_url = "https://api.pushover.net/1/"
+default_timeout = (3.05, 27)  # (connect, read) timeouts in seconds
+
+_FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+
+_observers = []
+_key_segment = re.compile(r'(?<=/)[A-Za-z0-9]{20,}(?=[/.])')
+_tag_segment = re.compile(r'(?<=/cancel_by_tag/)[^/]+(?=\.json)')
+
+
+_send_options = ('timeout', 'deadline', 'retry_policy', 'breakers', 'registry', 'transport')
 
 
 class BaseManager(object):
 
-    def __init__(self, app_token, user_key=None, group_key=None):
+    def __init__(self, app_token, user_key=None, group_key=None, **send_options):
         """
         Base class for the Pushover API
         :param string app_token: Application token generated from PushOver site
         :param string user_key: User key generated from PushOver site
         :param string group_key: Group key generated from PushOver site
+        :param send_options: default options passed to `send` for every call made by the manager (`timeout`,
+                             `retry_policy`, `breakers`, `registry`, `transport`)
         """
+        unknown = set(send_options) - set(_send_options)
+        if unknown:
+            raise TypeError('Unexpected arguments: {}'.format(', '.join(sorted(unknown))))
+
         self._app_token = app_token
         self._user_key = user_key
         self._group_key = group_key
-        self.latest_response_dict = None
+        self._send_options = dict((k, v) for k, v in send_options.items() if v is not None)
+        self._local = threading.local()
+
+    @property
+    def latest_response_dict(self):
+        """
+        The latest response received by the calling thread.  Each thread sharing a manager sees its own responses, so
+        that a manager can be used by many threads at once.
+        """
+        return getattr(self._local, 'response', None)
+
+    @latest_response_dict.setter
+    def latest_response_dict(self, response):
+        self._local.response = response
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _options(self, send_options):
+        """
+        Merges the options given for a single call with the managers default options.  Options of the call take
+        precedence.
+        """
+        merged = dict(self._send_options)
+        merged.update(send_options)
+        return merged
 
 
 class PushoverError(Exception):
-    def __init__(self, message, errors=None):
+    def __init__(self, message, errors=None, response=None):
+        super(PushoverError, self).__init__(message, errors)
         self.message = message
         self.errors = errors
+        self.response = response  # the error response of the Pushover servers, if any
 
     def __str__(self):
         return repr(self.message)
 
 
-def send(url, data_out=None, get_method=False):
+class DeadlineExceededError(PushoverError):
+    """
+    Raised when a call could not complete before its deadline.
+    """
+
+
+class ValidationError(PushoverError, ValueError):
+    """
+    Raised when a request fails the local checks of `pypushover.validation`, before it is sent.
+    """
+
+
+class CircuitOpenError(PushoverError):
+    """
+    Raised when a call is refused because the circuit breaker of its app token is open.
+    """
+
+
+class BlockedRecipientError(PushoverError):
+    """
+    Raised when a message is not sent because its recipient is in the blocklist of the registry (see
+    `pypushover.deadletter`).
+    """
+
+
+class Fragment(object):
+    """
+    Fields URL encoded once, when the fragment is created, and reused as is by the payload of every request starting
+    with them (see `Form`).  Tokens and the fields of message templates make good fragments:
+
+        >>> alert = Fragment(token='<app token>', title='Alert', sound='siren')
+        >>> send(url, data_out=Form(alert, user='<user key>', message='Disk full'))
+    """
+    __slots__ = ('fields', 'encoded')
+
+    def __init__(self, **fields):
+        self.fields = fields
+        self.encoded = urlencode(fields, doseq=True).encode('utf-8')
+
+    def __repr__(self):
+        return '<Fragment {}>'.format(', '.join(sorted(self.fields)))
+
+
+class Form(dict):
+    """
+    The payload of a request made of the fields of a `Fragment` and other fields.  Only the other fields are encoded
+    when the request is sent.
+    """
+    __slots__ = ('fragment', )
+
+    def __init__(self, fragment, **fields):
+        """
+        :param Fragment fragment: the pre-encoded fields
+        :param fields: the other fields
+        """
+        super(Form, self).__init__(fragment.fields, **fields)
+        self.fragment = fragment
+
+
+def encode_form(data_out):
+    """
+    Encodes the payload of a POST request as a `application/x-www-form-urlencoded` body, reusing the encoded fragment of
+    a `Form`.
+
+    :param dict data_out: the fields of the request
+    :return bytes:
+    """
+    fragment = getattr(data_out, 'fragment', None)
+    if fragment is None:
+        return urlencode(data_out, doseq=True).encode('utf-8')
+
+    fixed = fragment.fields
+    if any(data_out.get(k, fixed) != v for k, v in fixed.items()):
+        return urlencode(data_out, doseq=True).encode('utf-8')  # some fields of the fragment were changed
+    rest = [(k, v) for k, v in data_out.items() if k not in fixed]
+    return fragment.encoded + b'&' + urlencode(rest, doseq=True).encode('utf-8') if rest else fragment.encoded
+
+
+class Deadline(object):
+    """
+    End-to-end time budget for one or more calls.  The budget covers everything done on behalf of the call: connecting,
+    waiting on the response, retries and rate limit waits.  A single `Deadline` can be shared by several calls so they
+    complete within the same budget.
+
+    The transports cap each wait on the socket at the time left, and give up on a response still being read once the
+    deadline passes.
+    """
+    __slots__ = ('expires_at', )
+
+    def __init__(self, seconds):
+        """
+        :param float seconds: the number of seconds from now the budget expires
+        """
+        self.expires_at = default_timer() + seconds
+
+    def remaining(self):
+        """
+        :return float: the seconds left before the deadline (negative once it has passed)
+        """
+        return self.expires_at - default_timer()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    @classmethod
+    def coerce(cls, deadline):
+        """
+        Returns `deadline` as a `Deadline`.  Numbers are taken as a budget in seconds starting now.
+
+        :param deadline: a `Deadline`, a number of seconds or None
+        :return Deadline: the deadline, or None if no deadline was given
+        """
+        if deadline is None or isinstance(deadline, cls):
+            return deadline
+        return cls(deadline)
+
+
+def _pop_send_options(kwargs):
+    """
+    Removes the options meant for `send` from the keyword arguments of a call and returns them.
+    """
+    return dict((k, kwargs.pop(k)) for k in _send_options if k in kwargs)
+
+
+def _request_timeout(timeout, deadline):
+    """
+    Returns the (connect, read) timeouts of a single request, capped to the time left before the deadline.
+    """
+    if timeout is None:
+        timeout = default_timeout
+    if not isinstance(timeout, tuple):
+        timeout = (timeout, timeout)
+
+    if deadline is not None:
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise DeadlineExceededError('Deadline exceeded before the request was sent')
+        timeout = tuple(remaining if t is None else min(t, remaining) for t in timeout)
+
+    return timeout
+
+
+class RequestEvent(object):
+    """
+    Describes a single request made by `send`.  The same event is passed to `RequestObserver.before_request` and then,
+    once filled in with the results, to `RequestObserver.after_request`.  Each retry of a call is a new request with its
+    own event.  `error` is only set when no response was received (connection errors and timeouts); error responses
+    are described by their `status_code`.
+    """
+    __slots__ = (
+        'url', 'endpoint', 'method', 'attempt', 'status_code', 'duration', 'bytes_sent', 'bytes_received',
+        'app_limit', 'app_remaining', 'app_reset', 'error'
+    )
+
+    def __init__(self, url, method, attempt=1):
+        self.url = url
+        self.endpoint = endpoint_name(url)
+        self.method = method
+        self.attempt = attempt
+        self.status_code = None
+        self.duration = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.app_limit = None
+        self.app_remaining = None
+        self.app_reset = None
+        self.error = None
+
+
+class RequestObserver(object):
+    """
+    Base class for request observers.  Register an observer with `add_observer` to be notified before and after every
+    request made to the Pushover servers.
+    """
+    def before_request(self, event):
+        """
+        Called before the request is sent.
+
+        :param RequestEvent event: the request about to be sent
+        """
+
+    def after_request(self, event):
+        """
+        Called once the request has completed or failed.
+
+        :param RequestEvent event: the request with its status, duration, sizes and rate limit headers filled in
+        """
+
+    def circuit_state_changed(self, name, old_state, new_state):
+        """
+        Called when a circuit breaker changes state.
+
+        :param str name: the name of the circuit
+        :param str old_state: the previous state ('closed', 'open' or 'half_open')
+        :param str new_state: the new state
+        """
+
+
+def add_observer(observer):
+    """
+    Registers an observer to be notified before and after every request.
+
+    :param RequestObserver observer: the observer to add
+    """
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_observer(observer):
+    """
+    Unregisters an observer previously added with `add_observer`.
+
+    :param RequestObserver observer: the observer to remove
+    """
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def _notify_circuit_change(name, old_state, new_state):
+    if old_state == _breaker.OPEN:
+        logging.info('Circuit {} is {}'.format(name, new_state))
+    else:
+        logging.warning('Circuit {} is {}'.format(name, new_state))
+    for observer in list(_observers):
+        observer.circuit_state_changed(name, old_state, new_state)
+
+
+def endpoint_name(url):
+    """
+    Returns the endpoint of the url with any user, group, receipt or device keys replaced by `{key}` (and tags by
+    `{tag}`), so that calls to the same API share a single name.
+
+    :param str url: the full url of the request
+    :return str: the endpoint name
+    """
+    if url.startswith(base_url):
+        url = url[len(base_url):]
+    return _tag_segment.sub('{tag}', _key_segment.sub('{key}', '/' + url))[1:]
+
+
+def send(url, data_out=None, get_method=False, timeout=None, deadline=None, retry_policy=None, breakers=None,
+         registry=None, transport=None, files=None):
     """
     Sends a request to the selected url with the payload `data_out`.  Set `get_method` to True to send as a GET request.
     Default request is a POST.
@@ -39,28 +337,160 @@ def send(url, data_out=None, get_method=False):
     :param str url: url to send the request to
     :param dict data_out: payload data to send
     :param bool get_method: True = GET request; False = POST request (default)
-    :return dict: a dictionary with the json results of the request.
+    :param timeout: seconds to wait for the connection and for the response, either as a single number or a
+                    (connect, read) tuple.  Defaults to `default_timeout`.
+    :param deadline: a `Deadline` or a number of seconds capping the total time of the call, retries included
+    :param RetryPolicy retry_policy: the policy used to retry failed requests.  Defaults to `retry.default_policy`.
+    :param BreakerRegistry breakers: the circuit breakers guarding the request.  Defaults to
+                                     `breaker.default_registry` (no circuit breakers unless set).
+    :param AppRegistry registry: the registry whose transport, observers, rate limit accounting and blocklist are
+                                 used
+    :param Transport transport: the transport sending the request.  Defaults to the transport of the registry, or
+                                `transport.default_transport`.
+    :param dict files: attachments by field name.  When given, `data_out` and the attachments are streamed as a
+                       multipart POST body.  Otherwise `data_out` is sent as a form-encoded POST body (see `Form` to
+                       encode the fields shared by many requests once), or as the query string of a GET request.
+    :return PushoverResponse: the json results of the request, also usable as a dictionary.
     """
-    if get_method:
-        res = requests.get(url, params=data_out)
+    deadline = Deadline.coerce(deadline)
+    if retry_policy is None:
+        retry_policy = _retry.default_policy
+    if breakers is None:
+        breakers = _breaker.default_registry
+    method = 'GET' if get_method else 'POST'
+    token = data_out.get('token') if data_out else None
+    circuit = breakers.get(url, token) if breakers is not None else None
+    if registry is None:
+        observers = _observers
+        transport = transport or _transport.default_transport
+    else:
+        observers = registry.observers + _observers
+        transport = transport or registry.transport
+    if files:
+        body = MultipartBody(data_out, dict((k, Attachment.coerce(v)) for k, v in files.items()))
+    elif method == 'POST' and data_out:
+        # encoded once for every attempt, and kept out of the url (and the logs of proxies)
+        body = encode_form(data_out)
     else:
-        res = requests.post(url, params=data_out)
+        body = None
+
+    reserved = False
+    attempt = 1
+    try:
+        if registry is not None:
+            registry.check_recipient(url, method, data_out)
+            # a message drawn from the budget shared with other senders is given back if it is not sent
+            reserved = registry.reserve(token, url, method)
+        while True:
+            # checked before the circuit: a half-open circuit expects the outcome of every trial call it allows
+            request_timeout = _request_timeout(timeout, deadline)
+            if circuit is not None and not circuit.allow_request():
+                if reserved:
+                    # queued messages draw from the budget once flushed
+                    registry.release(token)
+                    reserved = False
+                if circuit.fallback is not None and method == 'POST':
+                    return circuit.fallback(url, data_out, files)
+                raise CircuitOpenError('Circuit {} is open'.format(circuit.name))
+
+            try:
+                if observers:
+                    res = _request_observed(transport, observers, url, data_out, body, method, request_timeout,
+                                            deadline, attempt)
+                else:
+                    res = _request(transport, url, data_out, body, method, request_timeout, deadline)
+            except Exception as e:
+                if circuit is not None:
+                    circuit.record(False)
+                if not isinstance(e, requests.RequestException):
+                    raise
+                delay = retry_policy.retry_delay(attempt, method, error=e)
+                if not _can_wait(delay, deadline):
+                    raise
+            else:
+                if circuit is not None:
+                    circuit.record(res.status_code < 500)
+                if registry is not None:
+                    registry.update_rate_limit(token, res.headers)
+                if res.status_code < 400:
+                    return _parse_response(res, url)
+                delay = retry_policy.retry_delay(attempt, method, status_code=res.status_code, headers=res.headers)
+                if not _can_wait(delay, deadline):
+                    return _parse_response(res, url)
+
+            logging.debug('Retrying {} {} in {:.2f}s (attempt {})'.format(method, endpoint_name(url), delay, attempt))
+            time.sleep(delay)
+            attempt += 1
+    except Exception as e:
+        if reserved:
+            registry.release(token)
+        if registry is not None:
+            registry.message_failed(url, method, data_out, e)
+        raise
+
+
+def _can_wait(delay, deadline):
+    """
+    Whether a retry can wait `delay` seconds and still have time left before the deadline.
+    """
+    return delay is not None and (deadline is None or deadline.remaining() > delay)
 
+
+def _request(transport, url, data_out, body, method, timeout, deadline):
     try:
-        ret_dict = res.json()
-        if ret_dict['status'] == 0:
-            raise PushoverError(ret_dict['errors'])
+        if body is not None:
+            if hasattr(body, 'rewind'):
+                body.rewind()
+            content_type = getattr(body, 'content_type', _FORM_CONTENT_TYPE)
+            return transport.request(method, url, body=body, headers={'Content-Type': content_type}, timeout=timeout,
+                                     deadline=deadline)
+        return transport.request(method, url, params=data_out, timeout=timeout, deadline=deadline)
+    except requests.Timeout as e:
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceededError('Deadline exceeded waiting on {}'.format(endpoint_name(url)), errors=[str(e)])
+        raise
+
 
-        if 'X-Limit-App-Limit' in res.headers:
-            ret_dict['app_limit'] = res.headers['X-Limit-App-Limit']
-        if 'X-Limit-App-Remaining' in res.headers:
-            ret_dict['app_remaining'] = res.headers['X-Limit-App-Remaining']
-        if 'X-Limit-App-Reset' in res.headers:
-            ret_dict['app_reset'] = res.headers['X-Limit-App-Reset']
+def _request_observed(transport, observers, url, data_out, body, method, timeout, deadline, attempt):
+    observers = list(observers)
+    event = RequestEvent(url, method, attempt)
+    for observer in observers:
+        observer.before_request(event)
 
-        return ret_dict
+    start = default_timer()
+    try:
+        res = _request(transport, url, data_out, body, method, timeout, deadline)
+        event.status_code = res.status_code
+        if body is not None:
+            event.bytes_sent = len(url) + len(body)
+        else:
+            event.bytes_sent = len(url) + (len(urlencode(data_out, doseq=True)) + 1 if data_out else 0)
+        event.bytes_received = len(res.content)
+        event.app_limit = res.headers.get('X-Limit-App-Limit')
+        event.app_remaining = res.headers.get('X-Limit-App-Remaining')
+        event.app_reset = res.headers.get('X-Limit-App-Reset')
+        return res
+    except Exception as e:
+        event.error = e
+        raise
+    finally:
+        event.duration = default_timer() - start
+        for observer in observers:
+            observer.after_request(event)
 
-    except decode_error as e:
-        res.raise_for_status()
 
+def _parse_response(response, url):
+    """
+    Successful responses are returned without decoding their body; error responses are decoded to raise their errors
+    as a `PushoverError`.
+    """
+    if response.status_code < 400:
+        return response
 
+    try:
+        status = response.status
+    except decode_error:
+        raise requests.HTTPError('{} Error for url: {}'.format(response.status_code, url))
+    if status == 0:
+        raise PushoverError(response.errors, response=response)
+    return response
@@ -0,0 +1,173 @@
+"""
+==================================================
+attachment - Image Attachments for Pushed Messages
+==================================================
+
+This module defines the attachments that can be sent along with a message.  Attachments are streamed from their source
+into the multipart body of the request in small chunks: a file is never read into memory as a whole, and its size is
+checked against Pushover's limit before anything is sent.
+
+Attachments can be read from a file path, an open file object, a memory-mapped file or bytes already in memory:
+
+    >>> import pypushover as pypo
+    >>> pypo.message.push_message('<app_token>', '<user key>', 'Front door', attachment='/tmp/door.jpg')
+    >>> with open('/tmp/door.jpg', 'rb') as f:
+    ...     pypo.message.push_message('<app_token>', '<user key>', 'Front door', attachment=f)
+    >>> attachment = pypo.attachment.Attachment(mmapped_file, filename='door.jpg', content_type='image/jpeg')
+    >>> pypo.message.push_message('<app_token>', '<user key>', 'Front door', attachment=attachment)
+"""
+
+__all__ = ('Attachment', 'MultipartBody', 'MAX_ATTACHMENT_SIZE')
+
+import mimetypes
+import mmap
+import os
+import uuid
+
+MAX_ATTACHMENT_SIZE = 5242880  # 5 MB
+
+_CHUNK_SIZE = 65536
+
+
+class Attachment(object):
+    """
+    A file sent as part of a multipart request.  The source is only opened (for paths) or read while the request body
+    is being sent.
+    """
+
+    def __init__(self, source, filename=None, content_type=None):
+        """
+        :param source: a file path, a binary file object, a memory-mapped file, bytes or a memoryview
+        :param str filename: the file name sent to Pushover (defaults to the name of the file)
+        :param str content_type: the MIME type of the file (guessed from the file name by default)
+        """
+        self.source = source
+        if filename is None:
+            name = source if isinstance(source, str) else getattr(source, 'name', None)
+            filename = os.path.basename(name) if isinstance(name, str) else 'attachment'
+        self.filename = filename
+        self.content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        self._start = None
+
+    @classmethod
+    def coerce(cls, attachment):
+        """
+        :return Attachment: `attachment` itself if it is an `Attachment`, otherwise a new `Attachment` of the source
+        """
+        return attachment if isinstance(attachment, cls) else cls(attachment)
+
+    def __len__(self):
+        source = self.source
+        if isinstance(source, str):
+            return os.path.getsize(source)
+        if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+            return memoryview(source).nbytes
+        if self._start is None:
+            self._start = source.tell()
+        try:
+            return os.fstat(source.fileno()).st_size - self._start
+        except (AttributeError, OSError, ValueError):
+            position = source.tell()
+            source.seek(0, os.SEEK_END)
+            end = source.tell()
+            source.seek(position)
+            return end - self._start
+
+    def chunks(self, size=_CHUNK_SIZE):
+        """
+        Yields the content of the attachment in chunks of at most `size` bytes.  Files opened from a path are closed
+        once read.  Each call starts again from the beginning of the attachment.
+        """
+        source = self.source
+        if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+            view = memoryview(source)
+            for offset in range(0, len(view), size):
+                yield view[offset:offset + size]
+            return
+
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                for chunk in iter(lambda: f.read(size), b''):
+                    yield chunk
+            return
+
+        if self._start is None:
+            self._start = source.tell()
+        source.seek(self._start)
+        for chunk in iter(lambda: source.read(size), b''):
+            yield chunk
+
+
+class MultipartBody(object):
+    """
+    A multipart/form-data request body streamed from its fields and attachments.  Its length is known up front so it is
+    sent with a Content-Length header, and it can be rewound to send it again on a retry.
+    """
+
+    def __init__(self, fields, files):
+        """
+        :param dict fields: the form fields
+        :param dict files: the attachments by field name
+        """
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary={}'.format(self.boundary)
+        self._parts = []
+        for name, value in (fields or {}).items():
+            self._parts.append('--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n{}\r\n'.format(
+                self.boundary, name, value
+            ).encode('utf-8'))
+        for name, attachment in files.items():
+            self._parts.append((
+                '--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}"\r\nContent-Type: {}\r\n\r\n'.format(
+                    self.boundary, name, attachment.filename, attachment.content_type
+                )
+            ).encode('utf-8'))
+            self._parts.append(attachment)
+            self._parts.append(b'\r\n')
+        self._parts.append('--{}--\r\n'.format(self.boundary).encode('utf-8'))
+        self._length = sum(len(part) for part in self._parts)
+        self.rewind()
+
+    def __len__(self):
+        return self._length
+
+    def rewind(self):
+        """
+        Restarts the body from the beginning.
+        """
+        self._chunks = self._iter_chunks()
+        self._buffer = memoryview(b'')
+
+    def _iter_chunks(self):
+        for part in self._parts:
+            if isinstance(part, Attachment):
+                for chunk in part.chunks():
+                    yield chunk
+            else:
+                yield part
+
+    def __iter__(self):
+        if self._buffer:
+            yield self._buffer.tobytes()
+            self._buffer = memoryview(b'')
+        for chunk in self._chunks:
+            yield chunk
+
+    def read(self, size=-1):
+        """
+        Reads up to `size` bytes of the body (everything left if `size` is negative).
+        """
+        if size is None or size < 0:
+            return b''.join(bytes(chunk) for chunk in self)
+
+        out = []
+        while size > 0:
+            if not self._buffer:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._buffer = memoryview(chunk)
+            out.append(self._buffer[:size].tobytes())
+            size -= len(out[-1])
+            self._buffer = self._buffer[len(out[-1]):]
+        return b''.join(out)
@@ -0,0 +1,290 @@
+"""
+==================================================
+breaker - Circuit Breakers for the Pushover API
+==================================================
+
+This module defines circuit breakers guarding the calls made to the Pushover servers.  During an outage, waiting on a
+timeout for every call only piles up the callers.  A circuit breaker watches the error rate of the calls made with each
+app token, and once too many of them fail, it opens: calls then fail immediately with a ``CircuitOpenError`` (or are
+handed to a fallback) without reaching the network.
+
+States:
+-------
+
+* ``closed`` - calls go through.  Once at least ``min_requests`` calls were made within the last ``window`` seconds and
+  the rate of failures (connection errors, timeouts and 5xx responses) reaches ``failure_rate``, the circuit opens.
+* ``open`` - calls fail immediately.  After ``open_timeout`` seconds the circuit is half-open.
+* ``half_open`` - up to ``half_open_requests`` trial calls go through.  The circuit closes once they all succeed and
+  opens again as soon as one fails.
+
+Enabling Circuit Breakers:
+--------------------------
+Circuit breakers are created on demand, one per Pushover host and app token, by a ``BreakerRegistry``.  Set it as the
+default to guard every call, or pass it to a manager or call as ``breakers``:
+
+    >>> import pypushover as pypo
+    >>> pypo.breaker.default_registry = pypo.breaker.BreakerRegistry(failure_rate=0.5, min_requests=10)
+    >>> pm = pypo.message.MessageManager('<app_token>', '<user key>', breakers=pypo.breaker.BreakerRegistry())
+
+Queueing Pushes While Open:
+---------------------------
+Rather than failing, pushes and other POST requests can be queued while the circuit is open and sent once the
+Pushover servers are back:
+
+    >>> fallback = pypo.breaker.QueueFallback()
+    >>> pypo.breaker.default_registry = pypo.breaker.BreakerRegistry(fallback=fallback)
+    >>> pypo.message.push_message('<app_token>', '<user key>', 'Queued during outages')
+    >>> fallback.flush()  # later, once the outage is over
+
+Alerting:
+---------
+Every state change is passed to the ``circuit_state_changed`` method of the registered request observers.  The
+``metrics.MetricsAggregator`` exports the state of each circuit as the ``pypushover_circuit_state`` gauge.
+"""
+
+__all__ = ('CircuitBreaker', 'BreakerRegistry', 'QueueFallback', 'CLOSED', 'OPEN', 'HALF_OPEN', 'default_registry')
+
+import collections
+import threading
+from timeit import default_timer
+from urllib.parse import urlsplit
+
+from pypushover.response import PushoverResponse
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker(object):
+    """
+    Tracks the outcome of the calls made to one Pushover host with one app token and decides whether new calls are
+    allowed.
+    """
+
+    def __init__(self, name, failure_rate=0.5, min_requests=10, window=60, open_timeout=30, half_open_requests=1,
+                 fallback=None):
+        """
+        :param str name: name of the circuit used when reporting its state
+        :param float failure_rate: the rate of failed calls (0 - 1) that opens the circuit
+        :param int min_requests: the minimum number of calls within the window before the circuit can open
+        :param float window: the number of seconds of calls considered when computing the failure rate
+        :param float open_timeout: the number of seconds the circuit stays open before allowing trial calls
+        :param int half_open_requests: the number of trial calls allowed while half-open
+        :param fallback: callable accepting the url, payload and attachments (or None) of a POST request made while the
+                         circuit is open.  Its return value is returned in place of the response.
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.open_timeout = open_timeout
+        self.half_open_requests = half_open_requests
+        self.fallback = fallback
+        self._lock = threading.RLock()
+        self._state = CLOSED
+        self._outcomes = collections.deque()
+        self._failures = 0
+        self._opened_at = None
+        self._trials = 0
+        self._trial_successes = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            changed = self._refresh()
+            state = self._state
+        if changed:
+            _notify(self.name, *changed)
+        return state
+
+    def allow_request(self):
+        """
+        Returns whether a call can be made now.  While half-open, an allowed call is one of the trial calls and its
+        outcome MUST be recorded.
+
+        :return bool:
+        """
+        with self._lock:
+            changed = self._refresh()
+            if self._state == CLOSED:
+                allowed = True
+            elif self._state == HALF_OPEN and self._trials < self.half_open_requests:
+                self._trials += 1
+                allowed = True
+            else:
+                allowed = False
+        # observers are notified outside the lock, so that they can call back into the breaker
+        if changed:
+            _notify(self.name, *changed)
+        return allowed
+
+    def record(self, success):
+        """
+        Records the outcome of a call.
+
+        :param bool success: False if the call failed because of the Pushover servers (connection error, timeout or
+                             5xx response)
+        """
+        changed = None
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if not success:
+                    changed = self._set_state(OPEN)
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_requests:
+                        changed = self._set_state(CLOSED)
+            elif self._state == CLOSED:
+                now = default_timer()
+                self._outcomes.append((now, success))
+                if not success:
+                    self._failures += 1
+                self._trim(now)
+                total = len(self._outcomes)
+                if total >= self.min_requests and self._failures >= self.failure_rate * total:
+                    changed = self._set_state(OPEN)
+
+        if changed:
+            _notify(self.name, *changed)
+
+    def _refresh(self):
+        """
+        Moves an open circuit to half-open once its timeout has passed.  Called with the lock held.
+
+        :return tuple: the (old, new) states if the state changed, None otherwise
+        """
+        if self._state == OPEN and default_timer() - self._opened_at >= self.open_timeout:
+            self._trials = self._trial_successes = 0
+            return self._set_state(HALF_OPEN)
+        return None
+
+    def _trim(self, now):
+        outcomes = self._outcomes
+        while outcomes and now - outcomes[0][0] > self.window:
+            if not outcomes.popleft()[1]:
+                self._failures -= 1
+
+    def _set_state(self, state):
+        old_state, self._state = self._state, state
+        if state == OPEN:
+            self._opened_at = default_timer()
+        elif state == CLOSED:
+            self._outcomes.clear()
+            self._failures = 0
+        return old_state, state
+
+
+class BreakerRegistry(object):
+    """
+    Creates and holds one `CircuitBreaker` per Pushover host and app token.  All the breakers share the settings given
+    to the registry.
+    """
+
+    def __init__(self, **breaker_settings):
+        """
+        :param breaker_settings: settings of every breaker (see `CircuitBreaker`)
+        """
+        self._settings = breaker_settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, token=None):
+        """
+        Returns the breaker of the host of `url` and the app token.
+
+        :param str url: url of the request
+        :param str token: application token of the request
+        :return CircuitBreaker:
+        """
+        key = (urlsplit(url).netloc, token)
+        circuit = self._breakers.get(key)
+        if circuit is None:
+            with self._lock:
+                circuit = self._breakers.get(key)
+                if circuit is None:
+                    name = '{}/{}'.format(key[0], token[:6] if token else '')
+                    circuit = self._breakers[key] = CircuitBreaker(name, **self._settings)
+        return circuit
+
+    def states(self):
+        """
+        :return dict: the state of every breaker by name
+        """
+        return dict((circuit.name, circuit.state) for circuit in list(self._breakers.values()))
+
+
+class QueueFallback(object):
+    """
+    Fallback queueing the POST requests made while a circuit is open so they can be sent later with `flush`.  Queued
+    requests are answered with a `PushoverResponse` whose `queued` attribute is True.
+    """
+
+    def __init__(self, maxsize=0):
+        """
+        :param int maxsize: the maximum number of queued requests (0 for no limit).  Once full, requests fail with a
+                            `CircuitOpenError`.
+        """
+        self.maxsize = maxsize
+        self.queue = collections.deque()  # the (url, data_out, files) of each request, oldest first
+        self._lock = threading.Lock()
+
+    def __call__(self, url, data_out, files=None):
+        from pypushover._base import CircuitOpenError
+
+        with self._lock:
+            if self.maxsize and len(self.queue) >= self.maxsize:
+                raise CircuitOpenError('Circuit open and fallback queue is full')
+            self.queue.append((url, data_out, files))
+        return PushoverResponse(b'{"status": 1, "queued": true}')
+
+    def flush(self, **send_options):
+        """
+        Sends the queued requests in order.  Stops at the first failure, or at the first request queued again because
+        the circuit is still open, leaving it queued ahead of the remaining requests.
+
+        :param send_options: options passed to `pypushover.send` for every request
+        :return list: the responses of the requests sent
+        """
+        from pypushover._base import send
+
+        results = []
+        while True:
+            with self._lock:
+                if not self.queue:
+                    break
+                request = self.queue.popleft()
+            url, data_out, files = request
+            try:
+                res = send(url, data_out, files=files, **send_options)
+            except Exception:
+                with self._lock:
+                    self.queue.appendleft(request)
+                raise
+            if getattr(res, 'queued', False):
+                with self._lock:
+                    self._unqueue(data_out)
+                    self.queue.appendleft(request)
+                break
+            results.append(res)
+        return results
+
+    def _unqueue(self, data_out):
+        # the newest request with the payload, just queued again by `__call__`
+        for i in range(len(self.queue) - 1, -1, -1):
+            if self.queue[i][1] is data_out:
+                del self.queue[i]
+                return
+
+    def __len__(self):
+        with self._lock:
+            return len(self.queue)
+
+
+def _notify(name, old_state, new_state):
+    from pypushover._base import _notify_circuit_change
+
+    _notify_circuit_change(name, old_state, new_state)
+
+
+default_registry = None
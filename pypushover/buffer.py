@@ -0,0 +1,165 @@
+"""
+====================================================
+buffer - Memory-Bounded Buffers of Client Messages
+====================================================
+
+This module defines the ``MessageBuffer``, a ring buffer of the messages retrieved by a ``ClientManager``.  It holds
+at most ``capacity`` messages in memory; older messages are spilled to a file on disk (a temporary file by default), so
+that the memory of a long-running listener stays flat however large the backlog it fetches.
+
+    >>> import pypushover as py_po
+    >>> messages = py_po.buffer.MessageBuffer(capacity=500)
+    >>> cm = py_po.client.ClientManager('<app token>', secret='<user secret>', device_id='<device id>',
+    ...                                 message_buffer=messages)
+    >>> cm.retrieve_message()
+
+The buffer keeps every message retrieved, in order, once each: ``cm.messages`` is then the buffer itself.  It can be
+iterated over (reading the spilled messages back from disk a page at a time), indexed, or read one page at a time:
+
+    >>> for msg in cm.messages:
+    ...     print(msg['message'])
+    >>> messages.page(0, 100)  # the 100 oldest messages
+    >>> messages.recent()  # the messages held in memory
+
+Pass ``spill=False`` to drop the overflow instead, keeping only the ``capacity`` latest messages.  Call ``clear`` once
+the messages have been handled.
+"""
+
+__all__ = ('MessageBuffer', )
+
+import collections
+import io
+import itertools
+import json
+import tempfile
+import threading
+
+_INDEX_EVERY = 256  # spilled messages between two indexed file offsets
+_PAGE = 256
+
+
+class MessageBuffer(object):
+    """
+    Holds the latest messages in memory and spills the older ones to disk.
+    """
+
+    def __init__(self, capacity=1000, spill=True, path=None):
+        """
+        :param int capacity: the maximum number of messages held in memory
+        :param bool spill: write the messages evicted from memory to disk, rather than dropping them
+        :param str path: the file the messages are spilled to (a temporary file deleted once closed by default)
+        """
+        if capacity < 1:
+            raise ValueError('`capacity` must be at least 1')
+        self.capacity = capacity
+        self.spill = spill
+        self.path = path
+        self.max_id = None
+        self.dropped = 0
+        self._memory = collections.deque()
+        self._file = None
+        self._spilled = 0
+        self._index = []
+        self._lock = threading.Lock()
+
+    def extend(self, messages):
+        """
+        Appends the messages not already in the buffer, going by their `id`.
+
+        :param list messages: messages as returned by the Pushover API
+        """
+        with self._lock:
+            for message in messages:
+                message_id = message.get('id')
+                if message_id is not None:
+                    if self.max_id is not None and message_id <= self.max_id:
+                        continue
+                    self.max_id = message_id
+                self._memory.append(message)
+                if len(self._memory) > self.capacity:
+                    self._evict(self._memory.popleft())
+
+    def page(self, start, count):
+        """
+        Reads messages, oldest first.
+
+        :param int start: the index of the first message
+        :param int count: the maximum number of messages
+        :return list:
+        """
+        with self._lock:
+            messages = []
+            if start < self._spilled:
+                self._file.flush()
+                self._file.seek(self._index[start // _INDEX_EVERY])
+                for _ in range(start % _INDEX_EVERY):
+                    self._file.readline()
+                while len(messages) < count and start + len(messages) < self._spilled:
+                    messages.append(json.loads(self._file.readline().decode('utf-8')))
+            if len(messages) < count:
+                first = start + len(messages) - self._spilled
+                messages.extend(itertools.islice(self._memory, first, first + count - len(messages)))
+            return messages
+
+    def recent(self):
+        """
+        :return list: the messages held in memory, the latest ones
+        """
+        with self._lock:
+            return list(self._memory)
+
+    def clear(self):
+        """
+        Drops every message, in memory and on disk.  Messages already seen are still skipped by `extend`.
+        """
+        with self._lock:
+            self._memory.clear()
+            if self._file is not None:
+                self._file.seek(0)
+                self._file.truncate()
+            self._spilled = 0
+            self._index = []
+
+    def close(self):
+        """
+        Closes the spill file.
+        """
+        self.clear()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __len__(self):
+        return self._spilled + len(self._memory)
+
+    def __iter__(self):
+        for start in itertools.count(0, _PAGE):
+            messages = self.page(start, _PAGE)
+            for message in messages:
+                yield message
+            if len(messages) < _PAGE:
+                return
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        messages = self.page(index, 1) if index >= 0 else None
+        if not messages:
+            raise IndexError('message index out of range')
+        return messages[0]
+
+    def __repr__(self):
+        return '<MessageBuffer {} messages ({} spilled)>'.format(len(self), self._spilled)
+
+    def _evict(self, message):
+        if not self.spill:
+            self.dropped += 1
+            return
+        if self._file is None:
+            self._file = io.open(self.path, 'w+b') if self.path else tempfile.TemporaryFile('w+b')
+        self._file.seek(0, io.SEEK_END)
+        if self._spilled % _INDEX_EVERY == 0:
+            self._index.append(self._file.tell())
+        self._file.write(json.dumps(message).encode('utf-8') + b'\n')
+        self._spilled += 1
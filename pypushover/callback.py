@@ -0,0 +1,334 @@
+"""
+=======================================================
+callback - Receiving Emergency Message Acknowledgements
+=======================================================
+
+This module defines small embeddable HTTP servers receiving the callbacks Pushover sends when an emergency message is
+acknowledged, so that receipts do not have to be polled with ``check_receipt``.
+
+Pass the ``url`` of the receiver as the ``callback`` of emergency messages, then wait for the acknowledgement of a
+receipt with ``expect``, which returns a future resolved with an ``Acknowledgement``:
+
+    >>> import pypushover as pypo
+    >>> import pypushover.callback
+    >>> with pypo.callback.CallbackReceiver(port=8080, public_url='https://example.com:8080') as receiver:
+    ...     res = pypo.message.push_message('<app_token>', '<user key>', 'Server down!',
+    ...                                     priority=pypo.PRIORITIES.EMERGENCY, retry=30, expire=3600,
+    ...                                     callback=receiver.url)
+    ...     ack = receiver.expect(res['receipt']).result(timeout=3600)
+    ...     print(ack.acknowledged_by)
+
+Handlers can also be called for every acknowledgement received, including those of receipts not expected:
+
+    >>> receiver.add_handler(lambda ack: print(ack.receipt))
+
+The ``AsyncCallbackReceiver`` does the same on an ``asyncio`` event loop; ``expect`` then returns an ``asyncio.Future``
+and handlers may be coroutine functions:
+
+    >>> async def main():
+    ...     async with pypo.callback.AsyncCallbackReceiver(port=8080) as receiver:
+    ...         ...
+    ...         ack = await receiver.expect(receipt)
+
+Callbacks are only accepted on the ``path`` of the receiver, a random path by default, so that the url cannot be
+guessed.  Acknowledgements received before their receipt is expected (the callback racing the response of the message)
+are kept and resolve the next ``expect`` of their receipt right away.
+"""
+
+__all__ = ('Acknowledgement', 'CallbackReceiver', 'AsyncCallbackReceiver')
+
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+_MAX_EARLY = 1024  # acknowledgements kept for receipts not expected yet
+_MAX_BODY = 64 * 1024
+
+
+class Acknowledgement(object):
+    """
+    The acknowledgement of an emergency message, as sent in a Pushover callback.
+    """
+    __slots__ = ('receipt', 'acknowledged_at', 'acknowledged_by', 'acknowledged_by_device', 'fields')
+
+    def __init__(self, fields):
+        """
+        :param dict fields: the fields of the callback
+        """
+        self.receipt = fields.get('receipt')
+        self.acknowledged_at = int(fields['acknowledged_at']) if fields.get('acknowledged_at') else None
+        self.acknowledged_by = fields.get('acknowledged_by')
+        self.acknowledged_by_device = fields.get('acknowledged_by_device')
+        self.fields = fields
+
+    def __repr__(self):
+        return '<Acknowledgement {} by {}>'.format(self.receipt, self.acknowledged_by)
+
+
+class _Receiver(object):
+    """
+    Matches the acknowledgements received to the futures of the receipts expected.
+    """
+
+    def __init__(self, host, port, path, public_url):
+        self.host = host
+        self.port = port
+        self.path = path or '/pushover/{}'.format(uuid.uuid4().hex)
+        self.public_url = public_url
+        self._futures = {}
+        self._early = collections.OrderedDict()
+        self._handlers = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        """
+        :return str: the url to pass as the `callback` of emergency messages
+        """
+        base = self.public_url or 'http://{}:{}'.format(self.host, self.port)
+        return base.rstrip('/') + self.path
+
+    def expect(self, receipt):
+        """
+        :param str receipt: the receipt of an emergency message sent with the `url` of the receiver as callback
+        :return: a future resolved with the `Acknowledgement` of the receipt
+        """
+        with self._lock:
+            ack = self._early.pop(receipt, None)
+            future = self._future()
+            if ack is not None:
+                future.set_result(ack)
+            else:
+                self._futures.setdefault(receipt, []).append(future)
+        return future
+
+    def pending(self):
+        """
+        :return list: the receipts expected and not acknowledged yet
+        """
+        with self._lock:
+            return list(self._futures)
+
+    def add_handler(self, handler):
+        """
+        :param handler: a function called with every `Acknowledgement` received
+        """
+        self._handlers.append(handler)
+
+    def remove_handler(self, handler):
+        self._handlers.remove(handler)
+
+    def _future(self):
+        raise NotImplementedError
+
+    def _acknowledged(self, ack):
+        """
+        Resolves the futures of the receipt acknowledged, or keeps the acknowledgement for a later `expect`.
+        """
+        with self._lock:
+            futures = self._futures.pop(ack.receipt, None)
+            if futures is None:
+                self._early[ack.receipt] = ack
+                if len(self._early) > _MAX_EARLY:
+                    self._early.popitem(last=False)
+        for future in futures or ():
+            if not future.done():
+                future.set_result(ack)
+
+    def _parse(self, method, path, body):
+        """
+        :return tuple: the HTTP status of the response, and the acknowledgement received if any
+        """
+        if path.split('?', 1)[0] != self.path:
+            return 404, None
+        if method != 'POST':
+            return 405, None
+        fields = dict(parse_qsl(body.decode('utf-8', 'replace')))
+        if not fields.get('receipt'):
+            return 400, None
+        return 200, Acknowledgement(fields)
+
+
+class CallbackReceiver(_Receiver):
+    """
+    Receives the callbacks of emergency messages on a background thread.
+    """
+
+    def __init__(self, host='0.0.0.0', port=0, path=None, public_url=None):
+        """
+        :param str host: the address to listen on
+        :param int port: the port to listen on, a free port by default
+        :param str path: the path callbacks are accepted on, a random path by default
+        :param str public_url: the url the receiver is reached at from the internet (scheme, host and port), if not
+                               the address it listens on
+        """
+        super(CallbackReceiver, self).__init__(host, port, path, public_url)
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """
+        Starts listening for callbacks.
+        """
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > _MAX_BODY:
+                    return self._respond(413)
+                status, ack = receiver._parse(self.command, self.path, self.rfile.read(length))
+                if ack is not None:
+                    receiver._acknowledged(ack)
+                    receiver._handle(ack)
+                self._respond(status)
+
+            def do_GET(self):
+                self._respond(receiver._parse(self.command, self.path, b'')[0])
+
+            def _respond(self, status):
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logging.debug(format, *args)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='pypushover-callback')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Stops listening for callbacks.  The futures still expected are cancelled.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+        with self._lock:
+            futures = [future for futures in self._futures.values() for future in futures]
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _future(self):
+        return concurrent.futures.Future()
+
+    def _handle(self, ack):
+        for handler in list(self._handlers):
+            try:
+                handler(ack)
+            except Exception:
+                logging.exception('Acknowledgement handler failed for receipt {}'.format(ack.receipt))
+
+
+class AsyncCallbackReceiver(_Receiver):
+    """
+    Receives the callbacks of emergency messages on an `asyncio` event loop.
+    """
+
+    def __init__(self, host='0.0.0.0', port=0, path=None, public_url=None):
+        """
+        See `CallbackReceiver`.
+        """
+        super(AsyncCallbackReceiver, self).__init__(host, port, path, public_url)
+        self._server = None
+        self._loop = None
+
+    async def start(self):
+        """
+        Starts listening for callbacks on the running event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        """
+        Stops listening for callbacks.  The futures still expected are cancelled.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        with self._lock:
+            futures = [future for futures in self._futures.values() for future in futures]
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _future(self):
+        return (self._loop or asyncio.get_event_loop()).create_future()
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path = request_line.decode('latin-1').split(' ', 2)[:2]
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if length > _MAX_BODY:
+                    status, ack = 413, None
+                else:
+                    status, ack = self._parse(method, path, await reader.readexactly(length) if length else b'')
+                if ack is not None:
+                    self._acknowledged(ack)
+                    await self._handle(ack)
+                keep_alive = headers.get('connection', '').lower() != 'close' and status != 413
+                writer.write('HTTP/1.1 {} {}\r\nContent-Length: 0\r\n{}\r\n'.format(
+                    status, _reasons.get(status, ''), '' if keep_alive else 'Connection: close\r\n'
+                ).encode('latin-1'))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, ack):
+        for handler in list(self._handlers):
+            try:
+                result = handler(ack)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception:
+                logging.exception('Acknowledgement handler failed for receipt {}'.format(ack.receipt))
+
+
+_reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
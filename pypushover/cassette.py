@@ -0,0 +1,220 @@
+"""
+======================================================
+cassette - Recording and Replaying Pushover API Traffic
+======================================================
+
+This module defines transports recording the traffic sent to the Pushover servers into a cassette, and replaying a
+cassette without any network traffic.  Replaying real traffic lets tests (and performance tests) of code using
+``pypushover`` run offline, without any keys.
+
+Recording:
+----------
+The ``Recorder`` sends the requests through another transport and records each request along with its response (or
+its error) and timing.  Tokens, user keys, secrets and the like are redacted before they are recorded:
+
+    >>> import pypushover as pypo
+    >>> import pypushover.cassette
+    >>> recorder = pypo.cassette.Recorder()
+    >>> pm = pypo.message.MessageManager('<app_token>', '<user key>', transport=recorder)
+    >>> pm.push_message('Recorded')
+    >>> recorder.save('traffic.ndjson')
+
+To record the traffic of every call not given a transport, make the recorder the default transport:
+
+    >>> pypo.transport.default_transport = pypo.cassette.Recorder(path='traffic.ndjson')
+
+Replaying:
+----------
+The ``ReplayTransport`` answers each request with the next response recorded for the same method and endpoint.  By
+default the responses are served immediately; pass ``speed`` to wait for the recorded duration of each request,
+divided by ``speed``:
+
+    >>> replay = pypo.cassette.ReplayTransport('traffic.ndjson', speed=10)
+    >>> pm = pypo.message.MessageManager('<app_token>', '<user key>', transport=replay)
+    >>> pm.push_message('Replayed')
+
+The cassette itself is a file of newline-delimited JSON, one recorded request per line.  Along with the request and
+its response, each line holds the ``offset`` (in seconds) at which the request was sent since the recording started
+and the ``duration`` of the request.
+"""
+
+__all__ = ('Recorder', 'ReplayTransport', 'load', 'redact', 'REDACTED', 'REDACTED_FIELDS')
+
+import collections
+import io
+import json
+import threading
+import time
+from timeit import default_timer
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from pypushover._base import _key_segment
+from pypushover.response import PushoverResponse, loads
+from pypushover.transport import Transport, default_transport, form_fields
+
+REDACTED = '<redacted>'
+REDACTED_FIELDS = frozenset(('token', 'user', 'secret', 'password', 'email', 'id', 'device_id', 'group'))
+
+_recorded_errors = dict((error.__name__, error) for error in (
+    requests.ConnectTimeout, requests.ReadTimeout, requests.Timeout, requests.ConnectionError, requests.RequestException
+))
+
+
+def redact(data, fields=REDACTED_FIELDS):
+    """
+    Replaces the values of secret fields, in nested dictionaries and lists too.
+
+    :param data: a dictionary (or list) of fields
+    :param fields: the names of the fields to redact
+    :return: a redacted copy of `data`
+    """
+    if isinstance(data, dict):
+        return dict((k, REDACTED if k in fields and v is not None else redact(v, fields)) for k, v in data.items())
+    if isinstance(data, list):
+        return [redact(v, fields) for v in data]
+    return data
+
+
+def load(path):
+    """
+    Reads the recorded requests of a cassette.
+
+    :param str path: the cassette file
+    :return list: the recorded requests
+    """
+    with io.open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class Recorder(Transport):
+    """
+    Records every request, its response and its timing, with secrets redacted.
+    """
+
+    def __init__(self, transport=None, path=None, fields=REDACTED_FIELDS):
+        """
+        :param Transport transport: the transport sending the requests (`transport.default_transport` by default)
+        :param str path: a cassette file each request is appended to as soon as its response is received
+        :param fields: the names of the request and response fields to redact
+        """
+        self.transport = default_transport if transport is None else transport
+        self.path = path
+        self.fields = fields
+        self.entries = []
+        self._start = default_timer()
+        self._lock = threading.Lock()
+
+    def request(self, method, url, params=None, body=None, headers=None, timeout=None, deadline=None):
+        fields = dict(params) if params else form_fields(body, headers)
+        entry = {
+            'method': method,
+            'url': _redact_url(url),
+            'params': redact(fields, self.fields) if fields else None,
+            'request_headers': dict(headers) if headers else None,
+            'body_size': len(body) if body is not None else 0,
+            'offset': default_timer() - self._start,
+        }
+        start = default_timer()
+        try:
+            res = self.transport.request(method, url, params=params, body=body, headers=headers, timeout=timeout,
+                                         deadline=deadline)
+        except requests.RequestException as e:
+            entry['duration'] = default_timer() - start
+            entry['error'] = type(e).__name__ if type(e).__name__ in _recorded_errors else 'RequestException'
+            self._record(entry)
+            raise
+
+        entry['duration'] = default_timer() - start
+        entry['status_code'] = res.status_code
+        entry['headers'] = dict(res.headers)
+        try:
+            entry['content'] = redact(loads(res.content), self.fields)
+        except ValueError:
+            entry['content'] = res.content.decode('utf-8', 'replace')
+        self._record(entry)
+        return res
+
+    def _record(self, entry):
+        with self._lock:
+            self.entries.append(entry)
+            if self.path is not None:
+                with io.open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(_dumps(entry))
+
+    def save(self, path):
+        """
+        Writes the recorded requests to a cassette file.
+
+        :param str path: the cassette file
+        """
+        with self._lock:
+            with io.open(path, 'w', encoding='utf-8') as f:
+                for entry in self.entries:
+                    f.write(_dumps(entry))
+
+    def close(self):
+        self.transport.close()
+
+
+class ReplayTransport(Transport):
+    """
+    Answers requests with the responses of a cassette.  Each request gets the next response recorded for the same
+    method and endpoint, so a cassette replays the same whatever the order of concurrent requests.
+    """
+
+    def __init__(self, cassette, speed=None, loop=False):
+        """
+        :param cassette: the cassette file, or the list of recorded requests
+        :param float speed: wait for the recorded duration of each request divided by `speed` (1 replays at the
+                            original pace).  Responses are served immediately by default.
+        :param bool loop: start a method and endpoint over from its first response once all have been served, rather
+                          than raising a `LookupError`
+        """
+        entries = load(cassette) if isinstance(cassette, str) else cassette
+        self.speed = speed
+        self.loop = loop
+        self._entries = collections.defaultdict(list)
+        for entry in entries:
+            self._entries[(entry['method'], entry['url'])].append(entry)
+        self._served = collections.Counter()
+        self._lock = threading.Lock()
+
+    def request(self, method, url, params=None, body=None, headers=None, timeout=None, deadline=None):
+        key = (method, _redact_url(url))
+        with self._lock:
+            entries = self._entries.get(key)
+            served = self._served[key]
+            if not entries or (served >= len(entries) and not self.loop):
+                raise LookupError('No recorded response left for {} {}'.format(*key))
+            entry = entries[served % len(entries)]
+            self._served[key] += 1
+
+        if self.speed:
+            delay = entry['duration'] / self.speed
+            if deadline is not None and deadline.remaining() < delay:
+                time.sleep(max(deadline.remaining(), 0))
+                raise requests.ReadTimeout('Deadline exceeded replaying the response')
+            time.sleep(delay)
+        if 'error' in entry:
+            raise _recorded_errors.get(entry['error'], requests.RequestException)('Replayed ' + entry['error'])
+
+        content = entry['content']
+        content = content.encode('utf-8') if isinstance(content, str) else json.dumps(content).encode('utf-8')
+        return PushoverResponse(content, entry['status_code'], CaseInsensitiveDict(entry['headers']))
+
+    def served(self):
+        """
+        :return int: the number of responses served so far
+        """
+        with self._lock:
+            return sum(self._served.values())
+
+
+def _redact_url(url):
+    return _key_segment.sub('{key}', url)
+
+
+def _dumps(entry):
+    return json.dumps(entry, sort_keys=True) + '\n'
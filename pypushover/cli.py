@@ -0,0 +1,222 @@
+"""
+=====================================================
+cli - Sending Messages from the Command Line
+=====================================================
+
+This module defines the ``pypushover`` console script.  It reads newline-delimited JSON (NDJSON) message specs from
+stdin or a file, sends them concurrently over a shared connection pool and writes the result of every line as NDJSON.
+
+Each line is a JSON object of ``push_message`` arguments.  ``token`` and ``user`` can be left out of the lines when
+given on the command line (or through the ``PUSHOVER_TOKEN`` and ``PUSHOVER_USER`` environment variables):
+
+.. code-block:: bash
+
+    $ cat alerts.ndjson
+    {"message": "Disk full", "priority": 1}
+    {"message": "Backup done", "title": "nightly", "user": "<other user key>"}
+    $ pypushover --token <app token> --user <user key> alerts.ndjson
+    {"line": 1, "status": 1, "request": "5042853c-402d-4a18-abcb-168734a801de"}
+    {"line": 2, "status": 1, "request": "8d3b1f2a-7b6c-4a8e-9f1d-2c5e6a7b8c9d"}
+
+Results are written as the responses arrive, so they are not necessarily in the order of the input lines; the ``line``
+field gives the line each result belongs to.  Failed lines are written with a ``status`` of 0 and their ``errors``,
+and make the script exit with a status of 1.
+
+Only a bounded number of lines are read ahead of the requests in flight, so piping any number of messages takes the
+same memory.  Requests are paced to ``--rate`` messages per second when given, retried on ``429`` responses once the
+rate limit resets, and lines are failed without being sent once the monthly limit of their app is used up.
+
+The script can also be run as ``python -m pypushover``.  The same can be done from Python with ``send_lines``:
+
+    >>> import sys
+    >>> import pypushover as pypo
+    >>> import pypushover.cli
+    >>> pypo.cli.send_lines(open('alerts.ndjson'), sys.stdout, token='<app token>', user='<user key>', workers=16)
+"""
+
+__all__ = ('main', 'send_lines', 'Pacer')
+
+import argparse
+import datetime
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+from pypushover._base import PushoverError
+from pypushover.message import push_message
+from pypushover.registry import AppRegistry
+from pypushover.response import loads
+
+
+class Pacer(object):
+    """
+    Spaces out calls to at most `rate` per second, shared by all the threads sending them.
+    """
+
+    def __init__(self, rate):
+        """
+        :param float rate: the maximum number of calls per second
+        """
+        self.interval = 1.0 / rate
+        self._next = time.time()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the next call can be made.
+        """
+        with self._lock:
+            now = time.time()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def send_lines(lines, output, token=None, user=None, workers=8, rate=None, registry=None, **send_options):
+    """
+    Sends the messages of NDJSON lines concurrently and writes the result of each line to `output` as NDJSON.
+
+    :param lines: an iterable of NDJSON lines, each a JSON object of `push_message` arguments
+    :param output: a text file the results are written to
+    :param str token: the application token of lines without a `token`
+    :param str user: the user or group key of lines without a `user`
+    :param int workers: the number of messages sent at the same time
+    :param float rate: the maximum number of messages sent per second (unlimited by default)
+    :param AppRegistry registry: the registry the messages are sent through.  Defaults to a registry created (and
+                                 closed) for these lines.
+    :param send_options: options passed to `pypushover.send` for each message, such as `timeout`
+    :return tuple: the number of lines sent and the number of lines that failed
+    """
+    own_registry = registry is None
+    if own_registry:
+        registry = AppRegistry(pool_size=workers, max_workers=workers)
+    pacer = Pacer(rate) if rate else None
+    in_flight = threading.BoundedSemaphore(workers * 2)
+    lock = threading.Lock()
+    counts = [0, 0]
+
+    def write(result):
+        line = json.dumps(result, sort_keys=True) + '\n'
+        with lock:
+            counts[result['status'] != 1] += 1
+            output.write(line)
+
+    def done(future, number):
+        try:
+            write(future.result())
+        except Exception as e:
+            write(_failed(number, e))
+        finally:
+            in_flight.release()
+
+    try:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                token_, user_, message, kwargs = _parse_line(line, token, user)
+            except (ValueError, TypeError) as e:
+                write(_failed(number, e))
+                continue
+
+            in_flight.acquire()
+            future = registry.submit(_send_line, registry, pacer, number, token_, user_, message, kwargs, send_options)
+            future.add_done_callback(lambda f, number=number: done(f, number))
+
+        for _ in range(workers * 2):
+            in_flight.acquire()
+    finally:
+        if own_registry:
+            registry.close()
+        output.flush()
+    return tuple(counts)
+
+
+def _parse_line(line, token, user):
+    spec = loads(line)
+    if not isinstance(spec, dict):
+        raise TypeError('line must be a JSON object')
+    if 'message' not in spec:
+        raise TypeError('missing `message`')
+    spec.setdefault('token', token)
+    spec.setdefault('user', user)
+    if spec['token'] is None or spec['user'] is None:
+        raise TypeError('missing `token` or `user` (see --token and --user)')
+    if 'timestamp' in spec:
+        spec['timestamp'] = datetime.datetime.fromtimestamp(spec['timestamp'])
+    return spec.pop('token'), spec.pop('user'), spec.pop('message'), spec
+
+
+def _send_line(registry, pacer, number, token, user, message, kwargs, send_options):
+    limit = registry.rate_limit(token)
+    if limit.remaining == 0 and (limit.reset or 0) > time.time():
+        raise PushoverError(['monthly message limit of the app reached until {}'.format(limit.reset)])
+    if pacer is not None:
+        pacer.wait()
+
+    kwargs.update(send_options)
+    res = push_message(token, user, message, registry=registry, **kwargs)
+    result = {'line': number, 'status': res.get('status', 0), 'request': res.get('request')}
+    if res.get('receipt') is not None:
+        result['receipt'] = res['receipt']
+    if res.get('errors'):
+        result['errors'] = res['errors']
+    return result
+
+
+def _failed(number, error):
+    if isinstance(error, PushoverError):
+        errors = error.errors if error.errors is not None else error.message
+        errors = errors if isinstance(errors, list) else [errors]
+    else:
+        errors = [str(error)]
+    return {'line': number, 'status': 0, 'errors': [str(e) for e in errors]}
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog='pypushover',
+        description='Sends the Pushover messages of NDJSON lines and writes the result of each line as NDJSON.'
+    )
+    parser.add_argument('input', nargs='?', default='-',
+                        help='the NDJSON file of messages, one JSON object of `push_message` arguments per line '
+                             '(default: stdin)')
+    parser.add_argument('-o', '--output', default='-', help='the file the results are written to (default: stdout)')
+    parser.add_argument('-t', '--token', default=os.environ.get('PUSHOVER_TOKEN'),
+                        help='the app token of lines without a `token` (default: $PUSHOVER_TOKEN)')
+    parser.add_argument('-u', '--user', default=os.environ.get('PUSHOVER_USER'),
+                        help='the user or group key of lines without a `user` (default: $PUSHOVER_USER)')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='the number of messages sent at the same time')
+    parser.add_argument('-r', '--rate', type=float, help='the maximum number of messages sent per second')
+    parser.add_argument('--timeout', type=float, help='seconds to wait for each response')
+    return parser
+
+
+def main(argv=None):
+    """
+    Entry point of the `pypushover` console script.
+
+    :param list argv: the command line arguments (defaults to `sys.argv`)
+    :return int: the exit status: 0 if every line was sent, 1 otherwise
+    """
+    args = _parser().parse_args(argv)
+    send_options = {'timeout': args.timeout} if args.timeout else {}
+
+    lines = sys.stdin if args.input == '-' else io.open(args.input, encoding='utf-8')
+    output = sys.stdout if args.output == '-' else io.open(args.output, 'w', encoding='utf-8')
+    try:
+        sent, failed = send_lines(lines, output, token=args.token, user=args.user, workers=args.workers,
+                                  rate=args.rate, **send_options)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failed else 0
+
@@ -41,6 +41,10 @@ dictionaries with items as [defined in the Pushover API](https://pushover.net/ap
     >>> for msg in cm.messages:
     ...     print(msg['message'])
 
+To keep the memory used by a large backlog bounded, pass a ``pypushover.buffer.MessageBuffer`` as the
+``message_buffer``: the `messages` property is then the buffer, keeping every message retrieved while holding only the
+latest ones in memory.
+
 Clearing Messages from Pushover Server:
 ---------------------------------------
 Messages stored on the Pushover Server should be cleared after being presented to the user.  This is done using the
@@ -80,15 +84,47 @@ Using the `listen_async` method is a non-blocking method that will continually r
     >>> cm.listen_async(print_msg)
     >>> time.sleep(30)
     >>> cm.stop_listening
+
+Keep-alives and Sync Latency:
+-----------------------------
+The Pushover server sends a keep-alive frame (``#``) on every open connection.  When no frame is received for
+``keepalive_timeout`` seconds (90 by default), the connection is assumed to be dead (such as a half-open TCP connection)
+and a new one is opened right away.  The delay from each new message notification to the end of the message sync is
+recorded in the ``sync_latency`` histogram:
+
+    >>> cm = py_po.client.ClientManager('<app token>', secret='<user secret>', device_id='<device id>',
+    ...                                 keepalive_timeout=60)
+    >>> cm.listen(print_msg)
+    >>> cm.sync_latency.percentile(99)
+
+Listening to Many Devices:
+--------------------------
+Each `listen_async` call starts a new OS process with its own websocket.  When watching many devices, use the
+`ClientMultiplexer` instead.  It runs every device session (login frame, keep-alive handling and message sync) on a
+single thread using `select`, and routes messages to the callback registered for that device.  It watches the
+keep-alives of every device and records the sync latency of all of them in its own ``sync_latency`` histogram.
+
+    >>> mux = py_po.client.ClientMultiplexer('<app token>')
+    >>> mux.add_device('<secret 1>', '<device id 1>', print_msg)
+    >>> mux.add_device('<secret 2>', '<device id 2>', print_other_msg)
+    >>> mux.run_async()
+    >>> time.sleep(30)
+    >>> mux.stop()
 """
 
-__all__ = ('ClientManager', )
+__all__ = ('ClientManager', 'ClientMultiplexer')
 
 import websocket
 import logging
+import select
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Process, Pipe
 
 from pypushover import BaseManager, send, base_url
+from pypushover.metrics import LatencyHistogram
 
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
@@ -108,26 +144,32 @@ class ClientManager(BaseManager):
     _ws_connect_url = "wss://client.pushover.net/push"
     _ws_login = "login:{device_id}:{secret}\n"
 
-    def __init__(self, app_token, secret=None, device_id=None):
+    def __init__(self, app_token, secret=None, device_id=None, keepalive_timeout=90, message_buffer=None,
+                 **send_options):
         """
         :param str app_token: application id from Pushover API
         :param str secret: (Optional) user secret given after validation of login
         :param str device_id: (Optional) device id of this client
+        :param float keepalive_timeout: (Optional) seconds without any frame from the server after which the connection
+                                        is dropped and opened again
+        :param buffer.MessageBuffer message_buffer: (Optional) a bounded buffer keeping every message retrieved, used
+                                                    as the `messages` property instead of a list of the latest messages
+        :param send_options: (Optional) default options passed to `pypushover.send` for every call
         :return:
         """
-        super(ClientManager, self).__init__(app_token)
+        super(ClientManager, self).__init__(app_token, **send_options)
         self.__secret__ = secret
         self.__device_id__ = device_id
-        self.messages = []
-        self._ws_app = websocket.WebSocketApp(
-            self._ws_connect_url,
-            on_open=self._on_ws_open,
-            on_message=self._on_ws_message,
-            on_error=self._on_ws_error,
-            on_close=self._on_ws_close
-        )
+        self._message_buffer = message_buffer
+        self.messages = [] if message_buffer is None else message_buffer
+        self._max_id = None  # the highest id of the messages retrieved, kept once they are dropped from `messages`
+        self._ws_app = None
         self.__on_msg_receipt__ = None
         self.__p__ = None
+        self.keepalive_timeout = keepalive_timeout
+        self.sync_latency = LatencyHistogram()
+        self._last_frame = None
+        self._reconnect = False
 
     @property
     def secret(self):
@@ -137,28 +179,30 @@ class ClientManager(BaseManager):
     def device_id(self):
         return self.__device_id__
 
-    def login(self, email, password):
+    def login(self, email, password, **send_options):
         """
         Logs into the Pushover server with the user's email and password.  Retrieves a secret key, stores it, and then
         returns it.
 
         :param email: the users email
         :param password: the users password
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         :return:
         """
         params = {
             'email': email,
             'password': password
         }
-        self.latest_response_dict = send(self._login_url, data_out=params)
-        self.__secret__ = self.latest_response_dict['secret']
+        res = self.latest_response_dict = send(self._login_url, data_out=params, **self._options(send_options))
+        self.__secret__ = res['secret']
         return self.__secret__
 
-    def register_device(self, name):
+    def register_device(self, name, **send_options):
         """
         Registers the device (this client) with the name of `name`.  The devices id is then stored and returned.
 
         :param str name: Name of the device to register
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         :return string: device_id of the device registered
         """
         params = {
@@ -167,45 +211,65 @@ class ClientManager(BaseManager):
             'os': 'O'
         }
 
-        self.latest_response_dict = send(self._register_device_url, data_out=params)
-        self.__device_id__ = self.latest_response_dict['id']
+        res = self.latest_response_dict = send(
+            self._register_device_url, data_out=params, **self._options(send_options)
+        )
+        self.__device_id__ = res['id']
         return self.__device_id__
 
-    def retrieve_message(self):
+    def retrieve_message(self, **send_options):
         """
         Retrieves messages stored on the Pushover servers and saves them into the `messages` property.
+
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         """
         params = {
             'secret': self.__secret__,
             'device_id': self.__device_id__
         }
 
-        self.latest_response_dict = send(self._message_url, data_out=params, get_method=True)
-        self.messages = self.latest_response_dict['messages']
-
-    def clear_server_messages(self):
+        res = self.latest_response_dict = send(
+            self._message_url, data_out=params, get_method=True, **self._options(send_options)
+        )
+        ids = [message['id'] for message in res['messages'] if message.get('id') is not None]
+        if ids and (self._max_id is None or max(ids) > self._max_id):
+            self._max_id = max(ids)
+        if self._message_buffer is not None:
+            self._message_buffer.extend(res['messages'])
+        else:
+            self.messages = res['messages']
+
+    def clear_server_messages(self, **send_options):
         """
-        Clears the messages stored on Pushover servers.
+        Clears the messages stored on Pushover servers, up to the latest message retrieved, even once it was dropped
+        from the `messages` property.
+
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         """
-        if self.messages:
+        if self._max_id is not None:
             params = {
                 'secret': self.__secret__,
-                'message': max([i['id'] for i in self.messages])
+                'message': self._max_id
             }
 
-            self.latest_response_dict = send(self._del_message_url.format(device_id=self.__device_id__), params)
+            self.latest_response_dict = send(
+                self._del_message_url.format(device_id=self.__device_id__), params, **self._options(send_options)
+            )
 
-    def acknowledge_message(self, receipt):
+    def acknowledge_message(self, receipt, **send_options):
         """
         Sends an acknowledgement to the server that the message was read.
 
         :param receipt: receipt of the message to ack
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         """
         params = {
             'secret': self.__secret__
         }
 
-        self.latest_response_dict = send(self._ack_message_url.format(receipt_id=receipt), params)
+        self.latest_response_dict = send(
+            self._ack_message_url.format(receipt_id=receipt), params, **self._options(send_options)
+        )
 
     def listen(self, on_msg_receipt):
         """
@@ -215,7 +279,37 @@ class ClientManager(BaseManager):
         :param on_msg_receipt: function to call when a message is received
         """
         self.__on_msg_receipt__ = on_msg_receipt
-        self._ws_app.run_forever()
+        self._reconnect = True
+        while self._reconnect:
+            self._reconnect = False
+            self._ws_app = ws_app = websocket.WebSocketApp(
+                self._ws_connect_url,
+                on_open=self._on_ws_open,
+                on_message=self._on_ws_message,
+                on_error=self._on_ws_error,
+                on_close=self._on_ws_close
+            )
+            self._last_frame = time.time()
+            stopped = threading.Event()
+            watchdog = threading.Thread(target=self._watch_keepalives, args=(ws_app, stopped))
+            watchdog.daemon = True
+            watchdog.start()
+            try:
+                ws_app.run_forever()
+            finally:
+                stopped.set()
+
+    def _watch_keepalives(self, ws_app, stopped):
+        """
+        Closes the connection, to open a new one, once no frame has been received for `keepalive_timeout` seconds.
+        """
+        timeout = self.keepalive_timeout
+        while not stopped.wait(max(self._last_frame + timeout - time.time(), 0)):
+            if time.time() - self._last_frame >= timeout:
+                logging.warning("No keep-alive received for {} seconds, reconnecting...".format(timeout))
+                self._reconnect = True
+                ws_app.close()
+                return
 
     def listen_async(self, on_msg_receipt):
         """
@@ -260,20 +354,25 @@ class ClientManager(BaseManager):
         :param ws: the websocket
         :param message: message received from remote server
         """
-        message = message.decode("utf-8")
-        logging.debug("Message received: " + message)
-        if message == "#":
-            pass
+        self._last_frame = time.time()
+        if message == b"#" or message == "#":  # keep-alives are by far the most frequent frames
+            return
+
+        if isinstance(message, bytes):
+            message = message.decode("utf-8")
+        logging.debug("Message received: %s", message)
 
-        elif message == "!":
+        if message == "!":
+            start = time.time()
             self.retrieve_message()
+            self.sync_latency.record(time.time() - start)
             if self.__on_msg_receipt__:
                 self.__on_msg_receipt__(self.messages)
 
         elif message == "R":
             logging.info("Reconnecting to server (requested from server)...")
+            self._reconnect = True
             ws.close()
-            self.listen(self.__on_msg_receipt__)
 
         elif message == "E":
             logging.error("Server connection failure!")
@@ -290,7 +389,7 @@ class ClientManager(BaseManager):
         """
         logging.error('Error: ' + error)
 
-    def _on_ws_close(self, ws):
+    def _on_ws_close(self, ws, *args):
         """
         Function used when the websocket closes the connection to the remote server.
 
@@ -299,3 +398,276 @@ class ClientManager(BaseManager):
         logging.info("----Server Connection Closed----")
         self._ws_app = None
 
+
+class _DeviceSession(object):
+    """
+    A single device watched by the `ClientMultiplexer`.  Holds the manager used for syncing messages, the callback to
+    route messages to and the device's websocket.
+    """
+    __slots__ = ('manager', 'on_msg_receipt', 'ws', 'reconnect_at', 'last_frame', 'syncing', 'resync')
+
+    def __init__(self, manager, on_msg_receipt):
+        self.manager = manager
+        self.on_msg_receipt = on_msg_receipt
+        self.ws = None
+        self.reconnect_at = None
+        self.last_frame = None
+        self.syncing = False  # a message sync of the device is running on the executor
+        self.resync = False  # another sync was requested while it was running
+
+
+class ClientMultiplexer(object):
+    """
+    Listens for messages on many devices from a single thread.  Each device keeps its own websocket, login frame and
+    message sync, but all of the websockets are serviced by one `select` loop instead of one process per device.  The
+    message syncs (and the callbacks they call) run on a thread pool, so that a slow sync does not hold up the other
+    devices; the syncs of a single device never overlap.
+    """
+    _reconnect_delay = 5
+
+    def __init__(self, app_token, keepalive_timeout=90, executor=None, max_workers=4, **send_options):
+        """
+        :param str app_token: application id from Pushover API
+        :param float keepalive_timeout: (Optional) seconds without any frame from the server after which the connection
+                                        of a device is dropped and opened again
+        :param concurrent.futures.Executor executor: (Optional) the executor running the message syncs.  Defaults to a
+                                                     thread pool of `max_workers` threads.
+        :param int max_workers: (Optional) the number of threads of the default executor
+        :param send_options: (Optional) default options passed to `pypushover.send` for every message sync
+        """
+        self._app_token = app_token
+        self.keepalive_timeout = keepalive_timeout
+        self.sync_latency = LatencyHistogram()
+        self._send_options = send_options
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self._executor = executor
+        self._own_executor = executor is None
+        self._max_workers = max_workers
+        self._wake_r, self._wake_w = socket.socketpair()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+            return self._executor
+
+    @property
+    def device_ids(self):
+        with self._lock:
+            return list(self._sessions)
+
+    def add_device(self, secret, device_id, on_msg_receipt):
+        """
+        Adds a device to listen to.  When a message is received for this device, a call to the on_msg_receipt function
+          with a single parameter representing the messages received.  Devices can be added while the multiplexer is
+          running.
+
+        :param str secret: user secret of the device
+        :param str device_id: the device id
+        :param on_msg_receipt: function to call when a message is received for this device
+        :return ClientManager: the manager used to sync messages for this device
+        """
+        manager = ClientManager(self._app_token, secret=secret, device_id=device_id, **self._send_options)
+        session = _DeviceSession(manager, on_msg_receipt)
+        session.reconnect_at = 0
+        with self._lock:
+            if device_id in self._sessions:
+                raise ValueError('Device `{}` is already being listened to'.format(device_id))
+            self._sessions[device_id] = session
+        self._wake()
+        return session.manager
+
+    def remove_device(self, device_id):
+        """
+        Stops listening to the selected device and closes its connection.
+
+        :param str device_id: the device id to remove
+        """
+        with self._lock:
+            session = self._sessions.pop(device_id, None)
+        if session:
+            self._close(session)
+            self._wake()
+
+    def run(self):
+        """
+        Services every device until `stop` is called.  This is a blocking method.
+        """
+        self._running = True
+        try:
+            while self._running:
+                self._loop_once()
+        finally:
+            with self._lock:
+                sessions = list(self._sessions.values())
+            for session in sessions:
+                self._close(session)
+            with self._lock:
+                executor, self._executor = (self._executor, None) if self._own_executor else (None, self._executor)
+            if executor is not None:
+                executor.shutdown(wait=False)  # a callback may be the one stopping the multiplexer
+
+    def run_async(self):
+        """
+        Creates a Thread that services every device until `stop` is called.
+        """
+        self._thread = threading.Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops listening on all devices.
+        """
+        self._running = False
+        self._wake()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b'\0')
+        except socket.error:
+            pass
+
+    def _loop_once(self):
+        now = time.time()
+        by_fd = {}
+        next_reconnect = None
+        with self._lock:
+            sessions = list(self._sessions.values())
+
+        for session in sessions:
+            if session.ws is None:
+                if session.reconnect_at <= now:
+                    self._connect(session)
+                else:
+                    next_reconnect = min(next_reconnect or session.reconnect_at, session.reconnect_at)
+            if session.ws is not None:
+                by_fd[session.ws.fileno()] = session
+
+        next_keepalive = self._check_keepalives(by_fd, now)
+        deadlines = [deadline for deadline in (next_reconnect, next_keepalive) if deadline]
+        timeout = max(min(deadlines) - now, 0) if deadlines else None
+        readable, _, _ = select.select(list(by_fd) + [self._wake_r], [], [], timeout)
+
+        for fd in readable:
+            if fd is self._wake_r:
+                self._wake_r.recv(4096)
+            elif fd in by_fd:
+                try:
+                    self._service(by_fd[fd])
+                except Exception:
+                    # a failing device must not stop the others
+                    logging.exception("Failed to service device {}".format(by_fd[fd].manager.device_id))
+
+    def _check_keepalives(self, by_fd, now):
+        """
+        Drops the connections that have not received any frame for `keepalive_timeout` seconds, to reconnect them right
+        away.  Returns the time at which the next connection would time out.
+        """
+        next_timeout = None
+        for fd, session in list(by_fd.items()):
+            timeout_at = session.last_frame + self.keepalive_timeout
+            if timeout_at <= now:
+                logging.warning("No keep-alive received for device {}, reconnecting...".format(
+                    session.manager.device_id
+                ))
+                self._close(session)
+                session.reconnect_at = now
+                del by_fd[fd]
+            elif next_timeout is None or timeout_at < next_timeout:
+                next_timeout = timeout_at
+        return next_timeout
+
+    def _connect(self, session):
+        manager = session.manager
+        try:
+            session.ws = websocket.create_connection(manager._ws_connect_url)
+            session.ws.send(manager._ws_login.format(device_id=manager.device_id, secret=manager.secret))
+            session.last_frame = time.time()
+            logging.info("----Server Connection Established ({})----".format(manager.device_id))
+        except (websocket.WebSocketException, socket.error) as e:
+            logging.error("Connection failure for device {}: {}".format(manager.device_id, e))
+            self._close(session)
+            session.reconnect_at = time.time() + self._reconnect_delay
+
+    def _close(self, session):
+        if session.ws is not None:
+            try:
+                session.ws.close()
+            except (websocket.WebSocketException, socket.error):
+                pass
+            session.ws = None
+
+    def _service(self, session):
+        """
+        Reads every frame available on the device's websocket.  Frames already decrypted by the SSL layer do not make
+        the socket readable again, so these are drained as well.
+        """
+        while session.ws is not None:
+            try:
+                frame = session.ws.recv()
+            except (websocket.WebSocketException, socket.error) as e:
+                logging.error("Connection lost for device {}: {}".format(session.manager.device_id, e))
+                self._close(session)
+                session.reconnect_at = time.time() + self._reconnect_delay
+                return
+
+            session.last_frame = time.time()
+            self._on_frame(session, frame)
+
+            sock = session.ws.sock if session.ws is not None else None
+            if not (hasattr(sock, 'pending') and sock.pending()):
+                return
+
+    def _on_frame(self, session, frame):
+        """
+        Handles a single frame for a device.  See `ClientManager._on_ws_message` for the meaning of each frame.
+        """
+        if frame == b'#' or frame == '#':
+            return
+
+        if frame in (b'!', '!'):
+            with self._lock:
+                if session.syncing:
+                    session.resync = True
+                    return
+                session.syncing = True
+            self.executor.submit(self._sync, session)
+
+        elif frame in (b'R', 'R'):
+            logging.info("Reconnecting device {} (requested from server)...".format(session.manager.device_id))
+            self._close(session)
+            session.reconnect_at = 0
+
+        elif frame in (b'E', 'E'):
+            logging.error("Server connection failure for device {}!".format(session.manager.device_id))
+            self.remove_device(session.manager.device_id)
+
+        elif frame:
+            logging.error("Unexpected frame for device {}: {!r}".format(session.manager.device_id, frame))
+
+    def _sync(self, session):
+        """
+        Syncs the messages of a device, again for as long as new messages were announced meanwhile.
+        """
+        while True:
+            start = time.time()
+            try:
+                session.manager.retrieve_message()
+                self.sync_latency.record(time.time() - start)
+                if session.on_msg_receipt:
+                    session.on_msg_receipt(session.manager.messages)
+            except Exception:
+                logging.exception("Message sync failed for device {}".format(session.manager.device_id))
+            with self._lock:
+                if not session.resync:
+                    session.syncing = False
+                    return
+                session.resync = False
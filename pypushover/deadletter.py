@@ -0,0 +1,292 @@
+"""
+=========================================================
+deadletter - Invalid Recipients and Undelivered Messages
+=========================================================
+
+Messages sent to an invalid user key, or to a device that is not valid for its user, fail with a ``PushoverError``
+however many times they are sent again.  This module defines:
+
+* ``Blocklist``: the recipients the Pushover servers refused, kept for a time so that messages to them are not sent
+  again.  Messages sent through a registry to a blocked recipient raise a ``BlockedRecipientError`` locally.
+* ``DeadLetterStore``: the messages that could not be sent, along with their errors, to inspect or send again.
+
+Both are given to an ``AppRegistry``, and apply to every message sent through it:
+
+    >>> import pypushover as pypo
+    >>> apps = pypo.registry.AppRegistry(blocklist=pypo.deadletter.Blocklist(ttl=86400),
+    ...                                  dead_letters=pypo.deadletter.DeadLetterStore('/var/lib/myapp/dead.db'))
+    >>> alerts = apps.message_manager('<app token>')
+    >>> alerts.push_message('Disk full', user='<invalid user key>')  # raises PushoverError, blocks the key
+    >>> alerts.push_message('Disk full', user='<invalid user key>')  # raises BlockedRecipientError, no call made
+    >>> for letter in apps.dead_letters.letters():
+    ...     print(letter.user, letter.errors)
+    >>> apps.dead_letters.resend(letter.id, registry=apps)
+
+Only the errors naming the recipient as invalid or disabled block it (see ``recipient_error``): messages failing for
+any other reason are only kept as dead letters.  Messages refused locally (``BlockedRecipientError``,
+``CircuitOpenError``, ...) never reached the Pushover servers and are not kept.  Attachments are not kept with the
+dead letters.
+"""
+
+__all__ = ('Blocklist', 'DeadLetter', 'DeadLetterStore', 'recipient_error')
+
+import collections
+import json
+import re
+import threading
+import time
+
+from pypushover._base import BlockedRecipientError, base_url, send
+
+_refused = re.compile(r'\b(?:invalid|not valid|disabled|not found)\b', re.IGNORECASE)
+
+
+def recipient_error(error):
+    """
+    Tells whether the error is a permanent error of the recipient of a message: an invalid or disabled user or group
+    key, or a device name not valid for the user.
+
+    :param Exception error: the error raised when sending the message
+    :return str: 'user' or 'device' if the error is a permanent error of that recipient, None otherwise
+    """
+    response = getattr(error, 'response', None)
+    if isinstance(error, BlockedRecipientError) or response is None or not 400 <= response.status_code < 500:
+        return None
+    try:
+        fields = response.data
+    except (AttributeError, ValueError):
+        return None
+    for field in ('user', 'device'):
+        if fields.get(field) == 'invalid':
+            return field
+    for message in fields.get('errors') or ():
+        for field in ('device', 'user'):  # 'device name is not valid for user' is an error of the device
+            if field in message.lower() and _refused.search(message):
+                return field
+    return None
+
+
+class Blocklist(object):
+    """
+    The recipients refused by the Pushover servers, each blocked for `ttl` seconds.
+    """
+
+    def __init__(self, ttl=86400, capacity=10000):
+        """
+        :param float ttl: seconds a recipient stays blocked
+        :param int capacity: the maximum number of recipients blocked, the oldest ones being dropped first
+        """
+        self.ttl = ttl
+        self.capacity = capacity
+        self._blocked = collections.OrderedDict()  # reason and expiry of each (user, device), oldest first
+        self._lock = threading.Lock()
+
+    def add(self, user, device=None, reason=None, ttl=None):
+        """
+        Blocks a user or group key, or only one of its devices.
+
+        :param str user: the user or group key
+        :param str device: the device name (or comma separated names), None to block every device
+        :param str reason: why the recipient is blocked
+        :param float ttl: seconds the recipient stays blocked, defaults to the `ttl` of the blocklist
+        """
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._blocked.pop((user, device), None)
+            self._blocked[(user, device)] = reason or 'recipient blocked', expires_at
+            while len(self._blocked) > self.capacity:
+                self._blocked.popitem(last=False)
+
+    def blocked(self, user, device=None):
+        """
+        :param str user: the user or group key
+        :param str device: the device name (or comma separated names) the message is sent to, if any
+        :return str: the reason the recipient is blocked, or None if it is not
+        """
+        now = time.time()
+        with self._lock:
+            for key in ((user, None), (user, device)) if device else ((user, None), ):
+                entry = self._blocked.get(key)
+                if entry is not None:
+                    if entry[1] > now:
+                        return entry[0]
+                    del self._blocked[key]
+        return None
+
+    def remove(self, user, device=None):
+        """
+        Unblocks a recipient blocked with `add`.
+
+        :return bool: True if the recipient was blocked
+        """
+        with self._lock:
+            return self._blocked.pop((user, device), None) is not None
+
+    def entries(self):
+        """
+        :return list: the (user, device, reason, expires_at) of the recipients blocked
+        """
+        now = time.time()
+        with self._lock:
+            return [key + entry for key, entry in self._blocked.items() if entry[1] > now]
+
+    def clear(self):
+        with self._lock:
+            self._blocked.clear()
+
+    def __len__(self):
+        return len(self.entries())
+
+    def __contains__(self, user):
+        return self.blocked(user) is not None
+
+
+class DeadLetter(object):
+    """
+    A message that could not be sent.
+    """
+    __slots__ = ('id', 'failed_at', 'token', 'user', 'fields', 'error', 'errors', 'status_code', 'request_id')
+
+    def __init__(self, id, failed_at, fields, error, errors, status_code, request_id):
+        self.id = id
+        self.failed_at = failed_at
+        self.token = fields.get('token')
+        self.user = fields.get('user')
+        self.fields = fields
+        self.error = error
+        self.errors = errors
+        self.status_code = status_code
+        self.request_id = request_id
+
+    def __repr__(self):
+        return '<DeadLetter {} to {}: {}>'.format(self.id, self.user, self.error)
+
+
+class DeadLetterStore(object):
+    """
+    Keeps the messages that could not be sent in a SQLite database, in memory by default.
+    """
+
+    def __init__(self, path=':memory:', capacity=10000):
+        """
+        :param str path: a SQLite database the dead letters are persisted to
+        :param int capacity: the maximum number of dead letters kept, the oldest ones being dropped first
+        """
+        import sqlite3  # only loaded once dead letters are kept, not by every `import pypushover`
+        self.capacity = capacity
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute('CREATE TABLE IF NOT EXISTS dead_letters (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                             'failed_at REAL, fields TEXT, error TEXT, errors TEXT, status_code INTEGER, '
+                             'request_id TEXT)')
+            self._db.commit()
+
+    def add(self, fields, error):
+        """
+        Keeps a message that could not be sent.
+
+        :param dict fields: the fields of the message, as sent
+        :param Exception error: the error raised when sending the message
+        :return int: the id of the dead letter
+        """
+        response = getattr(error, 'response', None)
+        status_code = getattr(response, 'status_code', None)
+        try:
+            errors = getattr(response, 'errors', None)
+            request_id = getattr(response, 'request_id', None)
+        except ValueError:
+            errors = request_id = None
+        if errors is None:
+            errors = getattr(error, 'message', None)
+        if not isinstance(errors, list):
+            errors = [str(errors if errors is not None else error)]
+
+        with self._lock:
+            cursor = self._db.execute('INSERT INTO dead_letters (failed_at, fields, error, errors, status_code, '
+                                      'request_id) VALUES (?, ?, ?, ?, ?, ?)', (
+                time.time(), json.dumps(dict(fields), default=str), type(error).__name__, json.dumps(errors),
+                status_code, request_id
+            ))
+            self._db.execute('DELETE FROM dead_letters WHERE id <= ?', (cursor.lastrowid - self.capacity, ))
+            self._db.commit()
+            return cursor.lastrowid
+
+    def letters(self, user=None, limit=None):
+        """
+        Lists the dead letters, oldest first.
+
+        :param str user: only list the messages sent to this user or group key
+        :param int limit: the maximum number of dead letters listed
+        :return list: the `DeadLetter`s
+        """
+        query = 'SELECT id, failed_at, fields, error, errors, status_code, request_id FROM dead_letters'
+        params = []
+        if user is not None:
+            query += " WHERE json_extract(fields, '$.user') = ?"
+            params.append(user)
+        query += ' ORDER BY id'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [self._letter(row) for row in rows]
+
+    def get(self, letter_id):
+        """
+        :param int letter_id: the id of the dead letter
+        :return DeadLetter: the dead letter, or None if it was not found
+        """
+        with self._lock:
+            row = self._db.execute('SELECT id, failed_at, fields, error, errors, status_code, request_id '
+                                   'FROM dead_letters WHERE id = ?', (letter_id, )).fetchone()
+        return self._letter(row) if row else None
+
+    def remove(self, letter_id):
+        """
+        :param int letter_id: the id of the dead letter
+        :return bool: True if the dead letter was removed, False if it was not found
+        """
+        with self._lock:
+            removed = self._db.execute('DELETE FROM dead_letters WHERE id = ?', (letter_id, )).rowcount
+            self._db.commit()
+        return removed > 0
+
+    def resend(self, letter_id, **send_options):
+        """
+        Sends a dead letter again, and removes it once sent.
+
+        :param int letter_id: the id of the dead letter
+        :param send_options: options passed to `pypushover.send`, such as `registry`
+        :return PushoverResponse: the response of the message
+        :raises KeyError: if the dead letter was not found
+        """
+        letter = self.get(letter_id)
+        if letter is None:
+            raise KeyError(letter_id)
+        res = send(base_url + 'messages.json', data_out=letter.fields, **send_options)
+        self.remove(letter_id)
+        return res
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM dead_letters')
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM dead_letters').fetchone()[0]
+
+    def __iter__(self):
+        return iter(self.letters())
+
+    @staticmethod
+    def _letter(row):
+        letter_id, failed_at, fields, error, errors, status_code, request_id = row
+        return DeadLetter(letter_id, failed_at, json.loads(fields), error, json.loads(errors), status_code,
+                          request_id)
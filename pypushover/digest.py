@@ -0,0 +1,234 @@
+"""
+============================================================
+digest - Summarizing Low Priority Messages into Single Pushes
+============================================================
+
+This module defines the ``DigestManager``, buffering informational messages and sending them as a single summarized
+push instead of one push each, saving the monthly quota of the app.
+
+Messages of the digested priorities (``LOWEST`` and ``LOW`` by default) are buffered by recipient, device and priority.
+Each buffer is sent as one push once its time window ends, once it holds ``max_messages`` messages, or once adding a
+message would make the summary longer than Pushover's message length limit.  Messages of other priorities are sent
+right away.
+
+    >>> import pypushover as pypo
+    >>> pm = pypo.message.MessageManager('<app_token>', '<group/user key>')
+    >>> digest = pypo.digest.DigestManager(pm, window=300, max_messages=20)
+    >>> digest.push_message('Backup done', title='nightly', priority=pypo.PRIORITIES.LOW)
+    >>> digest.push_message('Cache warmed', priority=pypo.PRIORITIES.LOW)
+    >>> digest.push_message('Disk full', priority=pypo.PRIORITIES.HIGH)  # sent right away
+
+Five minutes later, one push titled ``2 notifications`` is sent with both messages, one per line.  Call ``flush`` to
+send every buffered message right away, and ``close`` to do so and stop the digest.
+
+A summarized message only keeps its ``user``, ``device``, ``priority`` and ``title``: other arguments (``url``,
+``sound``, ``attachment``, ...) are refused with a ``TypeError``.  A summary that could not be sent because of a
+connection error, a timeout or a server error is buffered again and sent with the next window.  Summaries refused by
+the Pushover servers are not: send them through an ``AppRegistry`` with a ``DeadLetterStore`` to keep them.
+"""
+
+__all__ = ('DigestManager', )
+
+import logging
+import threading
+import time
+
+from pypushover.Constants import PRIORITIES
+from pypushover._base import BlockedRecipientError, ValidationError
+from pypushover.validation import MAX_MESSAGE_LENGTH
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+_kept_arguments = frozenset(('user', 'device', 'priority', 'title'))
+
+
+class _Digest(object):
+    __slots__ = ('key', 'recipient', 'lines', 'length', 'due')
+
+    def __init__(self, key, due):
+        self.key = key
+        self.recipient = key  # the (user, device, priority) of the summary
+        self.lines = []
+        self.length = 0
+        self.due = due
+
+
+def _unsent(error):
+    """
+    Whether a summary failed without the Pushover servers refusing it, so that sending it again later can succeed.
+    """
+    status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    return not isinstance(error, (ValidationError, BlockedRecipientError))
+
+
+class DigestManager(object):
+    """
+    Buffers the low priority messages of a `MessageManager` and sends them as periodic summaries.
+    """
+
+    def __init__(self, manager, window=60, max_messages=50, priorities=(PRIORITIES.LOWEST, PRIORITIES.LOW),
+                 title='{count} notifications'):
+        """
+        :param message.MessageManager manager: the manager sending the messages and their summaries
+        :param float window: seconds a message is buffered before its summary is sent
+        :param int max_messages: the number of messages after which a summary is sent before the end of its window
+        :param tuple priorities: the priorities of the messages that are summarized
+        :param str title: the title of the summaries, formatted with the `count` of messages
+        """
+        self.manager = manager
+        self.window = window
+        self.max_messages = max_messages
+        self.priorities = frozenset(priorities)
+        self.title = title
+        self._digests = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._requeued = 0
+
+    def push_message(self, message, **kwargs):
+        """
+        Buffers the message if its priority is summarized, or sends it right away otherwise.  Takes the arguments of
+        `MessageManager.push_message`; only the `user`, `device`, `priority` and `title` of a summarized message are
+        kept.
+
+        :return PushoverResponse: the response of the message if it was sent right away, or None if it was buffered
+        :raises TypeError: if a summarized message is given other arguments, which the summary would drop
+        """
+        priority = kwargs.get('priority', PRIORITIES.NORMAL)
+        if priority not in self.priorities:
+            return self.manager.push_message(message, **kwargs)
+        dropped = sorted(k for k, v in kwargs.items() if k not in _kept_arguments and v is not None)
+        if dropped:
+            raise TypeError('Summarized messages only keep their user, device, priority and title, not: {}'.format(
+                ', '.join(dropped)))
+
+        device = kwargs.get('device')
+        key = (kwargs.get('user'), ','.join(device) if isinstance(device, list) else device, priority)
+        line = u'{}: {}'.format(kwargs['title'], message) if kwargs.get('title') else message
+        line = line if len(line) <= MAX_MESSAGE_LENGTH else line[:MAX_MESSAGE_LENGTH - 1] + u'\u2026'
+
+        full = []
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Cannot push messages to a closed digest')
+            digest = self._digests.get(key)
+            if digest is not None and digest.length + 1 + len(line) > MAX_MESSAGE_LENGTH:
+                full.append(self._digests.pop(key))
+                digest = None
+            if digest is None:
+                digest = self._digests[key] = _Digest(key, time.time() + self.window)
+                self._start()
+                self._cond.notify()
+            digest.length += len(line) + (1 if digest.lines else 0)
+            digest.lines.append(line)
+            if len(digest.lines) >= self.max_messages:
+                full.append(self._digests.pop(key))
+
+        for digest in full:
+            self._send_logged(digest)
+        return None
+
+    def pending(self):
+        """
+        :return int: the number of messages buffered
+        """
+        with self._cond:
+            return sum(len(digest.lines) for digest in self._digests.values())
+
+    def flush(self):
+        """
+        Sends the summaries of every buffered message right away.  Stops at the first summary that could not be sent,
+        buffering again the summaries not sent yet, and the failed one unless the Pushover servers refused it.
+
+        :return list: the responses of the summaries sent
+        """
+        with self._cond:
+            digests = list(self._digests.values())
+            self._digests.clear()
+        responses = []
+        for i, digest in enumerate(digests):
+            try:
+                responses.append(self._send(digest))
+            except Exception as e:
+                if _unsent(e):
+                    self._requeue(digest, time.time() + self.window)
+                for unsent in digests[i + 1:]:
+                    self._requeue(unsent, unsent.due)
+                raise
+        return responses
+
+    def close(self):
+        """
+        Sends the buffered messages and stops the digest.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        responses = self.flush()
+        if self._thread is not None:
+            self._thread.join()
+        return responses
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='pypushover-digest')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    now = time.time()
+                    due = [d for d in self._digests.values() if d.due <= now]
+                    if due:
+                        break
+                    if self._digests:
+                        self._cond.wait(min(d.due for d in self._digests.values()) - now)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+                for digest in due:
+                    del self._digests[digest.key]
+
+            for digest in due:
+                self._send_logged(digest)
+
+    def _send_logged(self, digest):
+        """
+        Sends the summary, logging the error if it fails, and buffering it again for the next window if it can still be
+        sent.
+        """
+        try:
+            self._send(digest)
+        except Exception as e:
+            logging.exception('Failed to send the digest of {} messages'.format(len(digest.lines)))
+            if _unsent(e):
+                self._requeue(digest, time.time() + self.window)
+
+    def _requeue(self, digest, due):
+        """
+        Buffers a summary again, apart from the messages buffered since for the same recipient so that neither goes past
+        the limits of a summary.
+        """
+        with self._cond:
+            self._requeued += 1
+            digest.key = ('requeued', self._requeued)
+            digest.due = due
+            self._digests[digest.key] = digest
+            if not self._closed:
+                self._start()
+                self._cond.notify()
+
+    def _send(self, digest):
+        user, device, priority = digest.recipient
+        kwargs = {'priority': priority, 'title': self.title.format(count=len(digest.lines))}
+        if user is not None:
+            kwargs['user'] = user
+        if device is not None:
+            kwargs['device'] = device
+        return self.manager.push_message(u'\n'.join(digest.lines), **kwargs)
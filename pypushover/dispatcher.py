@@ -0,0 +1,292 @@
+"""
+========================================================
+dispatcher - Sending Messages from Many Worker Processes
+========================================================
+
+This module defines the ``ShardedDispatcher``, spreading the messages sent by a single front end over several worker
+processes.  Each worker has its own connection pool and sends several messages at the same time, so that throughput
+is not capped by a single process.
+
+Messages are sharded over the workers by recipient: the messages sent to the same user or group key are always sent by
+the same worker.  ``submit`` returns a ``concurrent.futures.Future`` of the response:
+
+    >>> import pypushover as pypo
+    >>> import pypushover.dispatcher
+    >>> with pypo.dispatcher.ShardedDispatcher(processes=4, rate=50) as dispatcher:
+    ...     futures = [dispatcher.submit('<app token>', user, 'Maintenance tonight') for user in users]
+    ...     results = [future.result() for future in futures]
+
+Shared Rate Limits:
+-------------------
+The rate limit of each app token is kept in shared memory: every worker draws a message from it before sending one,
+and brings it back in line with the headers of its responses.  The workers pace their messages together to ``rate``
+messages per second for each app token, and once the monthly limit of an app is used up, its messages fail with a
+``PushoverError`` without being sent.
+
+    >>> dispatcher.rate_limit('<app token>').remaining
+
+The options passed to the workers' calls (``timeout``, ``retry_policy``, ...) and the arguments of each message are sent
+to the worker processes, so they must be picklable: ``submit`` raises the pickling error otherwise.  ``registry`` and
+``deadline`` options are not supported.  The messages of a worker process that exits unexpectedly fail with a
+``RuntimeError``.
+"""
+
+__all__ = ('ShardedDispatcher', )
+
+import itertools
+import multiprocessing
+import pickle
+import queue as _queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from pypushover._base import PushoverError
+from pypushover.registry import RateLimit
+from pypushover.response import PushoverResponse
+
+# fields of the shared state of each app token
+_LIMIT, _REMAINING, _RESET, _NEXT = range(4)
+_FIELDS = 4
+_UNKNOWN = -1.0
+_LIVENESS_INTERVAL = 1.0  # seconds between two checks of the worker processes while no result comes in
+
+
+class ShardedDispatcher(object):
+    """
+    Sends messages from a pool of worker processes sharing the rate limit state of each app token.
+    """
+
+    def __init__(self, processes=None, threads=8, rate=None, max_apps=64, transport_factory=None, context=None,
+                 **send_options):
+        """
+        :param int processes: the number of worker processes (defaults to the number of CPUs)
+        :param int threads: the number of messages each worker sends at the same time
+        :param float rate: the maximum number of messages sent per second for each app token, by all the workers
+        :param int max_apps: the maximum number of app tokens messages are sent for
+        :param transport_factory: a picklable callable creating the transport of each worker.  Defaults to a
+                                  `transport.RequestsTransport` with a pool of `threads` connections.
+        :param context: the `multiprocessing` context starting the workers (the default context otherwise)
+        :param send_options: options passed to `pypushover.send` for every message, such as `timeout`
+        """
+        unsupported = set(send_options) & {'registry', 'deadline'}
+        if unsupported:
+            raise TypeError('Unsupported arguments: {}'.format(', '.join(sorted(unsupported))))
+
+        context = context or multiprocessing.get_context()
+        self.processes = processes or multiprocessing.cpu_count()
+        self._state = context.Array('d', [_UNKNOWN] * (max_apps * _FIELDS))
+        self._slots = {}
+        self._futures = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._results = context.Queue()
+        self._queues = []
+        self._workers = []
+        interval = 1.0 / rate if rate else 0
+        for shard in range(self.processes):
+            queue = context.Queue()
+            worker = context.Process(target=_worker, args=(shard, queue, self._results, self._state, interval, threads,
+                                                           transport_factory, send_options))
+            worker.daemon = True
+            worker.start()
+            self._queues.append(queue)
+            self._workers.append(worker)
+
+        self._collector = threading.Thread(target=self._collect)
+        self._collector.daemon = True
+        self._collector.start()
+
+    def submit(self, token, user, message, **kwargs):
+        """
+        Sends a message from one of the workers.
+
+        :param str token: application token
+        :param str user: user or group id to send the message to
+        :param str message: your message
+        :param kwargs: the other arguments of `message.push_message`
+        :return concurrent.futures.Future: the future `PushoverResponse` of the message
+        :raises RuntimeError: if the dispatcher is closed, or the worker process of the recipient has exited
+        """
+        future = Future()
+        shard = zlib.crc32(user.encode('utf-8')) % self.processes
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Cannot submit messages to a closed dispatcher')
+            if not self._workers[shard].is_alive():
+                raise RuntimeError('The worker process {} has exited'.format(shard))
+            slot = self._slot(token)
+            job_id = next(self._ids)
+            # pickled here rather than by the feeder thread of the queue, which would drop the job on errors
+            job = pickle.dumps((job_id, slot, token, user, message, kwargs))
+            self._futures[job_id] = future, shard
+            self._queues[shard].put(job)
+        return future
+
+    def _slot(self, token):
+        slot = self._slots.get(token)
+        if slot is None:
+            if len(self._slots) * _FIELDS >= len(self._state):
+                raise ValueError('Messages can only be sent for {} app tokens'.format(len(self._state) // _FIELDS))
+            slot = self._slots[token] = len(self._slots)
+        return slot
+
+    def rate_limit(self, token):
+        """
+        Returns the rate limit of the app token shared by the workers.  Its values are None until a response to a
+        message of the app token has been received.
+
+        :param str token: the application token
+        :return registry.RateLimit:
+        """
+        with self._lock:
+            slot = self._slots.get(token)
+        if slot is None:
+            return RateLimit()
+        with self._state.get_lock():
+            values = self._state[slot * _FIELDS:slot * _FIELDS + _RESET + 1]
+        return RateLimit(*(int(v) if v != _UNKNOWN else None for v in values))
+
+    def _collect(self):
+        stopped = set()
+        while len(stopped) < self.processes:
+            try:
+                job_id, error, response = self._results.get(timeout=_LIVENESS_INTERVAL)
+            except _queue.Empty:
+                self._check_workers(stopped)
+                continue
+            if job_id is None:
+                stopped.add(error)  # the shard of the worker
+                continue
+            with self._lock:
+                entry = self._futures.pop(job_id, None)
+            if entry is None:
+                continue  # a late result of a message already failed by `_check_workers`
+            future = entry[0]
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(PushoverResponse(*response))
+
+    def _check_workers(self, stopped):
+        """
+        Fails the messages of the workers that exited without stopping.
+        """
+        for shard, worker in enumerate(self._workers):
+            if shard in stopped or worker.is_alive():
+                continue
+            stopped.add(shard)
+            with self._lock:
+                lost = [job_id for job_id, (_, job_shard) in self._futures.items() if job_shard == shard]
+                futures = [entry[0] for entry in (self._futures.pop(job_id, None) for job_id in lost) if entry]
+            for future in futures:
+                future.set_exception(RuntimeError('The worker process {} exited with code {}'.format(
+                    shard, worker.exitcode)))
+
+    def close(self, wait=True):
+        """
+        Stops the workers once they have sent the messages already submitted.
+
+        :param bool wait: wait for the workers to stop
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for queue in self._queues:
+            queue.put(None)
+        if wait:
+            self._collector.join()
+            for worker in self._workers:
+                worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _worker(shard, queue, results, state, interval, threads, transport_factory, send_options):
+    """
+    Runs in each worker process: sends the messages of `queue` and puts their results on `results`.
+    """
+    from pypushover.message import push_message
+    from pypushover.transport import RequestsTransport
+
+    transport = transport_factory() if transport_factory is not None else RequestsTransport(pool_size=threads)
+    executor = ThreadPoolExecutor(max_workers=threads)
+
+    def send(job):
+        job_id, slot, token, user, message, kwargs = pickle.loads(job)
+        reserved = False
+        try:
+            reserved = _reserve(state, slot, interval)
+            kwargs.update(send_options)
+            res = push_message(token, user, message, transport=transport, **kwargs)
+            _update(state, slot, res.headers)
+            results.put((job_id, None, (res.content, res.status_code, dict(res.headers))))
+        except Exception as e:
+            if reserved:
+                _release(state, slot)
+            results.put((job_id, _picklable(e), None))
+
+    for job in iter(queue.get, None):
+        executor.submit(send, job)
+
+    executor.shutdown(wait=True)
+    transport.close()
+    results.put((None, shard, None))
+
+
+def _reserve(state, slot, interval):
+    """
+    Fails if the monthly limit of the app is used up, draws the message from it, then waits for the next time slot of
+    the app.  Returns whether a message was drawn from a known limit.
+    """
+    base = slot * _FIELDS
+    with state.get_lock():
+        now = time.time()
+        known = state[base + _REMAINING] != _UNKNOWN and state[base + _RESET] > now
+        if known:
+            if state[base + _REMAINING] <= 0:
+                raise PushoverError(['monthly message limit of the app reached until {}'.format(
+                    int(state[base + _RESET]))])
+            state[base + _REMAINING] -= 1
+        next_slot = max(state[base + _NEXT], now)
+        state[base + _NEXT] = next_slot + interval
+    if next_slot > now:
+        time.sleep(next_slot - now)
+    return known
+
+
+def _release(state, slot):
+    with state.get_lock():
+        state[slot * _FIELDS + _REMAINING] += 1
+
+
+def _update(state, slot, headers):
+    if 'X-Limit-App-Remaining' not in headers:
+        return
+    base = slot * _FIELDS
+    remaining = float(headers['X-Limit-App-Remaining'])
+    with state.get_lock():
+        reset = float(headers.get('X-Limit-App-Reset', state[base + _RESET]))
+        # within the same period, the messages drawn by other sends since this response are kept drawn
+        if state[base + _REMAINING] == _UNKNOWN or reset != state[base + _RESET] \
+                or remaining < state[base + _REMAINING]:
+            state[base + _REMAINING] = remaining
+        if 'X-Limit-App-Limit' in headers:
+            state[base + _LIMIT] = float(headers['X-Limit-App-Limit'])
+        state[base + _RESET] = reset
+
+
+def _picklable(error):
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return PushoverError(repr(error))
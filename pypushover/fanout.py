@@ -0,0 +1,217 @@
+"""
+=====================================================
+fanout - Sending One Message to Many Users at Once
+=====================================================
+
+This module defines ``FanOut``, sending the same message to many users with a single push to a delivery group instead
+of one push per user.
+
+``FanOut`` manages a pool of delivery groups.  When a message is sent to a set of users, the group whose members are
+that set is pushed to.  Otherwise the group closest to the set is updated with ``groups.add_user`` and
+``groups.remove_user``, when that costs fewer calls than pushing to each user or when the same users were sent a message
+before.  The members of each group, and the group chosen for each set of users, are cached: sending again to the same
+users only costs the single group push.
+
+    >>> import pypushover as pypo
+    >>> fan = pypo.fanout.FanOut('<app token>', group_keys=['<group key>', '<other group key>'])
+    >>> fan.push_message(['<user key>', '<other user key>', '<third user key>'], 'Deploy started')
+    >>> fan.push_message(['<user key>', '<other user key>', '<third user key>'], 'Deploy done')  # one call
+
+Users that cannot be added to a group (invalid keys, ...) are pushed to one by one.  Users disabled in a group are
+enabled again (with ``groups.enable_user``) when the message is for them.
+
+New delivery groups are created (with ``groups.create``) as needed, up to ``max_groups`` groups.  The groups should only
+be managed by the ``FanOut``: members added or removed by other means are not seen until ``refresh`` is called.
+"""
+
+__all__ = ('FanOut', )
+
+import collections
+import threading
+
+from pypushover import groups
+from pypushover._base import BaseManager, PushoverError, _send_options
+from pypushover.message import push_message
+
+_MAX_SEEN = 1024  # recipient sets remembered to tell the ones sent to repeatedly
+
+
+class FanOut(BaseManager):
+    """
+    Sends messages to many users through a pool of managed delivery groups.
+    """
+
+    def __init__(self, app_token, group_keys=(), max_groups=10, min_recipients=3, name='pypushover fan-out {}',
+                 **send_options):
+        """
+        :param str app_token: Application token generated from PushOver site
+        :param group_keys: the keys of existing groups used for delivery
+        :param int max_groups: the maximum number of delivery groups, existing and created
+        :param int min_recipients: the number of users under which messages are pushed to each user
+        :param str name: the name of the groups created, formatted with the number of the group
+        :param send_options: default options passed to `send` for every call made by the manager
+        """
+        super(FanOut, self).__init__(app_token, **send_options)
+        self.max_groups = max(max_groups, len(group_keys))
+        self.min_recipients = min_recipients
+        self.name = name
+        self._members = collections.OrderedDict((key, None) for key in group_keys)  # least recently used first
+        self._disabled = {}  # the users disabled in each group
+        self._routes = {}  # the group, and the users missing from it, of each set of users
+        self._seen = collections.OrderedDict()
+        self._creating = 0
+        self._lock = threading.Lock()  # guards the state above, never held during calls to the Pushover servers
+        self._group_locks = collections.defaultdict(threading.Lock)  # held while a group is updated and pushed to
+
+    def push_message(self, users, message, **kwargs):
+        """
+        Sends the message to every user, with a single group push when possible.
+
+        :param users: the user keys to send the message to
+        :param str message: your message
+        :param kwargs: the other arguments of `message.push_message`
+        :return list: the responses of the pushes sent
+        """
+        users = frozenset(users)
+        if len(users) < self.min_recipients:
+            return [self._push(user, message, kwargs) for user in sorted(users)]
+
+        send_options = self._options(dict((k, v) for k, v in kwargs.items() if k in _send_options))
+        group = self._delivery_group(users, send_options)
+        if group is None:
+            return [self._push(user, message, kwargs) for user in sorted(users)]
+        with self._lock:
+            group_lock = self._group_locks[group]
+        # the members of the group must stay the same until it is pushed to
+        with group_lock:
+            missing = self._update_members(group, users, send_options)
+            responses = [self._push(group, message, kwargs)]
+        return responses + [self._push(user, message, kwargs) for user in sorted(missing)]
+
+    def groups(self):
+        """
+        :return dict: the cached members of each delivery group (None if not yet fetched)
+        """
+        with self._lock:
+            return dict(self._members)
+
+    def refresh(self):
+        """
+        Forgets the cached members of the delivery groups, fetching them again when next needed.
+        """
+        with self._lock:
+            for group in self._members:
+                self._members[group] = None
+            self._disabled.clear()
+            self._routes.clear()
+
+    def _push(self, receiver, message, kwargs):
+        return push_message(self._app_token, receiver, message, **self._options(kwargs))
+
+    def _delivery_group(self, users, send_options):
+        """
+        Finds the group closest to `users`, if updating it is cheaper than pushing to every user, creating it if needed.
+        """
+        while True:
+            self._fetch_unknown(send_options)
+            with self._lock:
+                if any(members is None for members in self._members.values()):
+                    continue  # refreshed meanwhile
+                route = self._routes.get(users)
+                if route is not None:
+                    self._members.move_to_end(route[0])
+                    return route[0]
+
+                best, best_cost = None, None
+                for group, members in self._members.items():
+                    cost = len(members ^ users)
+                    if best_cost is None or cost < best_cost:
+                        best, best_cost = group, cost
+
+                if best is None or best_cost + 1 >= len(users):
+                    # updating a group costs more calls than pushing to each user: only worth it for users sent to again
+                    if not self._seen_before(users):
+                        return None
+                    # rather than repurposing a group holding other users, create a new one when possible
+                    if (best is None or best_cost > len(users)) and \
+                            len(self._members) + self._creating < self.max_groups:
+                        self._creating += 1
+                        name = self.name.format(len(self._members) + self._creating)
+                        break
+                    elif best is None:
+                        return None
+                self._members.move_to_end(best)
+                return best
+
+        try:
+            best = groups.create(self._app_token, name, **send_options)['group']
+        finally:
+            with self._lock:
+                self._creating -= 1
+        with self._lock:
+            self._members[best] = frozenset()
+            self._disabled[best] = frozenset()
+        return best
+
+    def _update_members(self, group, users, send_options):
+        """
+        Adds `users` to the group (or enables them) and removes its other members, keeping the cached members in line
+        with every call that succeeds.  Returns the users that could not be added.
+        """
+        while True:
+            with self._lock:
+                members, disabled = self._members[group], self._disabled.get(group, frozenset())
+                if members is not None:
+                    route = self._routes.get(users)
+                    missing = set(route[1]) if route is not None and route[0] == group else set()
+                    break
+            self._fetch_unknown(send_options)  # refreshed since the group was chosen
+
+        for user in members - users:
+            groups.remove_user(self._app_token, group, user, **send_options)
+            self._member_changed(group, user, False)
+        for user in users - members - missing:
+            try:
+                if user in disabled:
+                    groups.enable_user(self._app_token, group, user, **send_options)
+                else:
+                    groups.add_user(self._app_token, group, user, **send_options)
+            except PushoverError:
+                missing.add(user)
+            else:
+                self._member_changed(group, user, True)
+
+        with self._lock:
+            for route in [route for route, (routed, _) in self._routes.items() if routed == group]:
+                del self._routes[route]
+            self._routes[users] = group, frozenset(missing)
+        return missing
+
+    def _member_changed(self, group, user, added):
+        with self._lock:
+            if self._members.get(group) is None:
+                return  # refreshed meanwhile
+            user = frozenset((user, ))
+            self._members[group] = self._members[group] | user if added else self._members[group] - user
+            self._disabled[group] = self._disabled.get(group, frozenset()) - user
+
+    def _seen_before(self, users):
+        seen = users in self._seen
+        self._seen[users] = True
+        if len(self._seen) > _MAX_SEEN:
+            self._seen.popitem(last=False)
+        return seen
+
+    def _fetch_unknown(self, send_options):
+        """
+        Fetches the members of the groups not yet known.  Disabled users are kept apart: they receive no message.
+        """
+        with self._lock:
+            unknown = [group for group, members in self._members.items() if members is None]
+        for group in unknown:
+            users = groups.info(self._app_token, group, **send_options).get('users') or ()
+            with self._lock:
+                if group in self._members and self._members[group] is None:
+                    members = self._members[group] = frozenset(u['user'] for u in users if not u.get('disabled'))
+                    self._disabled[group] = frozenset(u['user'] for u in users if u.get('disabled'))
+                    self._routes.setdefault(members, (group, frozenset()))
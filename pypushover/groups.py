@@ -92,6 +92,10 @@ Using the function call:
 
     >>> py_po.groups.enable_user('app_token', 'group_key', 'user_key')
 
+Creating a Group:
+-----------------
+    >>> group_key = py_po.groups.create('app_token', 'group name')['group']
+
 """
 
 __all__ = (
@@ -102,12 +106,15 @@ __all__ = (
     'remove_user',
     'disable_user',
     'enable_user',
-    'rename'
+    'rename',
+    'create'
 )
 
 from pypushover import BaseManager, base_url, send
+from pypushover.validation import GROUP, GROUP_NAME, GROUP_USER, GROUP_RENAME
 
 
+_groups_url = base_url + "groups.json"
 _group_url = base_url + "groups/{group_key}"
 _group_info_url = _group_url + ".json"
 _group_add_user_url = _group_url + "/add_user.json"
@@ -156,99 +163,117 @@ class GroupManager(BaseManager):
 
     """
 
-    def __init__(self, app_token, group_key):
-        super(GroupManager, self).__init__(app_token, group_key=group_key)
+    def __init__(self, app_token, group_key, **send_options):
+        super(GroupManager, self).__init__(app_token, group_key=group_key, **send_options)
         self.group = _Group(**self.info())
 
-    def __update_group(self):
-        self.group = _Group(**self.info())
+    def __update_group(self, send_options):
+        self.group = _Group(**info(self._app_token, self._group_key, **self._options(send_options)))
 
-    def info(self):
+    def info(self, **send_options):
         """
         Fetches the group name and a list of users subscribed to the group.
 
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         :return: A dictionary representing the json response.
         """
 
-        self.latest_response_dict = info(self._app_token, self._group_key)
-        self.group = _Group(**self.latest_response_dict)
-        return self.latest_response_dict
+        res = self.latest_response_dict = info(self._app_token, self._group_key, **self._options(send_options))
+        self.group = _Group(**res)
+        return res
 
-    def add_user(self, user, device=None, memo=None):
+    def add_user(self, user, device=None, memo=None, **send_options):
         """
         Adds the selected user to the group
 
         :param str user: the user id of the user to add
         :param str device: the associated device name (optional)
         :param str memo: memo (optional)
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         :return: A dictionary representing the json response.
         """
 
-        self.latest_response_dict = add_user(self._app_token, self._group_key, user, device=device, memo=memo)
-        self.__update_group()
-        return self.latest_response_dict
+        res = self.latest_response_dict = add_user(
+            self._app_token, self._group_key, user, device=device, memo=memo, **self._options(send_options)
+        )
+        self.__update_group(send_options)
+        return res
 
-    def remove_user(self, user):
+    def remove_user(self, user, **send_options):
         """
         Removes the selected user from the group
         :param str user: the user id of the user to deleted
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         :return: A dictionary representing the json response.
         """
 
-        self.latest_response_dict = remove_user(self._app_token, self._group_key, user)
-        self.__update_group()
-        return self.latest_response_dict
+        res = self.latest_response_dict = remove_user(
+            self._app_token, self._group_key, user, **self._options(send_options)
+        )
+        self.__update_group(send_options)
+        return res
 
-    def disable_user(self, user):
+    def disable_user(self, user, **send_options):
         """
         Disables the user from receiving notifications sent to the group
         :param str user: the user id of the user to disable
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         :return: A dictionary representing the json response.
         """
 
-        self.latest_response_dict = disable_user(self._app_token, self._group_key, user)
-        self.__update_group()
-        return self.latest_response_dict
+        res = self.latest_response_dict = disable_user(
+            self._app_token, self._group_key, user, **self._options(send_options)
+        )
+        self.__update_group(send_options)
+        return res
 
-    def enable_user(self, user):
+    def enable_user(self, user, **send_options):
         """
         Enables the user to receive notifications sent to the group
         :param str user: the user id of the user to enable
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         :return: A dictionary representing the json response.
         """
 
-        self.latest_response_dict = enable_user(self._app_token, self._group_key, user)
-        self.__update_group()
-        return self.latest_response_dict
+        res = self.latest_response_dict = enable_user(
+            self._app_token, self._group_key, user, **self._options(send_options)
+        )
+        self.__update_group(send_options)
+        return res
 
-    def rename(self, name):
+    def rename(self, name, **send_options):
         """
         Renames the group
         :param str name: the name of the group to change to
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         :return: A dictionary representing the json response.
         """
 
-        self.latest_response_dict = rename(self._app_token, self._group_key, name)
-        self.__update_group()
-        return self.latest_response_dict
+        res = self.latest_response_dict = rename(
+            self._app_token, self._group_key, name, **self._options(send_options)
+        )
+        self.__update_group(send_options)
+        return res
 
 
-def info(app_token, group):
+def info(app_token, group, **send_options):
     """
     Fetches the group name and a list of users subscribed to the group.
 
     :param str app_token: your applications token
     :param str group: the group id to return info on
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
     :return: A dictionary representing the json response.
     """
     param_data = {
         'token': app_token,
     }
 
-    return send(_group_info_url.format(group_key=group), param_data, get_method=True)
+    GROUP.validate(dict(param_data, group=group))
+    return send(_group_info_url.format(group_key=group), param_data, get_method=True, **send_options)
 
 
-def add_user(app_token, group, user, device=None, memo=None):
+def add_user(app_token, group, user, device=None, memo=None, **send_options):
     """
     Adds the selected user to the group
 
@@ -257,6 +282,7 @@ def add_user(app_token, group, user, device=None, memo=None):
     :param str user: the user id of the user to add
     :param str device: the associated device name (optional)
     :param str memo: memo (optional)
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
     :return: A dictionary representing the json response.
     """
 
@@ -270,15 +296,17 @@ def add_user(app_token, group, user, device=None, memo=None):
     if memo:
         param_data['memo'] = memo
 
-    return send(_group_add_user_url.format(group_key=group), param_data)
+    GROUP_USER.validate(dict(param_data, group=group))
+    return send(_group_add_user_url.format(group_key=group), param_data, **send_options)
 
 
-def remove_user(app_token, group, user):
+def remove_user(app_token, group, user, **send_options):
     """
     Removes the selected user from the group
     :param str app_token: your applications token
     :param str group: the group id
     :param str user: the user id of the user to deleted
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
     :return: A dictionary representing the json response.
     """
 
@@ -287,15 +315,17 @@ def remove_user(app_token, group, user):
         'user': user
     }
 
-    return send(_group_del_user_url.format(group_key=group), param_data)
+    GROUP_USER.validate(dict(param_data, group=group))
+    return send(_group_del_user_url.format(group_key=group), param_data, **send_options)
 
 
-def disable_user(app_token, group, user):
+def disable_user(app_token, group, user, **send_options):
     """
     Disables the user from receiving notifications sent to the group
     :param str app_token: your applications token
     :param str group: the group id
     :param str user: the user id of the user to disable
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
     :return: A dictionary representing the json response.
     """
 
@@ -304,15 +334,17 @@ def disable_user(app_token, group, user):
         'user': user
     }
 
-    return send(_group_dis_user_url.format(group_key=group), param_data)
+    GROUP_USER.validate(dict(param_data, group=group))
+    return send(_group_dis_user_url.format(group_key=group), param_data, **send_options)
 
 
-def enable_user(app_token, group, user):
+def enable_user(app_token, group, user, **send_options):
     """
     Enables the user to receive notifications sent to the group
     :param str app_token: your applications token
     :param str group: the group id
     :param str user: the user id of the user to enable
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
     :return: A dictionary representing the json response.
     """
     param_data = {
@@ -320,15 +352,17 @@ def enable_user(app_token, group, user):
         'user': user
     }
 
-    return send(_group_ena_user_url.format(group_key=group), param_data)
+    GROUP_USER.validate(dict(param_data, group=group))
+    return send(_group_ena_user_url.format(group_key=group), param_data, **send_options)
 
 
-def rename(app_token, group, name):
+def rename(app_token, group, name, **send_options):
     """
     Renames the group
     :param str app_token: your applications token
     :param str group: the group id
     :param str name: the name of the group to change to
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
     :return: A dictionary representing the json response.
     """
 
@@ -337,4 +371,23 @@ def rename(app_token, group, name):
         'name': name
     }
 
-    return send(_group_ren_url.format(group_key=group), param_data)
+    GROUP_RENAME.validate(dict(param_data, group=group))
+    return send(_group_ren_url.format(group_key=group), param_data, **send_options)
+
+
+def create(app_token, name, **send_options):
+    """
+    Creates a new group
+    :param str app_token: your applications token
+    :param str name: the name of the group
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
+    :return: A dictionary representing the json response, with the key of the new group as `group`.
+    """
+
+    param_data = {
+        'token': app_token,
+        'name': name
+    }
+
+    GROUP_NAME.validate(param_data)
+    return send(_groups_url, param_data, **send_options)
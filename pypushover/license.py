@@ -1,16 +1,17 @@
 __all__ = ('LicenseManager', 'assign_license')
 
 from pypushover import BaseManager, send, base_url
+from pypushover.validation import LICENSE
 
 _assign_url = base_url + "licenses/assign.json"
 
 
 class LicenseManager(BaseManager):
-    def __init__(self, app_token, user_key=None, email=None):
+    def __init__(self, app_token, user_key=None, email=None, **send_options):
         """
 
         """
-        super().__init__(app_token, user_key=user_key)
+        super().__init__(app_token, user_key=user_key, **send_options)
         self._email = email
 
         if self._email is None and self._user_key is None:
@@ -18,11 +19,11 @@ class LicenseManager(BaseManager):
 
         raise NotImplementedError
 
-    def assign(self, os=None):
-        assign_license(self._app_token, user=self._user_key, email=self._email, os=os)
+    def assign(self, os=None, **send_options):
+        assign_license(self._app_token, user=self._user_key, email=self._email, os=os, **self._options(send_options))
 
 
-def assign_license(token, user=None, email=None, os=None):
+def assign_license(token, user=None, email=None, os=None, **send_options):
     """
 
     Args:
@@ -30,6 +31,7 @@ def assign_license(token, user=None, email=None, os=None):
         user:
         email:
         os:
+        send_options: options passed to `pypushover.send` for this call, such as `deadline`
 
     Returns:
 
@@ -50,4 +52,5 @@ def assign_license(token, user=None, email=None, os=None):
     if os:
         params['os'] = os
 
-    send(_assign_url, data_out=params)
+    LICENSE.validate(params)
+    send(_assign_url, data_out=params, **send_options)
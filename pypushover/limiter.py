@@ -0,0 +1,303 @@
+"""
+===============================================
+limiter - Message Budgets Shared Across Hosts
+===============================================
+
+The ``AppRegistry`` keeps the rate limit of each app token from the headers of the responses it receives.  When the
+same app token is used from many processes or hosts, each of them only sees the messages it sent itself, and together
+they overspend the monthly limit of the app.  A limiter keeps a single budget of messages per app token, shared by every
+sender: each message drawn from it is an atomic operation, and the headers of every response bring it back in line with
+the Pushover servers.
+
+Pass the limiter to the registry; messages sent through the registry once the budget is used up raise a
+``PushoverError`` without calling the Pushover servers:
+
+    >>> import pypushover as pypo
+    >>> import pypushover.limiter
+    >>> apps = pypo.registry.AppRegistry(limiter=pypo.limiter.SQLiteLimiter('/var/lib/myapp/budgets.db'))
+    >>> apps.message_manager('<app token>', '<user key>').push_message('Hello')
+    >>> apps.limiter.state('<app token>').remaining
+
+The ``SQLiteLimiter`` shares the budgets between the processes of one machine, through a SQLite database (and its file
+locks).  The ``RedisLimiter`` shares them between the hosts of a cluster, through a Redis server (6.2 or later):
+
+    >>> limiter = pypo.limiter.RedisLimiter('redis.internal', 6379, prefix='myapp:')
+
+The budget of an app token is unknown until a response to a message sent with it has been received, and again once its
+reset time has passed: messages are then allowed until the next response seeds the budget of the new period.
+"""
+
+__all__ = ('Limiter', 'SQLiteLimiter', 'RedisLimiter')
+
+import contextlib
+import socket
+import sqlite3
+import threading
+import time
+
+from pypushover.registry import RateLimit
+
+# the budget of KEYS[1] is unknown while it has no expiry (TTL -1) or does not exist (TTL -2)
+_ACQUIRE = """
+local remaining = redis.call('GET', KEYS[1])
+if not remaining or redis.call('TTL', KEYS[1]) < 0 then return 1 end
+if tonumber(remaining) <= 0 then return 0 end
+redis.call('DECR', KEYS[1])
+return 1
+"""
+_RELEASE = """
+if redis.call('TTL', KEYS[1]) > 0 then redis.call('INCR', KEYS[1]) end
+return 0
+"""
+_UPDATE = """
+local current = redis.call('GET', KEYS[1])
+if not current or redis.call('TTL', KEYS[1]) < 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EXAT', ARGV[3])
+elseif tonumber(ARGV[1]) < tonumber(current) then
+    redis.call('SET', KEYS[1], ARGV[1], 'KEEPTTL')
+end
+redis.call('SET', KEYS[2], ARGV[2] .. ':' .. ARGV[3], 'EXAT', ARGV[3])
+return 0
+"""
+
+
+class Limiter(object):
+    """
+    The interface of the budgets of messages shared by the senders of the same app tokens.
+    """
+
+    def acquire(self, token):
+        """
+        Draws a message from the budget of the app token.
+
+        :param str token: the application token
+        :return bool: False if the budget is used up, True otherwise
+        """
+        raise NotImplementedError
+
+    def release(self, token):
+        """
+        Gives back a message drawn with `acquire` and not sent.
+
+        :param str token: the application token
+        """
+        raise NotImplementedError
+
+    def update(self, token, limit, remaining, reset):
+        """
+        Updates the budget of the app token from the rate limit reported by the Pushover servers.  The budget is seeded
+        when unknown, and only ever lowered within the same period: the senders of other hosts may have drawn messages
+        from it since the response was sent.
+
+        :param str token: the application token
+        :param int limit: the number of messages the app can send each month
+        :param int remaining: the number of messages left this month
+        :param int reset: the unix timestamp at which the limit resets
+        """
+        raise NotImplementedError
+
+    def state(self, token):
+        """
+        :param str token: the application token
+        :return RateLimit: the budget of the app token, with None values while unknown
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SQLiteLimiter(Limiter):
+    """
+    Shares the budgets between the processes of a machine through a SQLite database.
+    """
+
+    def __init__(self, path, timeout=30):
+        """
+        :param str path: the database holding the budgets, the same for every process (':memory:' for a single one)
+        :param float timeout: seconds to wait for the lock of the database held by other processes
+        """
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS budgets (token TEXT PRIMARY KEY, lim INTEGER, '
+                             'remaining INTEGER, reset INTEGER)')
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._lock:
+            # takes the write lock of the database up front, so that no other process reads the budget in between
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def acquire(self, token):
+        with self._transaction() as db:
+            row = db.execute('SELECT remaining, reset FROM budgets WHERE token = ?', (token, )).fetchone()
+            if row is None or row[1] <= time.time():
+                return True
+            if row[0] <= 0:
+                return False
+            db.execute('UPDATE budgets SET remaining = remaining - 1 WHERE token = ?', (token, ))
+            return True
+
+    def release(self, token):
+        with self._transaction() as db:
+            db.execute('UPDATE budgets SET remaining = remaining + 1 WHERE token = ? AND reset > ?',
+                       (token, time.time()))
+
+    def update(self, token, limit, remaining, reset):
+        with self._transaction() as db:
+            row = db.execute('SELECT remaining, reset FROM budgets WHERE token = ?', (token, )).fetchone()
+            if row is None or row[1] <= time.time():
+                db.execute('INSERT OR REPLACE INTO budgets VALUES (?, ?, ?, ?)', (token, limit, remaining, reset))
+            elif remaining < row[0]:
+                db.execute('UPDATE budgets SET remaining = ? WHERE token = ?', (remaining, token))
+
+    def state(self, token):
+        with self._lock:
+            row = self._db.execute('SELECT lim, remaining, reset FROM budgets WHERE token = ? AND reset > ?',
+                                   (token, time.time())).fetchone()
+        return RateLimit(*row) if row else RateLimit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RedisLimiter(Limiter):
+    """
+    Shares the budgets between the hosts of a cluster through a Redis server.
+
+    The budget of each app token is a Redis counter expiring at the reset time of the limit.  It is only read and
+    written by Lua scripts, each run atomically by the Redis server.  `SET ... EXAT` requires Redis 6.2 or later.  The
+    Redis protocol is spoken directly, so that no Redis client has to be installed.
+    """
+
+    def __init__(self, host='localhost', port=6379, db=0, prefix='pypushover:', timeout=5):
+        """
+        :param str host: the address of the Redis server
+        :param int port: the port of the Redis server
+        :param int db: the Redis database holding the budgets
+        :param str prefix: the prefix of the Redis keys of the budgets
+        :param float timeout: seconds to wait for the Redis server
+        """
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        self.timeout = timeout
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def acquire(self, token):
+        return self._execute(('EVAL', _ACQUIRE, 1, self.prefix + token))[0] == 1
+
+    def release(self, token):
+        self._execute(('EVAL', _RELEASE, 1, self.prefix + token))
+
+    def update(self, token, limit, remaining, reset):
+        key = self.prefix + token
+        self._execute(('EVAL', _UPDATE, 2, key, key + ':limit', remaining, limit, reset))
+
+    def state(self, token):
+        key = self.prefix + token
+        remaining, limit = self._execute(('MGET', key, key + ':limit'))[0]
+        if remaining is None or limit is None:
+            return RateLimit()
+        limit, reset = limit.split(':')
+        return RateLimit(int(limit), int(remaining), int(reset))
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _execute(self, *commands):
+        """
+        Sends the commands in a single round trip, reconnecting once if the connection was lost before they were sent.
+        Once sent, the commands may have run on the Redis server: they are not sent again, so that a message is never
+        drawn from (or given back to) a budget twice.
+
+        :return list: the reply of each command
+        """
+        with self._lock:
+            for attempt in (1, 2):
+                sent = False
+                try:
+                    if self._connection is None:
+                        self._connection = _RedisConnection(self.host, self.port, self.db, self.timeout)
+                    self._connection.send(commands)
+                    sent = True
+                    return self._connection.receive(len(commands))
+                except (OSError, EOFError):
+                    if self._connection is not None:
+                        self._connection.close()
+                        self._connection = None
+                    if sent or attempt == 2:
+                        raise
+
+
+class _RedisConnection(object):
+    """
+    A connection speaking the Redis protocol (RESP).
+    """
+
+    def __init__(self, host, port, db, timeout):
+        self._sock = socket.create_connection((host, port), timeout)
+        self._file = self._sock.makefile('rb')
+        if db:
+            self.execute([('SELECT', db)])
+
+    def execute(self, commands):
+        self.send(commands)
+        return self.receive(len(commands))
+
+    def send(self, commands):
+        payload = []
+        for command in commands:
+            payload.append('*{}\r\n'.format(len(command)).encode('ascii'))
+            for arg in command:
+                arg = str(arg).encode('utf-8')
+                payload.append('${}\r\n'.format(len(arg)).encode('ascii') + arg + b'\r\n')
+        self._sock.sendall(b''.join(payload))
+
+    def receive(self, count):
+        replies = [self._read() for _ in range(count)]
+        for reply in replies:
+            if isinstance(reply, RuntimeError):
+                raise reply
+        return replies
+
+    def _read(self):
+        line = self._file.readline()
+        if not line.endswith(b'\r\n'):
+            raise EOFError('Connection to the Redis server closed')
+        kind, value = line[:1], line[1:-2].decode('utf-8')
+        if kind == b'+':
+            return value
+        if kind == b'-':
+            return RuntimeError('Redis error: {}'.format(value))
+        if kind == b':':
+            return int(value)
+        if kind == b'$':
+            return None if int(value) < 0 else self._file.read(int(value) + 2)[:-2].decode('utf-8')
+        if kind == b'*':
+            return None if int(value) < 0 else [self._read() for _ in range(int(value))]
+        raise EOFError('Unexpected reply from the Redis server: {!r}'.format(line))
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
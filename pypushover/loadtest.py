@@ -0,0 +1,418 @@
+"""
+==================================================
+loadtest - Load Testing Services Using pypushover
+==================================================
+
+This module drives ``pypushover`` calls at a target rate or concurrency against a local ``StandInServer`` answering
+like the Pushover API, and reports their throughput, error rates and latency percentiles.  It tells how fast a service
+built on ``pypushover`` can send before any real traffic (or quota) is spent.
+
+.. code-block:: bash
+
+    $ pypushover-loadtest --operations push,receipt --rate 500 --duration 30
+    requests: 15000, errors: 0 (0.00%), throughput: 499.9/s
+    latency (ms): p50 1.21, p95 2.87, p99 4.93, p999 11.40, max 15.02
+
+From Python:
+
+    >>> import pypushover as pypo
+    >>> import pypushover.loadtest
+    >>> with pypo.loadtest.StandInServer(latency=0.05) as server:
+    ...     transport = server.transport(pool_size=64)
+    ...     report = pypo.loadtest.run(pypo.loadtest.operation('push', transport=transport), rate=200, duration=10,
+    ...                                concurrency=64)
+    >>> print(report)
+    >>> report.percentile(99.9)
+
+Open and Closed Loops:
+----------------------
+Given a ``rate``, calls start on a fixed schedule whether or not the previous calls completed (an open loop, like real
+traffic), and each latency is measured from the time the call was scheduled to start.  A call waiting for a free worker
+is therefore counted as slow instead of being left out, so that stalls are not hidden by coordinated omission.
+Without a ``rate``, ``concurrency`` workers call the operation back to back (a closed loop), measuring the maximum
+throughput.
+
+The ``operation`` can be any callable; ``operation`` builds the calls of the Pushover API (``push``, ``emergency``,
+``receipt``, ``cancel``, ``group`` and ``verify``) with dummy keys, and ``mix`` picks one of several operations at
+random for each call.
+"""
+
+__all__ = ('StandInServer', 'LoadReport', 'run', 'operation', 'mix', 'main', 'OPERATIONS')
+
+import argparse
+import bisect
+import collections
+import functools
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from timeit import default_timer
+from urllib.parse import parse_qsl, urlsplit
+
+from pypushover import PRIORITIES, groups, message, verification
+from pypushover.transport import RedirectTransport, RequestsTransport
+
+_TOKEN = 'a' * 30
+_USER = 'u' * 30
+_GROUP = 'g' * 30
+_RECEIPT = 'r' * 30
+
+
+def _new_key():
+    return uuid.uuid4().hex[:30]
+
+
+class StandInServer(object):
+    """
+    A local HTTP server answering the requests of the Pushover API with successful responses.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, error_rate=0, limit=10000):
+        """
+        :param str host: the address to listen on
+        :param int port: the port to listen on, a free port by default
+        :param float latency: seconds waited before answering each request
+        :param float error_rate: the share of requests answered with a 500 error, from 0 to 1
+        :param int limit: the monthly message limit reported in the rate limit headers
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.limit = limit
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """
+        :return str: the url of the API on the server, replacing `pypushover.base_url`
+        """
+        return 'http://{}:{}/1/'.format(self.host, self.port)
+
+    def transport(self, pool_size=10):
+        """
+        :param int pool_size: the maximum number of connections kept open to the server
+        :return transport.RedirectTransport: a transport sending the requests to the server
+        """
+        return RedirectTransport(self.base_url, RequestsTransport(pool_size=pool_size))
+
+    def start(self):
+        """
+        Starts answering requests on a background thread.
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # headers and body are written separately
+
+            def do_GET(self):
+                self._answer(b'')
+
+            def do_POST(self):
+                self._answer(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+
+            def _answer(self, body):
+                url = urlsplit(self.path)
+                fields = dict(parse_qsl(url.query))
+                if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                    fields.update(parse_qsl(body.decode('utf-8')))
+                status, content, headers = server._respond(self.command, url.path, fields)
+                content = json.dumps(content).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='pypushover-stand-in')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Stops the server.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _respond(self, method, path, fields):
+        """
+        :return tuple: the status, JSON content and headers of the response to a request
+        """
+        with self._lock:
+            self.requests += 1
+            count = self.requests
+        if self.latency:
+            time.sleep(self.latency)
+
+        headers = [('X-Limit-App-Limit', str(self.limit)),
+                   ('X-Limit-App-Remaining', str(max(self.limit - count, 0))),
+                   ('X-Limit-App-Reset', str(int(time.time()) + 86400))]
+        request = uuid.uuid4().hex
+        if self.error_rate and random.random() < self.error_rate:
+            return 500, {'status': 0, 'request': request, 'errors': ['stand-in server error']}, headers
+
+        endpoint = path.split('/1/', 1)[-1].lstrip('/')
+        content = {'status': 1, 'request': request}
+        if endpoint == 'messages.json' and method == 'POST':
+            if fields.get('priority') == str(PRIORITIES.EMERGENCY):
+                content['receipt'] = _new_key()
+        elif endpoint == 'messages.json':
+            content['messages'] = []
+        elif endpoint.startswith('receipts/cancel_by_tag/'):
+            content['canceled'] = 0
+        elif endpoint.startswith('receipts/') and endpoint.count('/') == 1:
+            content.update(acknowledged=0, acknowledged_at=0, last_delivered_at=int(time.time()), expired=0,
+                           expires_at=int(time.time()) + 3600, called_back=0)
+        elif endpoint == 'groups.json':
+            content['group'] = _new_key()
+        elif endpoint.startswith('groups/') and endpoint.count('/') == 1:
+            content.update(name='stand-in', users=[])
+        elif endpoint == 'users/validate.json':
+            content.update(devices=['stand-in'], licenses=['Android', 'iOS', 'Desktop'])
+        return 200, content, headers
+
+
+class LoadReport(object):
+    """
+    The results of a load test.
+    """
+
+    def __init__(self, latencies, errors, elapsed, rate=None, concurrency=None):
+        """
+        :param list latencies: the latency of every call, in seconds
+        :param collections.Counter errors: the number of failed calls by exception name
+        :param float elapsed: the seconds the test took
+        :param float rate: the target rate of the test, if open loop
+        :param int concurrency: the number of workers of the test
+        """
+        self.latencies = sorted(latencies)
+        self.errors = errors
+        self.elapsed = elapsed
+        self.rate = rate
+        self.concurrency = concurrency
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def throughput(self):
+        """
+        :return float: the calls completed per second
+        """
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self):
+        """
+        :return float: the share of failed calls, from 0 to 1
+        """
+        return sum(self.errors.values()) / float(self.requests) if self.requests else 0.0
+
+    def percentile(self, pct):
+        """
+        :param float pct: the percentile, from 0 to 100
+        :return float: the latency in seconds below which `pct` percent of the calls completed
+        """
+        if not self.latencies:
+            return 0.0
+        return self.latencies[min(int(len(self.latencies) * pct / 100.0), len(self.latencies) - 1)]
+
+    def under(self, latency):
+        """
+        :param float latency: seconds
+        :return float: the share of the calls completed within `latency` seconds
+        """
+        return bisect.bisect_right(self.latencies, latency) / float(self.requests) if self.requests else 0.0
+
+    def summary(self):
+        """
+        :return dict: the results of the test, as numbers
+        """
+        return {
+            'requests': self.requests,
+            'errors': dict(self.errors),
+            'error_rate': self.error_rate,
+            'elapsed': self.elapsed,
+            'throughput': self.throughput,
+            'rate': self.rate,
+            'concurrency': self.concurrency,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9),
+            'max': self.latencies[-1] if self.latencies else 0.0,
+        }
+
+    def __str__(self):
+        s = self.summary()
+        lines = ['requests: {}, errors: {} ({:.2%}), throughput: {:.1f}/s'.format(
+            s['requests'], sum(self.errors.values()), s['error_rate'], s['throughput']
+        ), 'latency (ms): p50 {:.2f}, p95 {:.2f}, p99 {:.2f}, p999 {:.2f}, max {:.2f}'.format(
+            *(s[k] * 1000 for k in ('p50', 'p95', 'p99', 'p999', 'max'))
+        )]
+        lines.extend('  {}: {}'.format(name, count) for name, count in sorted(self.errors.items()))
+        return '\n'.join(lines)
+
+
+def run(operation, rate=None, concurrency=16, duration=10.0, requests=None):
+    """
+    Calls the operation repeatedly and measures the latency of every call.
+
+    :param operation: the callable to load test, called without arguments
+    :param float rate: calls started per second (open loop).  By default, `concurrency` workers call the operation
+                       back to back (closed loop).
+    :param int concurrency: the number of calls running at the same time at most
+    :param float duration: seconds during which calls are started
+    :param int requests: the number of calls after which to stop, if before the end of `duration`
+    :return LoadReport:
+    """
+    latencies = []
+    errors = collections.Counter()
+    lock = threading.Lock()
+
+    def call(scheduled):
+        start = default_timer()
+        error = None
+        try:
+            operation()
+        except Exception as e:
+            error = type(e).__name__
+        latency = default_timer() - (scheduled if scheduled is not None else start)
+        with lock:
+            latencies.append(latency)
+            if error is not None:
+                errors[error] += 1
+
+    begin = default_timer()
+    end = begin + duration
+    if rate:
+        # open loop: calls start on schedule, their latency counting any wait for a free worker
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for i in range(requests) if requests else itertools.count():
+                scheduled = begin + i / float(rate)
+                if scheduled >= end:
+                    break
+                delay = scheduled - default_timer()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(call, scheduled)
+    else:
+        remaining = [requests]
+
+        def worker():
+            while default_timer() < end:
+                with lock:
+                    if remaining[0] is not None:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                call(None)
+
+        workers = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+    return LoadReport(latencies, errors, default_timer() - begin, rate=rate, concurrency=concurrency)
+
+
+def _push(priority=None, **send_options):
+    kwargs = dict(priority=priority, retry=30, expire=3600) if priority == PRIORITIES.EMERGENCY else {}
+    return message.push_message(_TOKEN, _USER, 'pypushover load test', **dict(kwargs, **send_options))
+
+
+OPERATIONS = {
+    'push': _push,
+    'emergency': functools.partial(_push, PRIORITIES.EMERGENCY),
+    'receipt': functools.partial(message.check_receipt, _TOKEN, _RECEIPT),
+    'cancel': functools.partial(message.cancel_retries, _TOKEN, _RECEIPT),
+    'group': functools.partial(groups.info, _TOKEN, _GROUP),
+    'verify': functools.partial(verification.verify_user, _TOKEN, _USER),
+}
+
+
+def operation(name, **send_options):
+    """
+    Builds a call of the Pushover API with dummy keys, to load test against a `StandInServer`.
+
+    :param str name: one of `OPERATIONS`: 'push', 'emergency', 'receipt', 'cancel', 'group' or 'verify'
+    :param send_options: options passed to `pypushover.send`, such as the `transport` of the stand-in server
+    :return: a callable taking no arguments
+    """
+    if name not in OPERATIONS:
+        raise ValueError('Unknown operation `{}`, expected one of {}'.format(name, ', '.join(sorted(OPERATIONS))))
+    return functools.partial(OPERATIONS[name], **send_options)
+
+
+def mix(*operations):
+    """
+    :param operations: callables
+    :return: a callable calling one of the `operations` at random
+    """
+    return lambda: random.choice(operations)()
+
+
+def main(argv=None):
+    """
+    Runs the ``pypushover-loadtest`` console script.
+
+    :param list argv: the command line arguments (`sys.argv[1:]` by default)
+    :return int: the exit status
+    """
+    parser = argparse.ArgumentParser(prog='pypushover-loadtest',
+                                     description='Load test pypushover calls against a local stand-in server.')
+    parser.add_argument('-o', '--operations', default='push',
+                        help='comma separated operations, picked at random for each call: {}'.format(
+                            ', '.join(sorted(OPERATIONS))))
+    parser.add_argument('-r', '--rate', type=float, help='calls started per second (open loop)')
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='calls running at the same time at most')
+    parser.add_argument('-d', '--duration', type=float, default=10.0, help='seconds during which calls are started')
+    parser.add_argument('-n', '--requests', type=int, help='the number of calls to make at most')
+    parser.add_argument('--latency', type=float, default=0, help='seconds the stand-in server waits before answering')
+    parser.add_argument('--error-rate', type=float, default=0, help='share of requests the stand-in server fails')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    with StandInServer(latency=args.latency, error_rate=args.error_rate) as server:
+        transport = server.transport(pool_size=args.concurrency)
+        try:
+            ops = [operation(name.strip(), transport=transport) for name in args.operations.split(',')]
+        except ValueError as e:
+            parser.error(str(e))
+        report = run(ops[0] if len(ops) == 1 else mix(*ops), rate=args.rate, concurrency=args.concurrency,
+                     duration=args.duration, requests=args.requests)
+        transport.close()
+
+    sys.stdout.write((json.dumps(report.summary(), sort_keys=True) if args.json else str(report)) + '\n')
+    return 0
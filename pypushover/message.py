@@ -9,8 +9,9 @@ need to send the app_token and group/user key for each sending of a message.
 
 Sending messages can be done using the ``send_message`` method of the ``MessageManager`` class or the ``send_message``
 function found within this module.  There are API `restrictions <https://pushover.net/api#limits>`_ that are required
-by Pushover but are NOT handled by ``py_pushover``. It is intended that the user will maintain all of these
-requirements.
+by Pushover.  The limits of each parameter (message, title and URL lengths, key formats, sounds and priorities) are
+checked locally before anything is sent, raising a ``pypushover.ValidationError`` (see ``pypushover.validation``).
+The monthly message limit is NOT handled by ``py_pushover``.
 
 Sending Basic Messages
 ----------------------
@@ -72,6 +73,45 @@ the ``receipt`` parameter passed in.
     >>> pm.cancel_retries(res['receipt'])
     >>> pypo.message.cancel_retries('app_token', res['receipt'])
 
+Emergency messages can be sent with ``tags`` (a string of comma separated tags, or a list of tags), to cancel the
+retries of every emergency message with a given tag in a single call with ``cancel_retries_by_tag``:
+
+    >>> pm.push_message('Database down!', priority=pypo.PRIORITIES.EMERGENCY, retry=30, expire=3600,
+    ...                 tags=['incident-42', 'db'])
+    >>> pm.push_message('API down!', priority=pypo.PRIORITIES.EMERGENCY, retry=30, expire=3600, tags='incident-42')
+    >>> pm.receipts('incident-42')  # the receipts sent by the manager with the tag
+    >>> pm.cancel_retries_by_tag('incident-42')
+    >>> pypo.message.cancel_retries_by_tag('app_token', 'incident-42')
+
+The ``MessageManager`` indexes the receipts of the tagged messages it sends: ``receipts`` lists them without any call to
+the Pushover servers, and they are dropped from the index once cancelled.
+
+Attaching Images
+----------------
+
+An image can be attached to a message with the ``attachment`` parameter.  It can be a file path, an open binary file,
+a memory-mapped file or bytes.  The image is streamed to Pushover while the request is sent instead of being read
+into memory, and its size is checked locally before anything is uploaded (see ``pypushover.attachment``):
+
+    >>> pm.push_message('Front door', attachment='/tmp/door.jpg')
+
+Timeouts and Deadlines
+----------------------
+
+Every call waits at most about 3 seconds to connect and 27 seconds to receive a response.  Pass ``timeout`` to override
+these for a single call or to the ``MessageManager`` for all of its calls.  To cap the total time of a call,
+including any retries and rate limit waits, pass a ``deadline`` in seconds.  A ``pypushover.Deadline`` can be shared by
+several calls so they complete within the same budget:
+
+    >>> pm = pypo.message.MessageManager('<app_token>', '<group/user key>', timeout=(3, 10))
+    >>> pm.push_message('Message Body', deadline=5)
+    >>> budget = pypo.Deadline(10)
+    >>> res = pm.push_message('Emergency Message!', priority=pypo.PRIORITIES.EMERGENCY, retry=30, expire=3600,
+    ...                       deadline=budget)
+    >>> pm.check_receipt(res['receipt'], deadline=budget)
+
+A ``pypushover.DeadlineExceededError`` is raised when the deadline passes before the call completes.
+
 Other Supported Parameters
 --------------------------------
 
@@ -85,13 +125,22 @@ Other Supported Parameters
 * ``timestamp`` (string): a Unix timestamp of your message's date and time to display to the user
 * ``sound`` (string): the name of the sound to override the user's default sound choice (Use the ``Sounds`` constants to
 select)
+* ``attachment`` (file path, file object, memory-mapped file or bytes): an image to attach to the message
+* ``tags`` (string or list of strings): tags of an Emergency message, to cancel its retries by tag
 """
 
-__all__ = ('MessageManager', 'push_message', 'check_receipt', 'cancel_retries')
+__all__ = ('MessageManager', 'push_message', 'check_receipt', 'cancel_retries', 'cancel_retries_by_tag')
 
+import functools
+import threading
 import time
 
+from urllib.parse import quote
+
 from pypushover import PRIORITIES, BaseManager, base_url, send
+from pypushover._base import Form, Fragment, _pop_send_options
+from pypushover.attachment import Attachment, MAX_ATTACHMENT_SIZE
+from pypushover.validation import MESSAGE, RECEIPT, TAG
 
 
 _MAX_EXPIRE = 86400
@@ -101,15 +150,18 @@ _push_url = base_url + "messages.json"
 _base_receipt_url = base_url + "receipts/{receipt}"
 _receipt_url = _base_receipt_url + ".json"
 _cancel_receipt_url = _base_receipt_url + "/cancel.json"
+_cancel_tag_url = base_url + "receipts/cancel_by_tag/{tag}.json"
 
 
 class MessageManager(BaseManager):
     """
     Manager class used to send messages and check receipts.  Stores the given app_token for future use.  Also stores the
-    latest response from the API.
+    latest response from the API, per thread: a single manager can be shared by many threads.
     """
-    def __init__(self, app_token, receiver_key=None):
-        super(MessageManager, self).__init__(app_token, user_key=receiver_key, group_key=receiver_key)
+    def __init__(self, app_token, receiver_key=None, **send_options):
+        super(MessageManager, self).__init__(app_token, user_key=receiver_key, group_key=receiver_key, **send_options)
+        self._tagged = {}  # receipts of the tagged messages sent, by tag
+        self._tagged_lock = threading.Lock()
 
     def push_message(self, message, **kwargs):
         """
@@ -128,10 +180,16 @@ class MessageManager(BaseManager):
                           only with priority level of Emergency)
         :param int expire: how many seconds your notification will continue to be retried (required only with priority
                            level of Emergency)
+        :param tags: tags of an Emergency message, as a comma separated string or a list (see `cancel_retries_by_tag`)
         :param datetime timestamp: a datetime object repr the timestamp of your message's date and time to display to the user
         :param str sound: the name of the sound to override the user's default sound choice (Use the Sounds consts to
                           select)
         :param bool html: Enable rendering message on user device using HTML
+        :param attachment: an image to attach: a file path, binary file object, memory-mapped file, bytes or an
+                           `attachment.Attachment`.  It is streamed from its source rather than read into memory.
+        :param float deadline: seconds (or a `Deadline`) capping the total time of the call
+        :param timeout: seconds to wait for the connection and response (see `pypushover.send`)
+        :param RetryPolicy retry_policy: the policy used to retry failed requests (see `pypushover.retry`)
         """
 
         # determine if client key has already been saved.  If not then get argument.  Group key takes priority
@@ -144,23 +202,40 @@ class MessageManager(BaseManager):
         if client_key is None:
             raise ValueError('`user` argument must be set to the group or user id')
 
-        self.latest_response_dict = push_message(self._app_token, client_key, message, **kwargs)
-        return self.latest_response_dict
+        res = self.latest_response_dict = push_message(self._app_token, client_key, message, **self._options(kwargs))
+        if kwargs.get('tags') and 'receipt' in res:
+            tags = kwargs['tags'].split(',') if isinstance(kwargs['tags'], str) else kwargs['tags']
+            with self._tagged_lock:
+                for tag in tags:
+                    self._tagged.setdefault(tag, set()).add(res['receipt'])
+        return res
+
+    def receipts(self, tag):
+        """
+        Lists the receipts of the messages sent by the manager with the tag, and not cancelled since.
+
+        :param str tag: the tag
+        :return list:
+        """
+        with self._tagged_lock:
+            return sorted(self._tagged.get(tag, ()))
 
-    def check_receipt(self, receipt=None):
+    def check_receipt(self, receipt=None, **send_options):
         """
         Gets the receipt status of the selected notification.  Returns a dictionary of the results
 
         see also https://pushover.net/api#receipt
 
         :param string receipt: the notification receipt to check (if none given, the most recent response is used)
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         :return dict:
         """
         receipt_to_check = None
 
-        # check to see if previous response had a `receipt`
-        if 'receipt' in self.latest_response_dict:
-            receipt_to_check = self.latest_response_dict['receipt']
+        # check to see if the previous response of this thread had a `receipt`
+        latest = self.latest_response_dict
+        if latest and 'receipt' in latest:
+            receipt_to_check = latest['receipt']
 
         # function `receipt` argument takes precedence
         if receipt:
@@ -170,20 +245,24 @@ class MessageManager(BaseManager):
         if receipt_to_check is None:
             raise TypeError('Missing required `receipt` argument')
 
-        self.latest_response_dict = check_receipt(self._app_token, receipt_to_check)
-        return self.latest_response_dict
+        res = self.latest_response_dict = check_receipt(
+            self._app_token, receipt_to_check, **self._options(send_options)
+        )
+        return res
 
-    def cancel_retries(self, receipt=None):
+    def cancel_retries(self, receipt=None, **send_options):
         """
         Cancel an emergency-priority notification early.
 
         :param string receipt: the notification receipt to cancel (if none given, the most recent response is used)
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         """
         receipt_to_check = None
 
-        # check to see if previous response had a `receipt`
-        if 'receipt' in self.latest_response_dict:
-            receipt_to_check = self.latest_response_dict['receipt']
+        # check to see if the previous response of this thread had a `receipt`
+        latest = self.latest_response_dict
+        if latest and 'receipt' in latest:
+            receipt_to_check = latest['receipt']
 
         # function `receipt` argument takes precedence
         if receipt:
@@ -193,8 +272,37 @@ class MessageManager(BaseManager):
         if receipt_to_check is None:
             raise TypeError('Missing required `receipt` argument')
 
-        self.latest_response_dict = cancel_retries(self._app_token, receipt_to_check)
-        return self.latest_response_dict
+        res = self.latest_response_dict = cancel_retries(
+            self._app_token, receipt_to_check, **self._options(send_options)
+        )
+        self._untag((receipt_to_check, ))
+        return res
+
+    def cancel_retries_by_tag(self, tag, **send_options):
+        """
+        Cancels every emergency-priority notification sent with the tag, in a single call.
+
+        :param str tag: the tag given to the notifications when sent
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
+        :return: the response, the number of notifications cancelled in its `canceled` field
+        """
+        res = self.latest_response_dict = cancel_retries_by_tag(self._app_token, tag, **self._options(send_options))
+        with self._tagged_lock:
+            receipts = self._tagged.pop(tag, ())
+        self._untag(receipts)
+        return res
+
+    def _untag(self, receipts):
+        with self._tagged_lock:
+            for tag, tagged in list(self._tagged.items()):
+                tagged.difference_update(receipts)
+                if not tagged:
+                    del self._tagged[tag]
+
+
+@functools.lru_cache(maxsize=256)
+def _token_fragment(token):
+    return Fragment(token=token)
 
 
 def push_message(token, user, message, **kwargs):
@@ -214,16 +322,23 @@ def push_message(token, user, message, **kwargs):
                       only with priority level of Emergency)
     :param int expire: how many seconds your notification will continue to be retried (required only with priority
                        level of Emergency)
+    :param tags: tags of an Emergency message, as a comma separated string or a list (see `cancel_retries_by_tag`)
     :param datetime timestamp: a datetime object repr the timestamp of your message's date and time to display to the user
     :param str sound: the name of the sound to override the user's default sound choice (Use the Sounds consts to
                       select)
     :param bool html: Enable rendering message on user device using HTML
+    :param attachment: an image to attach: a file path, binary file object, memory-mapped file, bytes or an
+                       `attachment.Attachment`.  It is streamed from its source rather than read into memory.
+    :param float deadline: seconds (or a `Deadline`) capping the total time of the call
+    :param timeout: seconds to wait for the connection and response (see `pypushover.send`)
+    :param RetryPolicy retry_policy: the policy used to retry failed requests (see `pypushover.retry`)
     """
-    data_out = {
-        'token': token,
-        'user': user,  # can be a user or group key
-        'message': message
-    }
+    send_options = _pop_send_options(kwargs)
+    data_out = Form(
+        _token_fragment(token),
+        user=user,  # can be a user or group key
+        message=message
+    )
 
     # Support for non-required parameters of PushOver
     if 'title' in kwargs:
@@ -234,7 +349,6 @@ def push_message(token, user, message, **kwargs):
             data_out['device'] = ','.join(temp)
         else:
             data_out['device'] = temp
-        data_out['device'] = kwargs['device']
     if 'url' in kwargs:
         data_out['url'] = kwargs['url']
     if 'url_title' in kwargs:
@@ -273,6 +387,11 @@ def push_message(token, user, message, **kwargs):
             if 'callback' in kwargs:
                 data_out['callback'] = kwargs['callback']
 
+            # Optionally tags, to cancel the retries of all the messages with the same tag at once
+            if 'tags' in kwargs:
+                tags = kwargs['tags']
+                data_out['tags'] = ','.join(tags) if type(tags) == list else tags
+
     if 'timestamp' in kwargs:
         data_out['timestamp'] = int(time.mktime(kwargs['timestamp'].timetuple()))
     if 'sound' in kwargs:
@@ -280,29 +399,60 @@ def push_message(token, user, message, **kwargs):
     if 'html' in kwargs:
         data_out['html'] = int(kwargs['html'])
 
-    return send(_push_url, data_out=data_out)
+    MESSAGE.validate(data_out)
 
+    files = None
+    if 'attachment' in kwargs:
+        attachment = Attachment.coerce(kwargs['attachment'])
 
-def check_receipt(token, receipt):
+        # check the size locally, before uploading anything
+        size = len(attachment)
+        if size > MAX_ATTACHMENT_SIZE:
+            raise ValueError('`attachment` is {} bytes, larger than the maximum of {} bytes'.format(
+                size, MAX_ATTACHMENT_SIZE
+            ))
+        files = {'attachment': attachment}
+
+    return send(_push_url, data_out=data_out, files=files, **send_options)
+
+
+def check_receipt(token, receipt, **send_options):
     """
     Check to see if an Emergency Priority notification has been acknowledged.
 
     :param str token: the application token
     :param str receipt: the message receipt
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
     :return:
     """
+    RECEIPT.validate({'token': token, 'receipt': receipt})
     url_to_send = _receipt_url.format(receipt=receipt)
-    return send(url_to_send, data_out={'token': token}, get_method=True)
+    return send(url_to_send, data_out={'token': token}, get_method=True, **send_options)
 
 
-def cancel_retries(token, receipt):
+def cancel_retries(token, receipt, **send_options):
     """
     Ceases retrying to notify the user of an Emergency Priority notification.
 
     Cancel an emergency-priority notification early.
     :param str token: application token
     :param str receipt: receipt of the message
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
     """
+    RECEIPT.validate({'token': token, 'receipt': receipt})
     url_to_send = _cancel_receipt_url.format(receipt=receipt)
-    return send(url_to_send, data_out={'token': token})
+    return send(url_to_send, data_out={'token': token}, **send_options)
+
 
+def cancel_retries_by_tag(token, tag, **send_options):
+    """
+    Ceases retrying to notify the users of every Emergency Priority notification sent with the tag.
+
+    :param str token: application token
+    :param str tag: the tag given to the notifications when sent
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
+    :return: the response, the number of notifications cancelled in its `canceled` field
+    """
+    TAG.validate({'token': token, 'tag': tag})
+    url_to_send = _cancel_tag_url.format(tag=quote(tag, safe=''))
+    return send(url_to_send, data_out={'token': token}, **send_options)
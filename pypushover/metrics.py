@@ -0,0 +1,251 @@
+"""
+===============================================
+metrics - Request Metrics for the Pushover API
+===============================================
+
+This module defines a low overhead aggregator for the requests sent to the Pushover servers.  Once registered, it
+records a latency histogram, status counts and transfer sizes for every endpoint along with the latest rate limit
+headers returned by Pushover and the state of the circuit breakers.
+
+Collecting Metrics:
+-------------------
+
+    >>> import pypushover as py_po
+    >>> metrics = py_po.metrics.MetricsAggregator()
+    >>> py_po.add_observer(metrics)
+    >>> py_po.message.push_message('<app token>', '<user key>', 'Hello World!')
+    >>> metrics.percentile('messages.json', 'POST', 95)
+
+Exporting Metrics:
+------------------
+Metrics can be dumped in the Prometheus text exposition format, ready to be served from a `/metrics` endpoint:
+
+    >>> print(metrics.to_prometheus())
+
+Custom Observers:
+-----------------
+Any object implementing `before_request` and `after_request` can be registered with `add_observer`.  Both methods are
+passed a `RequestEvent` describing the endpoint, method, status, duration, bytes sent and received, and the rate limit
+headers of the request.  Subclass `RequestObserver` to only implement the methods needed:
+
+    >>> class SlowRequestLogger(py_po.RequestObserver):
+    ...     def after_request(self, event):
+    ...         if event.duration > 1:
+    ...             print('{} took {:.2f}s'.format(event.endpoint, event.duration))
+    >>> py_po.add_observer(SlowRequestLogger())
+"""
+
+__all__ = ('LatencyHistogram', 'MetricsAggregator')
+
+import bisect
+import threading
+
+from pypushover import breaker as _breaker
+from pypushover._base import RequestObserver
+
+_DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram(object):
+    """
+    Fixed bucket histogram of request durations (in seconds).  Recording a value is a single bisect and increment, and
+    percentiles are estimated by interpolating within the bucket the percentile falls in.
+    """
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds=_DEFAULT_BUCKETS):
+        """
+        :param tuple bounds: the sorted upper bounds of each bucket.  Values above the last bound are counted in an
+                             overflow bucket.
+        """
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        """
+        Records a single duration.
+
+        :param float value: the duration in seconds
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct):
+        """
+        Estimates the selected percentile of the recorded durations.
+
+        :param float pct: the percentile to estimate (0 - 100)
+        :return float: the estimated duration, or None if nothing has been recorded
+        """
+        if not self.count:
+            return None
+
+        rank = self.count * pct / 100.0
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+
+class MetricsAggregator(RequestObserver):
+    """
+    Request observer aggregating latency histograms, status counts and transfer sizes per endpoint and method.  Register
+    it using `pypushover.add_observer`.
+    """
+
+    def __init__(self, buckets=_DEFAULT_BUCKETS):
+        """
+        :param tuple buckets: the upper bounds (in seconds) of the latency histogram buckets
+        """
+        self._buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._statuses = {}
+        self._bytes_sent = {}
+        self._bytes_received = {}
+        self._rate_limits = {}
+        self._circuits = {}
+
+    def circuit_state_changed(self, name, old_state, new_state):
+        with self._lock:
+            self._circuits[name] = new_state
+
+    def after_request(self, event):
+        key = (event.endpoint, event.method)
+        status = str(event.status_code) if event.status_code is not None else type(event.error).__name__
+
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram(self._buckets)
+            histogram.record(event.duration)
+
+            status_key = key + (status, )
+            self._statuses[status_key] = self._statuses.get(status_key, 0) + 1
+            self._bytes_sent[key] = self._bytes_sent.get(key, 0) + event.bytes_sent
+            self._bytes_received[key] = self._bytes_received.get(key, 0) + event.bytes_received
+
+            if event.app_limit is not None:
+                self._rate_limits['limit'] = event.app_limit
+            if event.app_remaining is not None:
+                self._rate_limits['remaining'] = event.app_remaining
+            if event.app_reset is not None:
+                self._rate_limits['reset'] = event.app_reset
+
+    def histogram(self, endpoint, method):
+        """
+        Returns the latency histogram of the selected endpoint.
+
+        :param str endpoint: the endpoint name (see `pypushover.endpoint_name`)
+        :param str method: 'GET' or 'POST'
+        :return LatencyHistogram: the histogram, or None if no requests were made to this endpoint
+        """
+        return self._histograms.get((endpoint, method))
+
+    def percentile(self, endpoint, method, pct):
+        """
+        Estimates the selected latency percentile (in seconds) of the selected endpoint.
+
+        :param str endpoint: the endpoint name (see `pypushover.endpoint_name`)
+        :param str method: 'GET' or 'POST'
+        :param float pct: the percentile to estimate (0 - 100)
+        :return float: the estimated latency, or None if no requests were made to this endpoint
+        """
+        with self._lock:
+            histogram = self._histograms.get((endpoint, method))
+            return histogram.percentile(pct) if histogram else None
+
+    @property
+    def circuits(self):
+        """
+        The latest state of every circuit breaker which changed state.
+        """
+        with self._lock:
+            return dict(self._circuits)
+
+    @property
+    def rate_limits(self):
+        """
+        The latest `limit`, `remaining` and `reset` rate limit values returned by the Pushover servers.
+        """
+        with self._lock:
+            return dict(self._rate_limits)
+
+    def reset(self):
+        """
+        Clears all recorded metrics.
+        """
+        with self._lock:
+            self._histograms.clear()
+            self._statuses.clear()
+            self._bytes_sent.clear()
+            self._bytes_received.clear()
+            self._rate_limits.clear()
+            self._circuits.clear()
+
+    def to_prometheus(self, prefix='pypushover'):
+        """
+        Dumps the recorded metrics in the Prometheus text exposition format.
+
+        :param str prefix: prefix of every metric name
+        :return str: the metrics
+        """
+        lines = []
+        with self._lock:
+            lines.append('# HELP {}_request_duration_seconds Duration of requests to the Pushover API.'.format(prefix))
+            lines.append('# TYPE {}_request_duration_seconds histogram'.format(prefix))
+            for (endpoint, method), histogram in sorted(self._histograms.items()):
+                labels = 'endpoint="{}",method="{}"'.format(endpoint, method)
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append('{}_request_duration_seconds_bucket{{{},le="{}"}} {}'.format(
+                        prefix, labels, bound, cumulative
+                    ))
+                lines.append('{}_request_duration_seconds_bucket{{{},le="+Inf"}} {}'.format(
+                    prefix, labels, histogram.count
+                ))
+                lines.append('{}_request_duration_seconds_sum{{{}}} {}'.format(prefix, labels, histogram.total))
+                lines.append('{}_request_duration_seconds_count{{{}}} {}'.format(prefix, labels, histogram.count))
+
+            lines.append('# HELP {}_requests_total Requests to the Pushover API by response status.'.format(prefix))
+            lines.append('# TYPE {}_requests_total counter'.format(prefix))
+            for (endpoint, method, status), count in sorted(self._statuses.items()):
+                lines.append('{}_requests_total{{endpoint="{}",method="{}",status="{}"}} {}'.format(
+                    prefix, endpoint, method, status, count
+                ))
+
+            for name, values in (('sent', self._bytes_sent), ('received', self._bytes_received)):
+                lines.append('# TYPE {}_bytes_{}_total counter'.format(prefix, name))
+                for (endpoint, method), count in sorted(values.items()):
+                    lines.append('{}_bytes_{}_total{{endpoint="{}",method="{}"}} {}'.format(
+                        prefix, name, endpoint, method, count
+                    ))
+
+            for name in ('limit', 'remaining', 'reset'):
+                if name in self._rate_limits:
+                    lines.append('# TYPE {}_app_{} gauge'.format(prefix, name))
+                    lines.append('{}_app_{} {}'.format(prefix, name, self._rate_limits[name]))
+
+            if self._circuits:
+                lines.append('# HELP {}_circuit_state State of the circuit breakers (1 for the current state).'.format(
+                    prefix
+                ))
+                lines.append('# TYPE {}_circuit_state gauge'.format(prefix))
+                for name, current in sorted(self._circuits.items()):
+                    for state in (_breaker.CLOSED, _breaker.OPEN, _breaker.HALF_OPEN):
+                        lines.append('{}_circuit_state{{circuit="{}",state="{}"}} {}'.format(
+                            prefix, name, state, int(state == current)
+                        ))
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,288 @@
+"""
+=======================================================
+registry - Shared Transport for Many Pushover Apps
+=======================================================
+
+This module defines the ``AppRegistry``, sharing one transport (and its connection pool), one metrics sink and one
+background scheduler between the managers of many Pushover applications.  Each app token still keeps its own rate limit
+accounting, updated from the headers of every response.
+
+Managers created from a registry are cheap views over the shared transport: they only hold their app token and keys.
+
+    >>> import pypushover as pypo
+    >>> apps = pypo.registry.AppRegistry(pool_size=20, timeout=(3, 10))
+    >>> billing = apps.message_manager('<billing app token>', '<user key>')
+    >>> alerts = apps.message_manager('<alerts app token>', '<group key>')
+    >>> billing.push_message('Invoice paid')
+    >>> alerts.push_message('Disk full', priority=pypo.PRIORITIES.HIGH)
+    >>> apps.rate_limit('<alerts app token>').remaining
+    >>> print(apps.metrics.to_prometheus())
+
+Calls can also be run on the shared scheduler:
+
+    >>> future = apps.submit(alerts.push_message, 'Sent in the background')
+    >>> future.result().request_id
+
+The module functions take the registry as the ``registry`` option:
+
+    >>> pypo.message.push_message('<app token>', '<user key>', 'Hello', registry=apps)
+
+When the same app tokens are used from other processes or hosts, give the registry a ``limiter.Limiter`` sharing the
+budget of messages of each app token between them (see the ``limiter`` module).  A ``deadletter.Blocklist`` skips the
+messages to recipients the Pushover servers refused, and a ``deadletter.DeadLetterStore`` keeps the messages that could
+not be sent (see the ``deadletter`` module).
+"""
+
+__all__ = ('AppRegistry', 'RateLimit')
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from pypushover import client, groups, message, verification
+from pypushover._base import BlockedRecipientError, PushoverError, endpoint_name
+from pypushover.deadletter import recipient_error
+from pypushover.metrics import MetricsAggregator
+from pypushover.transport import RequestsTransport
+
+
+class RateLimit(object):
+    """
+    Rate limit accounting of a single app token, as last reported by the Pushover servers.
+    """
+    __slots__ = ('limit', 'remaining', 'reset')
+
+    def __init__(self, limit=None, remaining=None, reset=None):
+        """
+        :param int limit: the number of messages the app can send each month
+        :param int remaining: the number of messages left this month
+        :param int reset: the unix timestamp at which the limit resets
+        """
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+
+    def __repr__(self):
+        return '<RateLimit {}/{} reset={}>'.format(self.remaining, self.limit, self.reset)
+
+
+class AppRegistry(object):
+    """
+    Shares a connection pool, metrics and scheduler between the managers of many app tokens.
+    """
+
+    def __init__(self, pool_size=10, metrics=None, max_workers=None, transport=None, limiter=None, blocklist=None,
+                 dead_letters=None, **send_options):
+        """
+        :param int pool_size: the maximum number of connections kept open to the Pushover servers
+        :param metrics: the observer receiving the events of every request made through the registry.  Defaults to a
+                        new `metrics.MetricsAggregator`.
+        :param int max_workers: the number of threads of the shared scheduler (see `submit`)
+        :param Transport transport: the transport sending the requests of every manager.  Defaults to a
+                                    `transport.RequestsTransport` with a pool of `pool_size` connections.
+        :param limiter.Limiter limiter: the budgets of messages shared with the other senders of the same app tokens
+        :param deadletter.Blocklist blocklist: the recipients messages are not sent to, where the recipients refused by
+                                               the Pushover servers are added
+        :param deadletter.DeadLetterStore dead_letters: where the messages that could not be sent are kept
+        :param send_options: default options passed to `pypushover.send` by every manager of the registry
+        """
+        self.transport = RequestsTransport(pool_size=pool_size) if transport is None else transport
+        self.session = getattr(self.transport, 'session', None)
+        self.metrics = MetricsAggregator() if metrics is None else metrics
+        self.observers = [self.metrics]
+        self.limiter = limiter
+        self.blocklist = blocklist
+        self.dead_letters = dead_letters
+        self._max_workers = max_workers or pool_size
+        self._executor = None
+        self._scheduler = None
+        self._send_options = send_options
+        self._rate_limits = {}
+        self._lock = threading.Lock()
+
+    def message_manager(self, app_token, receiver_key=None, **send_options):
+        """
+        :return message.MessageManager: a message manager of `app_token` using the registry
+        """
+        return message.MessageManager(app_token, receiver_key, **self._options(send_options))
+
+    def group_manager(self, app_token, group_key, **send_options):
+        """
+        :return groups.GroupManager: a group manager of `app_token` using the registry
+        """
+        return groups.GroupManager(app_token, group_key, **self._options(send_options))
+
+    def verification_manager(self, app_token, **send_options):
+        """
+        :return verification.VerificationManager: a verification manager of `app_token` using the registry
+        """
+        return verification.VerificationManager(app_token, **self._options(send_options))
+
+    def client_manager(self, app_token, secret=None, device_id=None, **send_options):
+        """
+        :return client.ClientManager: a client manager of `app_token` using the registry
+        """
+        return client.ClientManager(app_token, secret=secret, device_id=device_id, **self._options(send_options))
+
+    def _options(self, send_options):
+        merged = dict(self._send_options)
+        merged.update(send_options)
+        merged['registry'] = self
+        return merged
+
+    def rate_limit(self, app_token):
+        """
+        Returns the rate limit accounting of the app token.  Its values are None until a response to a request made
+        with the app token has been received.
+
+        :param str app_token: the application token
+        :return RateLimit:
+        """
+        with self._lock:
+            limit = self._rate_limits.get(app_token)
+            if limit is None:
+                limit = self._rate_limits[app_token] = RateLimit()
+            return limit
+
+    def update_rate_limit(self, app_token, headers):
+        """
+        Updates the rate limit accounting of the app token from the headers of a response.
+
+        :param str app_token: the application token
+        :param headers: the response headers
+        """
+        if app_token is None or 'X-Limit-App-Remaining' not in headers:
+            return
+
+        limit = self.rate_limit(app_token)
+        limit.limit = int(headers.get('X-Limit-App-Limit', limit.limit or 0))
+        limit.remaining = int(headers['X-Limit-App-Remaining'])
+        if 'X-Limit-App-Reset' in headers:
+            limit.reset = int(headers['X-Limit-App-Reset'])
+        # the shared budget expires at the reset time: it is only seeded once that time is known
+        if self.limiter is not None and limit.reset is not None:
+            self.limiter.update(app_token, limit.limit, limit.remaining, limit.reset)
+
+    def reserve(self, app_token, url, method='POST'):
+        """
+        Draws a message from the budget of the app token shared through the `limiter`, for a request sending one.
+
+        :param str app_token: the application token
+        :param str url: the url of the request
+        :param str method: the HTTP method of the request
+        :return bool: True if a message was drawn, to `release` if it is not sent
+        :raises PushoverError: when the budget of the app token is used up
+        """
+        if self.limiter is None or app_token is None or not _is_message(url, method):
+            return False
+        if not self.limiter.acquire(app_token):
+            raise PushoverError(['monthly message limit of the app reached until {}'.format(
+                self.limiter.state(app_token).reset)])
+        return True
+
+    def release(self, app_token):
+        """
+        Gives back a message drawn by `reserve` and not sent.
+
+        :param str app_token: the application token
+        """
+        self.limiter.release(app_token)
+
+    def check_recipient(self, url, method, data_out):
+        """
+        Refuses to send a message to a recipient of the `blocklist`.
+
+        :param str url: the url of the request
+        :param str method: the HTTP method of the request
+        :param dict data_out: the fields of the request
+        :raises BlockedRecipientError: when the recipient of the message is blocked
+        """
+        if self.blocklist is None or not data_out or not _is_message(url, method):
+            return
+        reason = self.blocklist.blocked(data_out.get('user'), data_out.get('device'))
+        if reason is not None:
+            raise BlockedRecipientError(['{} (blocked locally)'.format(reason)])
+
+    def message_failed(self, url, method, data_out, error):
+        """
+        Blocks the recipient of a message refused by the Pushover servers, and keeps the message in the
+        `dead_letters`.  Messages refused locally, without reaching the Pushover servers (blocked recipients, open
+        circuits, used up budgets, ...), are not kept: they fail the same way when sent again right away.
+
+        :param str url: the url of the request
+        :param str method: the HTTP method of the request
+        :param dict data_out: the fields of the request
+        :param Exception error: the error raised when sending the message
+        """
+        if not data_out or not _is_message(url, method):
+            return
+        if not isinstance(error, requests.RequestException) and getattr(error, 'response', None) is None:
+            return  # refused locally
+        recipient = recipient_error(error) if self.blocklist is not None else None
+        if recipient is not None:
+            errors = getattr(error.response, 'errors', None) or ['{} refused'.format(recipient)]
+            device = data_out.get('device') if recipient == 'device' else None
+            self.blocklist.add(data_out.get('user'), device, reason='; '.join(errors))
+        if self.dead_letters is not None:
+            self.dead_letters.add(data_out, error)
+
+    @property
+    def executor(self):
+        """
+        The shared scheduler running the calls given to `submit`.
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        return self._executor
+
+    @property
+    def scheduler(self):
+        """
+        The `scheduler.Scheduler` sending future-dated and recurring messages through the registry, on the shared
+        scheduler.
+        """
+        if self._scheduler is None:
+            from pypushover.scheduler import Scheduler  # a tool module, only loaded when the scheduler is used
+            executor = self.executor
+            with self._lock:
+                if self._scheduler is None:
+                    self._scheduler = Scheduler(executor=executor, registry=self)
+        return self._scheduler
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Runs the call on the shared scheduler.
+
+        :return concurrent.futures.Future: the future result of the call
+        """
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def close(self):
+        """
+        Waits for the scheduled calls and closes the transport, the limiter and the dead letters.  Messages of the
+        `scheduler` that are not yet due are dropped.
+        """
+        if self._scheduler is not None:
+            self._scheduler.close()
+            self._scheduler = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.transport.close()
+        if self.limiter is not None:
+            self.limiter.close()
+        if self.dead_letters is not None:
+            self.dead_letters.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _is_message(url, method):
+    return method == 'POST' and endpoint_name(url) == 'messages.json'
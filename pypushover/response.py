@@ -0,0 +1,139 @@
+"""
+==================================================
+response - Responses from the Pushover API
+==================================================
+
+This module defines the object returned by every call made to the Pushover servers.  The body of a response is only
+decoded once one of its fields is accessed, using ``orjson`` or ``ujson`` when one of them is installed and the
+standard ``json`` module otherwise.
+
+The most common fields are available as attributes, and responses can still be used as the dictionaries returned by
+previous versions:
+
+    >>> import pypushover as pypo
+    >>> res = pypo.message.push_message('<app_token>', '<user key>', 'Hello World!')
+    >>> res.request_id, res.app_remaining
+    >>> res['request'], res['app_remaining']
+"""
+
+__all__ = ('PushoverResponse', 'loads')
+
+from collections.abc import MutableMapping
+
+try:
+    import orjson as _json
+except ImportError:
+    try:
+        import ujson as _json
+    except ImportError:
+        import json as _json
+
+_rate_limit_headers = (
+    ('app_limit', 'X-Limit-App-Limit'),
+    ('app_remaining', 'X-Limit-App-Remaining'),
+    ('app_reset', 'X-Limit-App-Reset'),
+)
+
+
+def loads(content):
+    """
+    Decodes a JSON document with the fastest decoder installed.
+
+    :param bytes content: the JSON document
+    :return: the decoded document
+    """
+    return _json.loads(content)
+
+
+class PushoverResponse(MutableMapping):
+    """
+    Response of a call to the Pushover servers.  The JSON body is decoded lazily on first access.  Rate limit headers
+    are available both as (int) attributes and, as in the dictionary returned by previous versions, as the
+    `app_limit`, `app_remaining` and `app_reset` items.
+    """
+    __slots__ = ('status_code', 'headers', 'content', '_data')
+
+    def __init__(self, content, status_code=200, headers=None):
+        """
+        :param bytes content: the raw JSON body
+        :param int status_code: the HTTP status of the response
+        :param headers: the headers of the response
+        """
+        self.status_code = status_code
+        self.headers = headers if headers is not None else {}
+        self.content = content
+        self._data = None
+
+    @property
+    def data(self):
+        """
+        The decoded body, along with the rate limit headers.
+        """
+        data = self._data
+        if data is None:
+            data = loads(self.content)
+            for key, header in _rate_limit_headers:
+                if header in self.headers:
+                    data[key] = self.headers[header]
+            self._data = data
+        return data
+
+    @property
+    def status(self):
+        return self.data.get('status')
+
+    @property
+    def request_id(self):
+        return self.data.get('request')
+
+    @property
+    def receipt(self):
+        return self.data.get('receipt')
+
+    @property
+    def errors(self):
+        return self.data.get('errors')
+
+    @property
+    def queued(self):
+        """
+        True if the request was queued by a `breaker.QueueFallback` while its circuit was open, rather than sent.
+        """
+        return bool(self.data.get('queued'))
+
+    @property
+    def app_limit(self):
+        return self._header_int('X-Limit-App-Limit')
+
+    @property
+    def app_remaining(self):
+        return self._header_int('X-Limit-App-Remaining')
+
+    @property
+    def app_reset(self):
+        return self._header_int('X-Limit-App-Reset')
+
+    def _header_int(self, header):
+        value = self.headers.get(header)
+        return int(value) if value is not None else None
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __repr__(self):
+        return '<PushoverResponse [{}] {!r}>'.format(self.status_code, self.data)
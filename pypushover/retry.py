@@ -0,0 +1,149 @@
+"""
+===========================================
+retry - Retry Policies for the Pushover API
+===========================================
+
+This module defines the policy deciding which failed requests are sent again and how long to wait before doing so.
+Every call to the Pushover servers goes through the ``default_policy`` unless a ``retry_policy`` is passed to the call
+or its manager.
+
+What is Retried:
+----------------
+
+* Connection errors and timeouts of GET requests.  These are idempotent and can always be sent again.
+* POST requests (pushes, group changes, ...) only when the connection could not be established, since any other
+  failure may have happened after Pushover processed the request and retrying could deliver a message twice.  Set
+  ``retry_posts=True`` to also retry these on timeouts, connection resets and 5xx responses.
+* ``429`` responses, once the rate limit resets.  Pushover sends the time of the reset in the ``X-Limit-App-Reset``
+  header.  If the reset is further away than ``max_reset_wait`` (or the call's deadline), the error is raised instead.
+* ``5xx`` responses of GET requests.
+
+Any other ``4xx`` response (``status: 0``) is a permanent error and is raised straight away as a ``PushoverError``.
+
+Waits between attempts use exponential backoff with full jitter: a random wait between 0 and
+``min(max_backoff, backoff * 2 ** (attempt - 1))``.  Waits never extend past the call's deadline.
+
+Using a Policy:
+---------------
+
+    >>> import pypushover as pypo
+    >>> policy = pypo.retry.RetryPolicy(max_attempts=5, backoff=1)
+    >>> pm = pypo.message.MessageManager('<app_token>', '<group/user key>', retry_policy=policy)
+    >>> pypo.message.check_receipt('<app_token>', '<receipt>', retry_policy=pypo.retry.NO_RETRY)
+"""
+
+__all__ = ('RetryPolicy', 'NO_RETRY', 'default_policy')
+
+import random
+import time
+from email.utils import mktime_tz, parsedate_tz
+
+import requests
+
+try:
+    from urllib3.exceptions import NewConnectionError
+except ImportError:
+    from requests.packages.urllib3.exceptions import NewConnectionError
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed request is retried and how long to wait before the next attempt.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=30, retry_statuses=(429, 500, 502, 503, 504),
+                 retry_posts=False, max_reset_wait=60):
+        """
+        :param int max_attempts: the maximum number of attempts (including the first one) of a request
+        :param float backoff: the base wait (in seconds) of the exponential backoff
+        :param float max_backoff: the maximum wait (in seconds) between two attempts
+        :param tuple retry_statuses: the HTTP statuses that are retried
+        :param bool retry_posts: retry POST requests that may have reached the Pushover servers (timeouts, connection
+                                 resets and 5xx responses).  This can deliver a message more than once.
+        :param float max_reset_wait: the maximum wait (in seconds) for the rate limit to reset after a 429 response
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_posts = retry_posts
+        self.max_reset_wait = max_reset_wait
+
+    def retry_delay(self, attempt, method, status_code=None, headers=None, error=None):
+        """
+        Returns the seconds to wait before retrying a failed attempt, or None if it must not be retried.
+
+        :param int attempt: the number of the attempt that failed (starting at 1)
+        :param str method: 'GET' or 'POST'
+        :param int status_code: the HTTP status of the response (if one was received)
+        :param headers: the headers of the response (if one was received)
+        :param Exception error: the error raised by the request (if no response was received)
+        :return float: the seconds to wait, or None
+        """
+        if attempt >= self.max_attempts:
+            return None
+
+        if error is not None:
+            if not self._is_retryable_error(method, error):
+                return None
+            return self._jittered(attempt)
+
+        if status_code not in self.retry_statuses:
+            return None
+
+        if status_code == 429:
+            return self._rate_limit_delay(attempt, headers or {})
+
+        if method != 'GET' and not self.retry_posts:
+            return None
+        return self._jittered(attempt)
+
+    def _is_retryable_error(self, method, error):
+        if not isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return False
+        if method == 'GET' or self.retry_posts:
+            return True
+
+        # a POST is only safe to send again if it never reached the server
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], 'reason', error.args[0]) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    def _rate_limit_delay(self, attempt, headers):
+        retry_after = headers.get('Retry-After')
+        reset = headers.get('X-Limit-App-Reset')
+        if retry_after is not None:
+            delay = _retry_after_delay(retry_after)
+            if delay is None:
+                return self._jittered(attempt)
+        elif reset is not None:
+            delay = max(float(reset) - time.time(), 0)
+        else:
+            return self._jittered(attempt)
+
+        if delay > self.max_reset_wait:
+            return None
+
+        # spread the callers waiting on the same reset
+        return delay + random.uniform(0, self.backoff)
+
+    def _jittered(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+def _retry_after_delay(retry_after):
+    """
+    Returns the seconds to wait given by a `Retry-After` header, either a number of seconds or an HTTP date (None if
+    it is neither).
+    """
+    try:
+        return max(float(retry_after), 0)
+    except ValueError:
+        date = parsedate_tz(retry_after)
+        return max(mktime_tz(date) - time.time(), 0) if date is not None else None
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+default_policy = RetryPolicy()
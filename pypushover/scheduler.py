@@ -0,0 +1,250 @@
+"""
+================================================
+scheduler - Future-Dated and Recurring Messages
+================================================
+
+This module defines the ``Scheduler``, sending messages at a later time, once or repeatedly.  Every job is kept in a
+single heap watched by a single thread, which hands the jobs to a thread pool once they are due: scheduling a job or
+cancelling it takes O(log n) time, and jobs fire on time however many of them are scheduled.
+
+    >>> import datetime
+    >>> import pypushover as pypo
+    >>> import pypushover.scheduler
+    >>> scheduler = pypo.scheduler.Scheduler()
+    >>> job = scheduler.schedule(datetime.datetime(2030, 1, 1, 9), '<app token>', '<user key>', 'Happy new year!')
+    >>> daily = scheduler.schedule(time.time() + 60, '<app token>', '<user key>', 'Stand-up', every=86400)
+    >>> scheduler.cancel(job)
+    True
+
+The scheduler of an ``AppRegistry`` sends its messages through the registry:
+
+    >>> apps = pypo.registry.AppRegistry()
+    >>> apps.scheduler.schedule(time.time() + 3600, '<app token>', '<user key>', 'In an hour')
+
+Persistence:
+------------
+Given a ``path``, jobs are also stored in a SQLite database and scheduled again when a scheduler is created with the
+same path, so they survive restarts.  The arguments of persisted jobs must then be JSON serializable.
+
+    >>> scheduler = pypo.scheduler.Scheduler(path='/var/lib/myapp/pushes.db')
+"""
+
+__all__ = ('Scheduler', 'Job')
+
+import heapq
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from pypushover.message import push_message
+
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+_COMMIT_INTERVAL = 1.0
+
+
+def _timestamp(when):
+    return time.mktime(when.timetuple()) + when.microsecond / 1e6 if hasattr(when, 'timetuple') else float(when)
+
+
+class Job(object):
+    """
+    A message scheduled to be sent.
+    """
+    __slots__ = ('id', 'due', 'every', 'token', 'user', 'message', 'kwargs', 'cancelled')
+
+    def __init__(self, id, due, every, token, user, message, kwargs):
+        self.id = id
+        self.due = due
+        self.every = every
+        self.token = token
+        self.user = user
+        self.message = message
+        self.kwargs = kwargs
+        self.cancelled = False
+
+    def __repr__(self):
+        return '<Job {} due={} every={}>'.format(self.id, self.due, self.every)
+
+
+class Scheduler(object):
+    """
+    Sends messages at a later time, once or repeatedly, from a single scheduling thread.
+    """
+
+    def __init__(self, path=None, executor=None, max_workers=4, **send_options):
+        """
+        :param str path: a SQLite database the jobs are persisted to
+        :param concurrent.futures.Executor executor: the executor sending the messages once due.  Defaults to a thread
+                                                     pool of `max_workers` threads.
+        :param int max_workers: the number of threads of the default executor
+        :param send_options: options passed to `pypushover.send` for every message, such as `registry`
+        """
+        self._send_options = send_options
+        self._executor = executor
+        self._own_executor = executor is None
+        self._max_workers = max_workers
+        self._heap = []
+        self._jobs = {}
+        self._seq = itertools.count()
+        self._cancelled = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._db = None
+        self._dirty = False
+
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, due REAL, every REAL, token TEXT, '
+                             'user TEXT, message TEXT, kwargs TEXT)')
+            for row in self._db.execute('SELECT id, due, every, token, user, message, kwargs FROM jobs'):
+                self._push(Job(*(row[:6] + (json.loads(row[6]), ))))
+
+        self._thread = threading.Thread(target=self._run, name='pypushover-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def schedule(self, when, token, user, message, every=None, **kwargs):
+        """
+        Schedules a message.
+
+        :param when: when to send the message, as a `datetime` or a unix timestamp
+        :param str token: application token
+        :param str user: user or group id to send the message to
+        :param str message: your message
+        :param float every: seconds between each sending of a recurring message
+        :param kwargs: the other arguments of `message.push_message`
+        :return str: the id of the job
+        """
+        job = Job(uuid.uuid4().hex, _timestamp(when), every, token, user, message, kwargs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Cannot schedule messages on a closed scheduler')
+            if self._db is not None:
+                self._db.execute('INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)', (
+                    job.id, job.due, job.every, job.token, job.user, job.message, json.dumps(job.kwargs)
+                ))
+                self._dirty = True
+            self._push(job)
+            if self._heap[0][2] is job:
+                self._cond.notify()
+        return job.id
+
+    def cancel(self, job_id):
+        """
+        Cancels a job.
+
+        :param str job_id: the id returned by `schedule`
+        :return bool: True if the job was cancelled, False if it was not found (already sent or cancelled)
+        """
+        with self._cond:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return False
+            job.cancelled = True
+            self._cancelled += 1
+            self._delete(job)
+            # drop cancelled jobs once they make up most of the heap
+            if self._cancelled > len(self._heap) // 2:
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+        return True
+
+    def jobs(self):
+        """
+        :return list: the scheduled jobs
+        """
+        with self._cond:
+            return list(self._jobs.values())
+
+    def __len__(self):
+        return len(self._jobs)
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        return self._executor
+
+    def close(self, wait=True):
+        """
+        Stops the scheduler.  Jobs not yet due are kept in the database, if any.
+
+        :param bool wait: wait for the messages being sent
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=wait)
+        if self._db is not None:
+            with self._cond:
+                self._db.commit()
+                self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _push(self, job):
+        self._jobs[job.id] = job
+        heapq.heappush(self._heap, (job.due, next(self._seq), job))
+
+    def _delete(self, job):
+        if self._db is not None:
+            self._db.execute('DELETE FROM jobs WHERE id = ?', (job.id, ))
+            self._dirty = True
+
+    def _run(self):
+        last_commit = time.time()
+        while True:
+            with self._cond:
+                while True:
+                    now = time.time()
+                    if self._dirty and now - last_commit >= _COMMIT_INTERVAL:
+                        self._db.commit()
+                        self._dirty = False
+                        last_commit = now
+                    if self._closed:
+                        return
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                        self._cancelled -= 1
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    if self._dirty:
+                        timeout = min(timeout, _COMMIT_INTERVAL) if timeout is not None else _COMMIT_INTERVAL
+                    self._cond.wait(timeout)
+
+                job = heapq.heappop(self._heap)[2]
+                if job.every:
+                    # the next sending is due `every` seconds after this one, skipping any missed while stopped
+                    job.due += job.every * max(1, int((now - job.due) // job.every) + 1)
+                    heapq.heappush(self._heap, (job.due, next(self._seq), job))
+                    if self._db is not None:
+                        self._db.execute('UPDATE jobs SET due = ? WHERE id = ?', (job.due, job.id))
+                        self._dirty = True
+                else:
+                    del self._jobs[job.id]
+                    self._delete(job)
+
+            self.executor.submit(self._send, job)
+
+    def _send(self, job):
+        kwargs = dict(job.kwargs)
+        kwargs.update(self._send_options)
+        try:
+            push_message(job.token, job.user, job.message, **kwargs)
+        except Exception:
+            logging.exception('Failed to send the scheduled message {}'.format(job.id))
@@ -0,0 +1,350 @@
+"""
+==================================================
+transport - HTTP Backends for the Pushover API
+==================================================
+
+This module defines the transports sending the requests of ``pypushover.send`` to the Pushover servers.  A transport
+is chosen for a single call, for all the calls of a manager, or for all the managers of an ``AppRegistry`` with the
+``transport`` option:
+
+    >>> import pypushover as pypo
+    >>> h2 = pypo.transport.HTTP2Transport()
+    >>> pm = pypo.message.MessageManager('<app_token>', '<user key>', transport=h2)
+    >>> pm.push_message('Sent over HTTP/2')
+    >>> apps = pypo.registry.AppRegistry(transport=pypo.transport.Urllib3Transport(pool_size=20))
+
+The following transports are available:
+
+* ``RequestsTransport`` - the default, sending requests with ``requests``
+* ``Urllib3Transport`` - sends requests with ``urllib3`` directly, skipping the overhead of ``requests``
+* ``HTTP2Transport`` - multiplexes concurrent requests over a single HTTP/2 connection.  Requires ``httpx`` with HTTP/2
+  support (``pip install pypushover[http2]``).
+* ``MemoryTransport`` - keeps the requests in memory and answers them without any network traffic, for tests
+* ``NullTransport`` - drops every request and answers it as sent, to shed load
+* ``RedirectTransport`` - sends the requests to another server than Pushover's (a stand-in server, a proxy, ...)
+
+Writing a Transport:
+--------------------
+Transports subclass ``Transport`` and implement ``request``.  Connection failures and timeouts are raised as the
+matching ``requests`` exceptions (``requests.ConnectTimeout``, ``requests.ReadTimeout``, ``requests.ConnectionError``)
+so that calls are retried the same whichever transport sends them.  ``requests.ConnectionError`` should wrap a
+``urllib3.exceptions.NewConnectionError`` when the request never reached the server.  Transports given a ``Deadline``
+give up on the request once it passes, raising ``requests.ReadTimeout``.
+"""
+
+__all__ = ('Transport', 'RequestsTransport', 'Urllib3Transport', 'HTTP2Transport', 'MemoryTransport',
+           'NullTransport', 'RedirectTransport', 'Request', 'default_transport', 'form_fields')
+
+import collections
+import json
+import threading
+
+from urllib.parse import parse_qsl, urlencode
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError, ReadTimeoutError
+
+from pypushover import _base
+from pypushover.response import PushoverResponse
+
+
+def _split_timeout(timeout):
+    if isinstance(timeout, tuple):
+        return timeout
+    return timeout, timeout
+
+
+def _read_body(res, read, deadline):
+    """
+    Reads the body of a `urllib3` response, capping the timeout of each read at the time left before the deadline.  The
+    connection is closed rather than reused once the deadline passes.
+
+    :param urllib3.HTTPResponse res: a response whose body was not preloaded
+    :param float read: the read timeout
+    :param Deadline deadline: the deadline of the request
+    :return bytes: the body of the response
+    """
+    read1 = getattr(res, 'read1', None)  # urllib3 2
+    chunks = []
+    try:
+        while True:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                raise requests.ReadTimeout('Deadline exceeded reading the response')
+            sock = getattr(res.connection, 'sock', None)
+            if sock is not None:
+                sock.settimeout(remaining if read is None else min(read, remaining))
+            chunk = read1(8192, decode_content=True) if read1 is not None else res.read(1024, decode_content=True)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except BaseException:
+        res.close()
+        raise
+    res.release_conn()
+    return b''.join(chunks)
+
+
+def _url(url, params):
+    return '{}?{}'.format(url, urlencode(params, doseq=True)) if params else url
+
+
+def form_fields(body, headers):
+    """
+    Decodes a form-encoded request body.
+
+    :param body: the body of the request
+    :param dict headers: the headers of the request
+    :return dict: the fields of the body, or None if it is not form-encoded
+    """
+    if body is None or not isinstance(body, bytes) or not headers or \
+            not headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+        return None
+    return dict(parse_qsl(body.decode('utf-8'), keep_blank_values=True))
+
+
+class Transport(object):
+    """
+    Sends requests to the Pushover servers.
+    """
+
+    def request(self, method, url, params=None, body=None, headers=None, timeout=None, deadline=None):
+        """
+        Sends a request and returns its response.
+
+        :param str method: 'GET' or 'POST'
+        :param str url: url to send the request to
+        :param dict params: the query string parameters
+        :param body: the request body: bytes, or a file-like object with a known length
+        :param dict headers: the request headers
+        :param timeout: seconds to wait for the connection and for the response, either as a single number or a
+                        (connect, read) tuple
+        :param Deadline deadline: (Optional) the deadline of the whole request, response included.  The request is given
+                                  up on with a `requests.ReadTimeout` once it passes, even while the response is still
+                                  being read.
+        :return PushoverResponse: the response, its body not yet decoded
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Closes the connections of the transport.
+        """
+
+
+class RequestsTransport(Transport):
+    """
+    Sends requests with `requests`, through a session when given one.
+    """
+
+    def __init__(self, session=None, pool_size=None):
+        """
+        :param requests.Session session: the session sending the requests.  Without a session or `pool_size`, every
+                                         request is sent with the module functions of `requests`.
+        :param int pool_size: the maximum number of connections kept open by a new session
+        """
+        if session is None and pool_size is not None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+
+    def request(self, method, url, params=None, body=None, headers=None, timeout=None, deadline=None):
+        http = self.session if self.session is not None else requests
+        stream = deadline is not None  # the body is then read by `_read_body`
+        if method == 'GET':
+            res = http.get(url, params=params, timeout=timeout, stream=stream)
+        elif body is not None:
+            res = http.post(url, data=body, headers=headers, timeout=timeout, stream=stream)
+        else:
+            res = http.post(url, params=params, timeout=timeout, stream=stream)
+        if not stream:
+            return PushoverResponse(res.content, res.status_code, res.headers)
+        try:
+            content = _read_body(res.raw, _split_timeout(timeout)[1], deadline)
+        except ReadTimeoutError as e:
+            raise requests.ReadTimeout(e)
+        except urllib3.exceptions.HTTPError as e:
+            raise requests.ConnectionError(e)
+        return PushoverResponse(content, res.status_code, res.headers)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+
+class Urllib3Transport(Transport):
+    """
+    Sends requests with `urllib3` directly.
+    """
+
+    def __init__(self, pool_size=10, **pool_kwargs):
+        """
+        :param int pool_size: the maximum number of connections kept open to each host
+        :param pool_kwargs: other arguments of `urllib3.PoolManager`
+        """
+        self.pool = urllib3.PoolManager(maxsize=pool_size, retries=False, **pool_kwargs)
+
+    def request(self, method, url, params=None, body=None, headers=None, timeout=None, deadline=None):
+        if body is not None:
+            headers = dict(headers or {}, **{'Content-Length': str(len(body))})
+        connect, read = _split_timeout(timeout)
+        try:
+            res = self.pool.urlopen(method, _url(url, params), body=body, headers=headers, retries=False,
+                                    timeout=urllib3.Timeout(connect=connect, read=read),
+                                    preload_content=deadline is None)
+            content = res.data if deadline is None else _read_body(res, read, deadline)
+        except NewConnectionError as e:
+            raise requests.ConnectionError(e)
+        except ConnectTimeoutError as e:
+            raise requests.ConnectTimeout(e)
+        except ReadTimeoutError as e:
+            raise requests.ReadTimeout(e)
+        except urllib3.exceptions.HTTPError as e:
+            raise requests.ConnectionError(e)
+        return PushoverResponse(content, res.status, res.headers)
+
+    def close(self):
+        self.pool.clear()
+
+
+class HTTP2Transport(Transport):
+    """
+    Multiplexes concurrent requests over a single HTTP/2 connection to each host.  Requires `httpx` with HTTP/2 support.
+    """
+
+    def __init__(self, max_connections=1, **client_kwargs):
+        """
+        :param int max_connections: the number of connections opened to each host
+        :param client_kwargs: other arguments of `httpx.Client`
+        """
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError('HTTP2Transport requires httpx: pip install pypushover[http2]')
+        self._httpx = httpx
+        self.client = httpx.Client(http2=True, limits=httpx.Limits(max_connections=max_connections), **client_kwargs)
+
+    def request(self, method, url, params=None, body=None, headers=None, timeout=None, deadline=None):
+        httpx = self._httpx
+        connect, read = _split_timeout(timeout)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if body is not None:
+            headers = dict(headers or {}, **{'Content-Length': str(len(body))})
+            if not isinstance(body, bytes):
+                body = (bytes(chunk) for chunk in body)  # a `MultipartBody`, streamed chunk by chunk
+        timeout = httpx.Timeout(read, connect=connect, pool=connect)
+        try:
+            if deadline is None:
+                res = self.client.request(method, url, params=params, content=body, headers=headers, timeout=timeout)
+                content = res.content
+            else:
+                # the read timeout of httpx is fixed for the request: the deadline is checked between the chunks read
+                with self.client.stream(method, url, params=params, content=body, headers=headers,
+                                        timeout=timeout) as res:
+                    chunks = []
+                    for chunk in res.iter_bytes():
+                        if deadline.expired():
+                            raise requests.ReadTimeout('Deadline exceeded reading the response')
+                        chunks.append(chunk)
+                    content = b''.join(chunks)
+        except httpx.ConnectTimeout as e:
+            raise requests.ConnectTimeout(e)
+        except httpx.ConnectError as e:
+            raise requests.ConnectionError(NewConnectionError(None, str(e)))
+        except httpx.TimeoutException as e:
+            raise requests.ReadTimeout(e)
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(e)
+        return PushoverResponse(content, res.status_code, res.headers)
+
+    def close(self):
+        self.client.close()
+
+
+class Request(object):
+    """
+    A request kept by a `MemoryTransport`.  Its `params` are the fields of the request, whether sent in the query string
+    or in a form-encoded body.
+    """
+    __slots__ = ('method', 'url', 'params', 'body', 'headers', 'timeout')
+
+    def __init__(self, method, url, params=None, body=None, headers=None, timeout=None):
+        self.method = method
+        self.url = url
+        self.params = params
+        self.body = body
+        self.headers = headers
+        self.timeout = timeout
+
+    def __repr__(self):
+        return '<Request {} {}>'.format(self.method, self.url)
+
+
+class MemoryTransport(Transport):
+    """
+    Keeps the requests in memory and answers them without any network traffic.
+    """
+
+    def __init__(self, response=None, maxlen=None):
+        """
+        :param response: the answer to every request: a `PushoverResponse`, a dictionary sent back as the JSON body, or
+                         a callable taking the `Request` and returning either.  Defaults to a successful response.
+        :param int maxlen: the number of requests kept (all of them by default)
+        """
+        self.response = {'status': 1, 'request': 'memory'} if response is None else response
+        self.requests = collections.deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def request(self, method, url, params=None, body=None, headers=None, timeout=None, deadline=None):
+        if body is not None and hasattr(body, 'read'):
+            body = body.read()
+        fields = dict(params) if params else form_fields(body, headers)
+        request = Request(method, url, fields if fields is not None else params, body, headers, timeout)
+        with self._lock:
+            self.requests.append(request)
+
+        response = self.response(request) if callable(self.response) else self.response
+        if isinstance(response, PushoverResponse):
+            return PushoverResponse(response.content, response.status_code, response.headers)
+        return PushoverResponse(json.dumps(response).encode('utf-8'))
+
+
+class NullTransport(Transport):
+    """
+    Drops every request and answers it as sent.
+    """
+    _content = json.dumps({'status': 1, 'request': 'null'}).encode('utf-8')
+
+    def request(self, method, url, params=None, body=None, headers=None, timeout=None, deadline=None):
+        return PushoverResponse(self._content)
+
+
+class RedirectTransport(Transport):
+    """
+    Sends the requests meant for the Pushover API to another server, through another transport.
+    """
+
+    def __init__(self, base_url, transport=None):
+        """
+        :param str base_url: the url replacing `pypushover.base_url`, such as 'http://localhost:8080/1/'
+        :param Transport transport: the transport sending the requests (a new `RequestsTransport` by default)
+        """
+        self.base_url = base_url
+        self.transport = RequestsTransport(pool_size=10) if transport is None else transport
+
+    def request(self, method, url, params=None, body=None, headers=None, timeout=None, deadline=None):
+        if url.startswith(_base.base_url):
+            url = self.base_url + url[len(_base.base_url):]
+        return self.transport.request(method, url, params=params, body=body, headers=headers, timeout=timeout,
+                                      deadline=deadline)
+
+    def close(self):
+        self.transport.close()
+
+
+default_transport = RequestsTransport()
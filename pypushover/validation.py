@@ -0,0 +1,188 @@
+"""
+=========================================================
+validation - Local Checks of Requests to the Pushover API
+=========================================================
+
+This module defines the checks run on every request before it is sent to the Pushover servers.  Requests the servers
+would reject (over-length messages, titles or URLs, malformed user, group or receipt keys, unknown sounds or
+priorities, ...) raise a ``ValidationError`` without any network round trip.  ``ValidationError`` is both a
+``PushoverError`` and a ``ValueError``.
+
+The checks of each endpoint are compiled once into a ``Schema``: validating a request only runs precompiled regular
+expressions and comparisons over its fields.
+
+Validating a Batch of Messages:
+-------------------------------
+A batch of messages (dictionaries of ``push_message`` arguments, including ``token`` and ``user``) is validated in a
+single pass with ``validate_messages``, which returns the errors of every invalid message:
+
+    >>> import pypushover as pypo
+    >>> errors = pypo.validation.validate_messages([
+    ...     {'token': '<app token>', 'user': '<user key>', 'message': 'Hello'},
+    ...     {'token': '<app token>', 'user': 'not a key', 'message': 'Hello'},
+    ... ])
+    >>> errors
+    [(1, ['`user` must be 30 letters and digits'])]
+
+Custom Sounds:
+--------------
+Sounds are checked against the sounds defined in ``pypushover.SOUNDS`` and those returned by ``SOUNDS.CurrentSounds``.
+Register any other custom sound uploaded to Pushover with ``add_sounds``:
+
+    >>> pypo.validation.add_sounds('my_custom_sound')
+
+Set ``pypushover.validation.enabled`` to False to skip every check.
+"""
+
+__all__ = ('Schema', 'ValidationError', 'validate_messages', 'add_sounds', 'enabled',
+           'MESSAGE', 'RECEIPT', 'TAG', 'GROUP', 'GROUP_USER', 'GROUP_NAME', 'GROUP_RENAME', 'VERIFY', 'LICENSE')
+
+import re
+
+from pypushover.Constants import OS, PRIORITIES, SOUNDS
+from pypushover._base import ValidationError
+
+MAX_MESSAGE_LENGTH = 1024
+MAX_TITLE_LENGTH = 250
+MAX_URL_LENGTH = 512
+MAX_URL_TITLE_LENGTH = 100
+MAX_MEMO_LENGTH = 200
+
+_key = re.compile(r'[A-Za-z0-9]{30}\Z')
+_device = re.compile(r'[A-Za-z0-9_-]{1,25}\Z')
+_email = re.compile(r'[^@\s]+@[^@\s]+\Z')
+_tag = re.compile(r'[^,/\s]{1,100}\Z')
+
+_sounds = set(v for k, v in vars(SOUNDS).items() if k.isupper() and isinstance(v, str))
+_priorities = frozenset((PRIORITIES.LOWEST, PRIORITIES.LOW, PRIORITIES.NORMAL, PRIORITIES.HIGH, PRIORITIES.EMERGENCY))
+_os = frozenset((OS.ANDROID, OS.IOS, OS.DESKTOP))
+
+enabled = True
+
+
+def add_sounds(*sounds):
+    """
+    Registers custom sounds so that they pass validation.
+
+    :param str sounds: the names of the sounds
+    """
+    _sounds.update(sounds)
+
+
+def _key_check(value):
+    return _key.match(value) is not None if isinstance(value, str) else False
+
+
+def _devices_check(value):
+    names = value.split(',') if isinstance(value, str) else value
+    return all(isinstance(name, str) and _device.match(name) for name in names)
+
+
+def _tags_check(value):
+    tags = value.split(',') if isinstance(value, str) else value
+    return all(isinstance(tag, str) and _tag.match(tag) for tag in tags)
+
+
+def _max_length(length):
+    return lambda value: not hasattr(value, '__len__') or len(value) <= length
+
+
+def _one_of(values):
+    return lambda value: value in values
+
+
+_checks = {
+    'key': (_key_check, '`{}` must be 30 letters and digits'),
+    'devices': (_devices_check, '`{}` must be device names of up to 25 letters, digits, `_` or `-`'),
+    'text': (lambda value: isinstance(value, str) and len(value) > 0, '`{}` must not be empty'),
+    'tag': (lambda value: isinstance(value, str) and _tag.match(value) is not None,
+            '`{}` must be a tag of up to 100 characters, without `,`, `/` or spaces'),
+    'tags': (_tags_check, '`{}` must be tags of up to 100 characters, without `,`, `/` or spaces'),
+    'email': (lambda value: _email.match(value) is not None, '`{}` must be an email address'),
+    'sound': (_one_of(_sounds), '`{}` must be one of the SOUNDS (see `validation.add_sounds` for custom sounds)'),
+    'priority': (_one_of(_priorities), '`{}` must be one of the PRIORITIES'),
+    'os': (_one_of(_os), '`{}` must be one of the OS'),
+}
+
+
+class Schema(object):
+    """
+    The compiled checks of the fields of one endpoint.
+    """
+    __slots__ = ('_checks', '_required')
+
+    def __init__(self, required=(), **fields):
+        """
+        :param tuple required: the fields that must be given
+        :param fields: the checks of each field: the name of a common check ('key', 'devices', 'tag', 'tags', 'text',
+                       'email', 'sound', 'priority', 'os'), the maximum length of the field, or a tuple of these
+        """
+        checks = []
+        for field, specs in sorted(fields.items()):
+            for spec in specs if isinstance(specs, tuple) else (specs, ):
+                if isinstance(spec, int):
+                    check = (_max_length(spec), '`{}` must be at most %d characters' % spec)
+                else:
+                    check = _checks[spec]
+                checks.append((field, check[0], check[1].format(field)))
+        self._checks = tuple(checks)
+        self._required = tuple((field, '`{}` is required'.format(field)) for field in required)
+
+    def errors(self, data):
+        """
+        Returns the errors of the request.
+
+        :param dict data: the fields of the request
+        :return list: the error messages (empty if the request is valid)
+        """
+        errors = [message for field, message in self._required if data.get(field) is None]
+        for field, check, message in self._checks:
+            value = data.get(field)
+            if value is not None and not check(value):
+                errors.append(message)
+        return errors
+
+    def validate(self, data):
+        """
+        Raises a `ValidationError` if the request is invalid.
+
+        :param dict data: the fields of the request
+        """
+        if enabled:
+            errors = self.errors(data)
+            if errors:
+                raise ValidationError(errors)
+
+
+MESSAGE = Schema(
+    required=('token', 'user', 'message'),
+    token='key', user='key', message=('text', MAX_MESSAGE_LENGTH), device='devices', sound='sound',
+    priority='priority', title=MAX_TITLE_LENGTH, url=MAX_URL_LENGTH, url_title=MAX_URL_TITLE_LENGTH,
+    callback=MAX_URL_LENGTH, tags='tags'
+)
+
+RECEIPT = Schema(required=('token', 'receipt'), token='key', receipt='key')
+TAG = Schema(required=('token', 'tag'), token='key', tag='tag')
+GROUP = Schema(required=('token', 'group'), token='key', group='key')
+GROUP_USER = Schema(required=('token', 'group', 'user'), token='key', group='key', user='key', device='devices',
+                    memo=MAX_MEMO_LENGTH)
+GROUP_NAME = Schema(required=('token', 'name'), token='key', name='text')
+GROUP_RENAME = Schema(required=('token', 'group', 'name'), token='key', group='key', name='text')
+VERIFY = Schema(required=('token', 'user'), token='key', user='key', device='devices')
+LICENSE = Schema(required=('token', ), token='key', user='key', email='email', os='os')
+
+
+def validate_messages(messages):
+    """
+    Validates a batch of messages in a single pass.
+
+    :param messages: an iterable of dictionaries of `push_message` arguments, including `token` and `user`
+    :return list: (index, errors) of every invalid message
+    """
+    errors = MESSAGE.errors
+    invalid = []
+    for i, data in enumerate(messages):
+        message_errors = errors(data)
+        if message_errors:
+            invalid.append((i, message_errors))
+    return invalid
@@ -1,43 +1,47 @@
 __all__ = ('VerificationManager', 'verify_user', 'verify_group')
 
 from pypushover import BaseManager, base_url, send
+from pypushover.validation import VERIFY
 
 verify_url = base_url + "/users/validate.json"
 
 
 class VerificationManager(BaseManager):
-    def __init__(self, app_token):
-        super(VerificationManager, self).__init__(app_token)
+    def __init__(self, app_token, **send_options):
+        super(VerificationManager, self).__init__(app_token, **send_options)
 
-    def verify_user(self, user_id, device=None):
+    def verify_user(self, user_id, device=None, **send_options):
         """
         Verifies whether a userID is a valid ID
 
         :param device:
         :param user_id:
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         :return :
         """
 
-        return verify_user(self._app_token, user_id, device=device)
+        return verify_user(self._app_token, user_id, device=device, **self._options(send_options))
 
-    def verify_group(self, group_id):
+    def verify_group(self, group_id, **send_options):
         """
         Verifies whether a groupID is a valid ID
 
         :param group_id:
+        :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
         :return :
         """
 
-        return verify_group(self._app_token, group_id)
+        return verify_group(self._app_token, group_id, **self._options(send_options))
 
 
-def verify_user(app_token, user, device=None):
+def verify_user(app_token, user, device=None, **send_options):
     """
     Verifies whether a userID is a valid ID if device is given, then the user/device pair is verified.
 
     :param device:
     :param app_token: the application token
     :param user: the user id
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
     :return :
     """
     param_data = {
@@ -48,15 +52,17 @@ def verify_user(app_token, user, device=None):
     if device:
         param_data['device'] = device
 
-    return send(verify_url, param_data)['status'] == 1  # An HTTPError will be raised if invalid
+    VERIFY.validate(param_data)
+    return send(verify_url, param_data, **send_options)['status'] == 1  # An HTTPError will be raised if invalid
 
 
-def verify_group(app_token, group_id):
+def verify_group(app_token, group_id, **send_options):
     """
     Verifies whether a groupID is a valid ID.
 
     :param app_token
     :param group_id:
+    :param send_options: options passed to `pypushover.send` for this call, such as `deadline`
     :return :
     """
-    return verify_user(app_token, group_id)
+    return verify_user(app_token, group_id, **send_options)
@@ -23,15 +23,22 @@ setup(
     classifiers=[
         'License :: OSI Approved :: MIT License',
 
-        'Programming Language :: Python :: 2',
-        'Programming Language :: Python :: 2.6',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.2',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
+    python_requires='>=3.7',
     install_requires=install_requires,
+    extras_require={
+        'http2': ['httpx[http2]'],
+    },
     test_suite="tests.get_tests",
-    packages=find_packages(exclude=['tests'])
+    packages=find_packages(exclude=['tests']),
+    entry_points={
+        'console_scripts': ['pypushover = pypushover.cli:main', 'pypushover-loadtest = pypushover.loadtest:main'],
+    }
 )
@@ -6,7 +6,16 @@ def get_tests():
 
 
 def full_suite():
-    from .runtests import TestBasic, TestClient, TestGroup, TestLicense, TestMessage, TestVerifcation, TestIssues
+    from .runtests import (
+        TestBasic, TestClient, TestGroup, TestLicense, TestMessage, TestVerifcation, TestIssues,
+        TestClientMultiplexer, TestClientKeepalive, TestMetrics, TestDeadlines, TestRetry,
+        TestCircuitBreaker, TestResponse, TestAppRegistry,
+        TestAttachment, TestValidation, TestCli, TestTransport,
+        TestCassette, TestDispatcher, TestDigest, TestScheduler,
+        TestFanOut, TestCallback, TestSharedManager, TestCancelByTag,
+        TestMessageBuffer, TestLoadTest, TestForm, TestLimiter,
+        TestDeadLetter
+    )
 
     return unittest.TestSuite([
         unittest.TestLoader().loadTestsFromTestCase(TestBasic),
@@ -14,5 +23,30 @@ def full_suite():
         unittest.TestLoader().loadTestsFromTestCase(TestGroup),
         unittest.TestLoader().loadTestsFromTestCase(TestMessage),
         unittest.TestLoader().loadTestsFromTestCase(TestVerifcation),
-        unittest.TestLoader().loadTestsFromTestCase(TestIssues)
+        unittest.TestLoader().loadTestsFromTestCase(TestIssues),
+        unittest.TestLoader().loadTestsFromTestCase(TestClientMultiplexer),
+        unittest.TestLoader().loadTestsFromTestCase(TestClientKeepalive),
+        unittest.TestLoader().loadTestsFromTestCase(TestMetrics),
+        unittest.TestLoader().loadTestsFromTestCase(TestDeadlines),
+        unittest.TestLoader().loadTestsFromTestCase(TestRetry),
+        unittest.TestLoader().loadTestsFromTestCase(TestCircuitBreaker),
+        unittest.TestLoader().loadTestsFromTestCase(TestResponse),
+        unittest.TestLoader().loadTestsFromTestCase(TestAppRegistry),
+        unittest.TestLoader().loadTestsFromTestCase(TestAttachment),
+        unittest.TestLoader().loadTestsFromTestCase(TestValidation),
+        unittest.TestLoader().loadTestsFromTestCase(TestCli),
+        unittest.TestLoader().loadTestsFromTestCase(TestTransport),
+        unittest.TestLoader().loadTestsFromTestCase(TestCassette),
+        unittest.TestLoader().loadTestsFromTestCase(TestDispatcher),
+        unittest.TestLoader().loadTestsFromTestCase(TestDigest),
+        unittest.TestLoader().loadTestsFromTestCase(TestScheduler),
+        unittest.TestLoader().loadTestsFromTestCase(TestFanOut),
+        unittest.TestLoader().loadTestsFromTestCase(TestCallback),
+        unittest.TestLoader().loadTestsFromTestCase(TestSharedManager),
+        unittest.TestLoader().loadTestsFromTestCase(TestCancelByTag),
+        unittest.TestLoader().loadTestsFromTestCase(TestMessageBuffer),
+        unittest.TestLoader().loadTestsFromTestCase(TestLoadTest),
+        unittest.TestLoader().loadTestsFromTestCase(TestForm),
+        unittest.TestLoader().loadTestsFromTestCase(TestLimiter),
+        unittest.TestLoader().loadTestsFromTestCase(TestDeadLetter)
     ])
@@ -1,10 +1,29 @@
 import unittest
 import time
 import requests
+import urllib3
 import datetime
 import re
+import json
+import functools
+import tempfile
+import os
+import threading
+import asyncio
+import io
+import socketserver
+from urllib.parse import parse_qsl
+
+from unittest import mock
 
 import pypushover as pypo
+import pypushover.callback
+import pypushover.cassette
+import pypushover.cli
+import pypushover.dispatcher
+import pypushover.limiter
+import pypushover.loadtest
+import pypushover.scheduler
 
 try:
     from tests.helpers.keys import user_key, group_key, app_key, device_id, email, pw, secret
@@ -22,6 +41,30 @@ except ImportError:  # support for Travis CI
         raise ImportError(e)  # Environment var missing.  Raise an Import Error
 
 
+receipt = 'r' * 30  # receipt of the emergency messages faked by `fake_response`
+
+
+def fake_response(body=None, status_code=200, headers=None, url=pypo.base_url + 'messages.json'):
+    """
+    Builds a `requests.Response` as if it was returned from the Pushover servers, for tests that don't need them.
+    """
+    res = requests.Response()
+    res.status_code = status_code
+    res._content = json.dumps({'status': 1, 'request': 'req'} if body is None else body).encode('utf-8')
+    res.raw = urllib3.HTTPResponse(io.BytesIO(res._content), preload_content=False)  # read when given a deadline
+    res.headers.update(headers or {})
+    res.request = requests.Request('POST', url).prepare()
+    res.url = url
+    return res
+
+
+def posted_fields(post):
+    """
+    Decodes the form-encoded body of the last call of a mocked `requests.post`.
+    """
+    return dict(parse_qsl(post.call_args[1]['data'].decode('utf-8')))
+
+
 class TestMessage(unittest.TestCase):
     """
     Tests message related API's.  
@@ -308,6 +351,1491 @@ class TestClient(unittest.TestCase):
         self.pm.push_message(test_msg, device='test_device')
 
 
+class TestClientMultiplexer(unittest.TestCase):
+    def setUp(self):
+        self.mux = pypo.client.ClientMultiplexer(app_key)
+        self.received = []
+        self.cm = self.mux.add_device(secret, device_id, self.received.append)
+
+    def test_duplicate_device(self):
+        with self.assertRaises(ValueError):
+            self.mux.add_device(secret, device_id, None)
+        self.assertEqual(self.mux.device_ids, [device_id])
+
+    def test_frame_routing(self):
+        session = self.mux._sessions[device_id]
+        self.cm.retrieve_message = lambda: setattr(self.cm, 'messages', [{'message': 'routed'}])
+
+        self.mux._on_frame(session, b'#')
+        self.assertEqual(self.received, [])
+        self.mux._on_frame(session, b'!')
+        self.mux.executor.shutdown(wait=True)
+        self.assertEqual(self.received, [[{'message': 'routed'}]])
+
+        self.mux._on_frame(session, b'E')
+        self.assertEqual(self.mux.device_ids, [])
+
+    def test_failing_device(self):
+        other = self.mux.add_device(secret, 'other' + device_id, self.received.append)
+        self.cm.retrieve_message = mock.Mock(side_effect=pypo.PushoverError(['device gone']))
+        other.retrieve_message = lambda: setattr(other, 'messages', [{'message': 'still routed'}])
+        for device in (device_id, 'other' + device_id):
+            self.mux._on_frame(self.mux._sessions[device], b'!')
+        self.mux.executor.shutdown(wait=True)
+        self.assertEqual(self.received, [[{'message': 'still routed'}]])
+        self.assertFalse(self.mux._sessions[device_id].syncing)
+
+        for session in self.mux._sessions.values():
+            session.reconnect_at = time.time() + 60  # no connection attempt
+        session = self.mux._sessions[device_id]
+        with mock.patch.object(self.mux, '_service', side_effect=ValueError('bad frame')), \
+                mock.patch('pypushover.client.select.select', return_value=([7], [], [])):
+            session.ws, session.last_frame = mock.Mock(fileno=lambda: 7), time.time()
+            self.mux._loop_once()  # logged, not raised
+
+
+class TestSharedManager(unittest.TestCase):
+    def test_latest_response_per_thread(self):
+        def respond(request):
+            if request.url.endswith('messages.json'):
+                return {'status': 1, 'request': 'shared', 'receipt': request.params['message']}
+            return {'status': 1, 'request': 'shared'}
+
+        memory = pypo.transport.MemoryTransport(respond)
+        pm = pypo.message.MessageManager(app_key, user_key, transport=memory)
+        receipts = ['{:a>30}'.format(i) for i in range(8)]
+        barrier = threading.Barrier(len(receipts))
+        results = {}
+
+        def run(receipt):
+            res = pm.push_message(receipt, priority=pypo.PRIORITIES.EMERGENCY, retry=30, expire=3600)
+            barrier.wait()  # every thread has pushed before any cancels its latest receipt
+            pm.cancel_retries()
+            results[receipt] = res['receipt']
+
+        threads = [threading.Thread(target=run, args=(receipt, )) for receipt in receipts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, dict((receipt, receipt) for receipt in receipts))
+        cancelled = [request.url for request in memory.requests if request.url.endswith('cancel.json')]
+        self.assertEqual(sorted(cancelled), sorted(pypo.message._cancel_receipt_url.format(receipt=receipt)
+                                                   for receipt in receipts))
+        with self.assertRaises(TypeError):
+            pm.cancel_retries()  # this thread received no response
+
+
+class TestMessageBuffer(unittest.TestCase):
+    def test_spill(self):
+        messages = pypo.buffer.MessageBuffer(capacity=10)
+        messages.extend({'id': i, 'message': u'm\u00e9ssage {}'.format(i)} for i in range(1000))
+        messages.extend([{'id': 999, 'message': 'duplicate'}])
+        self.assertEqual(len(messages), 1000)
+        self.assertEqual(len(messages.recent()), 10)
+        self.assertEqual([m['id'] for m in messages.page(510, 3)], [510, 511, 512])
+        self.assertEqual([m['id'] for m in messages.page(988, 5)], [988, 989, 990, 991, 992])
+        self.assertEqual([m['id'] for m in messages], list(range(1000)))
+        self.assertEqual(messages[-1]['message'], u'm\u00e9ssage 999')
+        with self.assertRaises(IndexError):
+            messages[1000]
+        messages.close()
+        self.assertEqual(len(messages), 0)
+
+    def test_no_spill(self):
+        messages = pypo.buffer.MessageBuffer(capacity=3, spill=False)
+        messages.extend({'id': i} for i in range(5))
+        self.assertEqual([m['id'] for m in messages], [2, 3, 4])
+        self.assertEqual(messages.dropped, 2)
+
+    def test_client(self):
+        messages = pypo.buffer.MessageBuffer(capacity=2)
+        cm = pypo.client.ClientManager(app_key, secret=secret, device_id=device_id, message_buffer=messages)
+        backlog = {'status': 1, 'request': 'buffer', 'messages': [{'id': i, 'message': str(i)} for i in range(5)]}
+        with mock.patch('pypushover._base.requests.get', return_value=fake_response(backlog)):
+            cm.retrieve_message()
+            cm.retrieve_message()
+        self.assertIs(cm.messages, messages)
+        self.assertEqual(len(cm.messages), 5)
+
+        with mock.patch('pypushover._base.requests.post', return_value=fake_response()) as post:
+            cm.clear_server_messages()
+        self.assertEqual(posted_fields(post)['message'], '4')
+
+        messages.clear()  # messages downloaded earlier are still cleared on the server
+        with mock.patch('pypushover._base.requests.post', return_value=fake_response()) as post:
+            cm.clear_server_messages()
+        self.assertEqual(posted_fields(post)['message'], '4')
+
+
+class TestClientKeepalive(unittest.TestCase):
+    def test_watchdog_reconnects(self):
+        runs = []
+
+        class FakeApp(object):
+            def __init__(self, url, on_open, on_message, on_error, on_close):
+                self.on_message = on_message
+                self.closed = threading.Event()
+
+            def run_forever(self):
+                runs.append(self)
+                if len(runs) == 1:
+                    self.on_message(self, b'#')
+                    self.closed.wait(5)  # no more keep-alives: the watchdog closes the connection
+                else:
+                    self.on_message(self, b'!')
+
+            def close(self):
+                self.closed.set()
+
+        cm = pypo.client.ClientManager(app_key, secret=secret, device_id=device_id, keepalive_timeout=0.1)
+        cm.retrieve_message = mock.Mock()
+        with mock.patch('pypushover.client.websocket.WebSocketApp', FakeApp):
+            cm.listen(None)
+
+        self.assertEqual(len(runs), 2)
+        self.assertTrue(runs[0].closed.is_set())
+        cm.retrieve_message.assert_called_once_with()
+        self.assertEqual(cm.sync_latency.count, 1)
+
+    def test_multiplexer_keepalives(self):
+        mux = pypo.client.ClientMultiplexer(app_key, keepalive_timeout=30)
+        mux.add_device(secret, device_id, None)
+        session = mux._sessions[device_id]
+        session.ws = mock.Mock()
+        session.last_frame = 100
+
+        by_fd = {1: session}
+        self.assertEqual(mux._check_keepalives(by_fd, 110), 130)
+        self.assertIsNotNone(session.ws)
+
+        self.assertIsNone(mux._check_keepalives(by_fd, 131))
+        self.assertEqual(by_fd, {})
+        self.assertIsNone(session.ws)
+        self.assertEqual(session.reconnect_at, 131)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = pypo.metrics.MetricsAggregator()
+        pypo.add_observer(self.metrics)
+
+    def tearDown(self):
+        pypo.remove_observer(self.metrics)
+
+    def test_endpoint_name(self):
+        self.assertEqual(pypo.endpoint_name(pypo.base_url + 'messages.json'), 'messages.json')
+        self.assertEqual(pypo.endpoint_name(pypo.base_url + 'receipts/' + 'r' * 30 + '/cancel.json'),
+                         'receipts/{key}/cancel.json')
+
+    def test_histogram(self):
+        histogram = pypo.metrics.LatencyHistogram()
+        for i in range(1, 101):
+            histogram.record(i / 100.0)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.percentile(50), 0.5, places=2)
+        self.assertLessEqual(histogram.percentile(99), 1.0)
+
+    def test_aggregation(self):
+        headers = {'X-Limit-App-Limit': '7500', 'X-Limit-App-Remaining': '7499', 'X-Limit-App-Reset': '1393653600'}
+        with mock.patch('pypushover._base.requests.post', return_value=fake_response(headers=headers)):
+            pypo.message.push_message(app_key, user_key, 'metrics')
+        with mock.patch('pypushover._base.requests.post',
+                        return_value=fake_response({'status': 0, 'errors': ['invalid']}, 400)):
+            with self.assertRaises(pypo.PushoverError):
+                pypo.message.push_message(app_key, user_key, 'metrics')
+
+        self.assertEqual(self.metrics.histogram('messages.json', 'POST').count, 2)
+        self.assertEqual(self.metrics.rate_limits['remaining'], '7499')
+        text = self.metrics.to_prometheus()
+        self.assertIn('pypushover_requests_total{endpoint="messages.json",method="POST",status="400"} 1', text)
+        self.assertIn('pypushover_app_remaining 7499', text)
+
+
+class TestDeadlines(unittest.TestCase):
+    def test_coerce(self):
+        deadline = pypo.Deadline(5)
+        self.assertIs(pypo.Deadline.coerce(deadline), deadline)
+        self.assertIsNone(pypo.Deadline.coerce(None))
+        self.assertLessEqual(pypo.Deadline.coerce(5).remaining(), 5)
+
+    def test_timeouts_capped_by_deadline(self):
+        with mock.patch('pypushover._base.requests.post', return_value=fake_response()) as post:
+            pypo.message.push_message(app_key, user_key, 'timeouts', timeout=(3, 10), deadline=5)
+        connect, read = post.call_args[1]['timeout']
+        self.assertEqual(connect, 3)
+        self.assertLessEqual(read, 5)
+
+        pm = pypo.message.MessageManager(app_key, user_key, timeout=2)
+        with mock.patch('pypushover._base.requests.post', return_value=fake_response()) as post:
+            pm.push_message('manager timeout')
+        self.assertEqual(post.call_args[1]['timeout'], (2, 2))
+
+        with self.assertRaises(TypeError):
+            pypo.message.MessageManager(app_key, user_key, not_an_option=True)
+
+    def test_deadline_exceeded(self):
+        with mock.patch('pypushover._base.requests.get') as get:
+            with self.assertRaises(pypo.DeadlineExceededError):
+                pypo.message.check_receipt(app_key, receipt, deadline=pypo.Deadline(-1))
+        self.assertFalse(get.called)
+
+        def stalled(*args, **kwargs):
+            time.sleep(kwargs['timeout'][1])
+            raise requests.ReadTimeout()
+
+        with mock.patch('pypushover._base.requests.get', side_effect=stalled):
+            with self.assertRaises(pypo.DeadlineExceededError):
+                pypo.groups.info(app_key, group_key, deadline=0.05)
+
+    def test_deadline_caps_whole_read(self):
+        import http.server
+
+        sent = []
+
+        class Trickling(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                body = json.dumps({'status': 1, 'request': 'slow', 'padding': ' ' * 40}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    for byte in body:  # each byte well within the read timeout, the whole body well past the deadline
+                        self.wfile.write(bytes([byte]))
+                        self.wfile.flush()
+                        sent.append(byte)
+                        time.sleep(0.02)
+                except OSError:
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Trickling)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = 'http://127.0.0.1:{}/1/messages.json'.format(server.server_port)
+        try:
+            for transport in (pypo.transport.RequestsTransport(pool_size=1), pypo.transport.Urllib3Transport()):
+                del sent[:]
+                threads = threading.active_count()
+                start = time.time()
+                with self.assertRaises(pypo.DeadlineExceededError):
+                    pypo.send(url, {'message': 'slow'}, timeout=1, deadline=0.3, transport=transport,
+                              retry_policy=pypo.retry.NO_RETRY)
+                self.assertLess(time.time() - start, 0.5)
+                time.sleep(0.3)
+                self.assertLess(len(sent), 30)  # the server stopped sending once the connection was closed
+                self.assertEqual(threading.active_count(), threads)  # no request, nor its handler, left running
+                transport.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestRetry(unittest.TestCase):
+    def setUp(self):
+        self.policy = pypo.retry.RetryPolicy(max_attempts=3, backoff=0)
+        self.error = fake_response({'status': 0, 'errors': ['unavailable']}, 503)
+
+    def test_idempotent_get_retried(self):
+        with mock.patch('pypushover._base.requests.get', side_effect=[self.error, requests.ConnectionError(),
+                                                                     fake_response()]) as get:
+            res = pypo.message.check_receipt(app_key, receipt, retry_policy=self.policy)
+        self.assertEqual(res['status'], 1)
+        self.assertEqual(get.call_count, 3)
+
+    def test_push_not_retried(self):
+        with mock.patch('pypushover._base.requests.post', side_effect=[self.error, fake_response()]) as post:
+            with self.assertRaises(pypo.PushoverError):
+                pypo.message.push_message(app_key, user_key, 'not idempotent', retry_policy=self.policy)
+        self.assertEqual(post.call_count, 1)
+
+        permanent = fake_response({'status': 0, 'errors': ['user identifier is invalid']}, 400)
+        with mock.patch('pypushover._base.requests.get', side_effect=[permanent, fake_response()]) as get:
+            with self.assertRaises(pypo.PushoverError):
+                pypo.message.check_receipt(app_key, receipt, retry_policy=self.policy)
+        self.assertEqual(get.call_count, 1)
+
+    def test_rate_limit_reset(self):
+        limited = fake_response({'status': 0, 'errors': ['over limit']}, 429,
+                                headers={'X-Limit-App-Reset': str(int(time.time()))})
+        with mock.patch('pypushover._base.time.sleep') as sleep:
+            with mock.patch('pypushover._base.requests.post', side_effect=[limited, fake_response()]) as post:
+                pypo.message.push_message(app_key, user_key, 'rate limited', retry_policy=self.policy)
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(sleep.call_count, 1)
+
+        limited.headers['X-Limit-App-Reset'] = str(int(time.time() + 3600))
+        with mock.patch('pypushover._base.requests.post', side_effect=[limited, fake_response()]) as post:
+            with self.assertRaises(pypo.PushoverError):
+                pypo.message.push_message(app_key, user_key, 'rate limited', retry_policy=self.policy)
+        self.assertEqual(post.call_count, 1)
+
+    def test_retry_after_date(self):
+        from email.utils import formatdate
+        policy = pypo.retry.RetryPolicy(backoff=0)
+        headers = {'Retry-After': formatdate(time.time() + 60, usegmt=True)}
+        self.assertTrue(58 <= policy.retry_delay(1, 'POST', status_code=429, headers=headers) <= 60)
+        headers = {'Retry-After': formatdate(time.time() + 7200, usegmt=True)}
+        self.assertIsNone(policy.retry_delay(1, 'POST', status_code=429, headers=headers))
+        self.assertIsNotNone(policy.retry_delay(1, 'POST', status_code=429, headers={'Retry-After': 'soon'}))
+
+    def test_backoff_within_deadline(self):
+        policy = pypo.retry.RetryPolicy(max_attempts=5, backoff=10, max_backoff=10)
+        with mock.patch('pypushover._base.requests.get', side_effect=[self.error, fake_response()]) as get:
+            with self.assertRaises(pypo.PushoverError):
+                pypo.groups.info(app_key, group_key, retry_policy=policy, deadline=pypo.Deadline(0.001))
+        self.assertEqual(get.call_count, 1)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.metrics = pypo.metrics.MetricsAggregator()
+        pypo.add_observer(self.metrics)
+        self.fallback = pypo.breaker.QueueFallback()
+        self.breakers = pypo.breaker.BreakerRegistry(min_requests=2, failure_rate=0.5, open_timeout=0.05,
+                                                     fallback=self.fallback)
+        self.options = {'breakers': self.breakers, 'retry_policy': pypo.retry.NO_RETRY}
+
+    def tearDown(self):
+        pypo.remove_observer(self.metrics)
+
+    def trip(self):
+        with mock.patch('pypushover._base.requests.get', side_effect=requests.ConnectionError()):
+            for _ in range(2):
+                with self.assertRaises(requests.ConnectionError):
+                    pypo.message.check_receipt(app_key, receipt, **self.options)
+
+    def test_fail_fast_while_open(self):
+        self.trip()
+        circuit = self.breakers.get(pypo.base_url, app_key)
+        self.assertEqual(circuit.state, pypo.breaker.OPEN)
+        self.assertEqual(list(self.metrics.circuits.values()), [pypo.breaker.OPEN])
+        self.assertIn('state="open"} 1', self.metrics.to_prometheus())
+
+        with mock.patch('pypushover._base.requests.get') as get:
+            with self.assertRaises(pypo.CircuitOpenError):
+                pypo.message.check_receipt(app_key, receipt, **self.options)
+        self.assertFalse(get.called)
+
+        # other app tokens have their own circuit
+        with mock.patch('pypushover._base.requests.get', return_value=fake_response()):
+            pypo.message.check_receipt(group_key, receipt, **self.options)
+
+    def test_queue_fallback_and_recovery(self):
+        self.trip()
+        with mock.patch('pypushover._base.requests.post') as post:
+            res = pypo.message.push_message(app_key, user_key, 'queued', **self.options)
+        self.assertFalse(post.called)
+        self.assertIsInstance(res, pypo.PushoverResponse)
+        self.assertTrue(res.queued)
+        self.assertIsNone(res.request_id)
+        self.assertIsNone(res.app_remaining)
+        self.assertEqual(len(self.fallback), 1)
+
+        time.sleep(0.06)
+        with mock.patch('pypushover._base.requests.post', return_value=fake_response()) as post:
+            self.assertEqual(len(self.fallback.flush(**self.options)), 1)
+        self.assertEqual(posted_fields(post)['message'], 'queued')
+        self.assertEqual(self.breakers.get(pypo.base_url, app_key).state, pypo.breaker.CLOSED)
+
+    def test_observers_notified_outside_lock(self):
+        circuit = self.breakers.get(pypo.base_url, app_key)
+        unblocked = []
+
+        class Observer(pypo.RequestObserver):
+            def circuit_state_changed(self, name, old_state, new_state):
+                # another sender reading the state while the observer runs
+                reader = threading.Thread(target=lambda: unblocked.append(circuit.state))
+                reader.start()
+                reader.join(1)
+
+        observer = Observer()
+        pypo.add_observer(observer)
+        try:
+            self.trip()
+            time.sleep(0.06)
+            self.assertEqual(circuit.state, pypo.breaker.HALF_OPEN)
+        finally:
+            pypo.remove_observer(observer)
+        self.assertEqual(unblocked, [pypo.breaker.OPEN, pypo.breaker.HALF_OPEN])
+
+    def test_flush_keeps_order(self):
+        self.trip()
+        for message in ('first', 'second', 'third'):
+            pypo.message.push_message(app_key, user_key, message, **self.options)
+
+        time.sleep(0.06)
+        with mock.patch('pypushover._base.requests.post', side_effect=[fake_response(), requests.ConnectionError()]):
+            with self.assertRaises(requests.ConnectionError):
+                self.fallback.flush(**self.options)
+        self.assertEqual([request[1]['message'] for request in self.fallback.queue], ['second', 'third'])
+
+        with mock.patch('pypushover._base.requests.get', side_effect=requests.ConnectionError()):
+            with self.assertRaises(requests.ConnectionError):
+                pypo.message.check_receipt(app_key, receipt, **self.options)
+        self.assertEqual(self.breakers.get(pypo.base_url, app_key).state, pypo.breaker.OPEN)
+        # flushed while the circuit is open again: queued again ahead of the rest, and the flush stops
+        self.assertEqual(self.fallback.flush(**self.options), [])
+        self.assertEqual([request[1]['message'] for request in self.fallback.queue], ['second', 'third'])
+
+        time.sleep(0.06)
+        with mock.patch('pypushover._base.requests.post', return_value=fake_response()) as post:
+            self.assertEqual(len(self.fallback.flush(**self.options)), 2)
+        self.assertEqual([dict(parse_qsl(call[1]['data'].decode('utf-8')))['message'] for call in post.call_args_list],
+                         ['second', 'third'])
+        self.assertEqual(len(self.fallback), 0)
+
+    def test_expired_deadline_while_half_open(self):
+        self.trip()
+        time.sleep(0.06)
+        with self.assertRaises(pypo.DeadlineExceededError):
+            pypo.message.check_receipt(app_key, receipt, deadline=-1, **self.options)
+        self.assertEqual(self.breakers.get(pypo.base_url, app_key).state, pypo.breaker.HALF_OPEN)
+        with mock.patch('pypushover._base.requests.get', return_value=fake_response()):
+            for _ in range(2):
+                pypo.message.check_receipt(app_key, receipt, **self.options)
+        self.assertEqual(self.breakers.get(pypo.base_url, app_key).state, pypo.breaker.CLOSED)
+
+
+class TestResponse(unittest.TestCase):
+    def test_lazy_typed_response(self):
+        headers = {'X-Limit-App-Limit': '7500', 'X-Limit-App-Remaining': '7499', 'X-Limit-App-Reset': '1393653600'}
+        body = {'status': 1, 'request': 'req', 'receipt': 'rcpt'}
+        with mock.patch('pypushover._base.requests.post', return_value=fake_response(body, headers=headers)):
+            res = pypo.message.push_message(app_key, user_key, 'typed')
+
+        self.assertIsInstance(res, pypo.PushoverResponse)
+        self.assertIsNone(res._data)
+        self.assertEqual(res.app_remaining, 7499)
+        self.assertIsNone(res._data)
+
+        self.assertEqual(res.receipt, 'rcpt')
+        self.assertEqual(res.request_id, 'req')
+        self.assertEqual(res['app_limit'], '7500')
+        self.assertIn('receipt', res)
+        self.assertEqual(dict(res), dict(body, app_limit='7500', app_remaining='7499', app_reset='1393653600'))
+
+    def test_error_response(self):
+        body = {'status': 0, 'errors': ['application token is invalid'], 'request': 'req'}
+        with mock.patch('pypushover._base.requests.post', return_value=fake_response(body, 400)):
+            with self.assertRaises(pypo.PushoverError) as cm:
+                pypo.message.push_message(app_key, user_key, 'typed')
+        self.assertEqual(cm.exception.message, ['application token is invalid'])
+
+
+class TestAppRegistry(unittest.TestCase):
+    def setUp(self):
+        self.apps = pypo.registry.AppRegistry(pool_size=4, timeout=5)
+
+    def tearDown(self):
+        self.apps.close()
+
+    def test_shared_transport(self):
+        first = self.apps.message_manager(app_key, user_key)
+        second = self.apps.message_manager(group_key, user_key)
+
+        first_headers = {'X-Limit-App-Limit': '7500', 'X-Limit-App-Remaining': '10', 'X-Limit-App-Reset': '1'}
+        second_headers = {'X-Limit-App-Limit': '7500', 'X-Limit-App-Remaining': '20', 'X-Limit-App-Reset': '1'}
+        with mock.patch.object(self.apps.session, 'post', side_effect=[fake_response(headers=first_headers),
+                                                                      fake_response(headers=second_headers)]) as post:
+            first.push_message('first app')
+            self.apps.submit(second.push_message, 'second app').result()
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(post.call_args[1]['timeout'], (5, 5))
+
+        self.assertEqual(self.apps.rate_limit(app_key).remaining, 10)
+        self.assertEqual(self.apps.rate_limit(group_key).remaining, 20)
+        self.assertEqual(self.apps.metrics.histogram('messages.json', 'POST').count, 2)
+
+
+class TestAttachment(unittest.TestCase):
+    def test_streamed_multipart(self):
+        image = b'\x89PNG' + b'\0' * 100000
+        with mock.patch('pypushover._base.requests.post', return_value=fake_response()) as post:
+            pypo.message.push_message(app_key, user_key, 'with image',
+                                      attachment=pypo.attachment.Attachment(image, filename='image.png'))
+
+        body = post.call_args[1]['data']
+        self.assertIsInstance(body, pypo.attachment.MultipartBody)
+        self.assertNotIn('params', post.call_args[1])
+        self.assertEqual(post.call_args[1]['headers']['Content-Type'], body.content_type)
+
+        body.rewind()
+        content = b''.join(iter(lambda: body.read(4096), b''))
+        self.assertEqual(len(content), len(body))
+        self.assertIn(b'name="message"\r\n\r\nwith image\r\n', content)
+        self.assertIn(b'filename="image.png"\r\nContent-Type: image/png\r\n\r\n' + image + b'\r\n', content)
+
+    def test_size_checked_locally(self):
+        with mock.patch('pypushover._base.requests.post') as post:
+            with self.assertRaises(ValueError):
+                pypo.message.push_message(app_key, user_key, 'too large',
+                                          attachment=b'\0' * (pypo.attachment.MAX_ATTACHMENT_SIZE + 1))
+        self.assertFalse(post.called)
+
+
+class TestCancelByTag(unittest.TestCase):
+    def test_cancel_by_tag(self):
+        receipts = iter('{:b>30}'.format(i) for i in range(3))
+
+        def respond(request):
+            if request.url.endswith('messages.json'):
+                return {'status': 1, 'request': 'tag', 'receipt': next(receipts)}
+            return {'status': 1, 'request': 'tag', 'canceled': 2}
+
+        memory = pypo.transport.MemoryTransport(respond)
+        pm = pypo.message.MessageManager(app_key, user_key, transport=memory)
+        emergency = dict(priority=pypo.PRIORITIES.EMERGENCY, retry=30, expire=3600)
+        first = pm.push_message('db down', tags=['incident-42', 'db'], **emergency)
+        second = pm.push_message('api down', tags='incident-42', **emergency)
+        third = pm.push_message('disk full', tags='db', **emergency)
+        self.assertEqual(memory.requests[0].params['tags'], 'incident-42,db')
+        self.assertEqual(pm.receipts('incident-42'), sorted([first['receipt'], second['receipt']]))
+
+        res = pm.cancel_retries_by_tag('incident-42')
+        self.assertEqual(res['canceled'], 2)
+        self.assertEqual(memory.requests[-1].url, pypo.base_url + 'receipts/cancel_by_tag/incident-42.json')
+        self.assertEqual(pm.receipts('incident-42'), [])
+        self.assertEqual(pm.receipts('db'), [third['receipt']])
+
+        pm.cancel_retries(third['receipt'])
+        self.assertEqual(pm.receipts('db'), [])
+
+    def test_validation(self):
+        self.assertEqual(pypo.endpoint_name(pypo.base_url + 'receipts/cancel_by_tag/incident-42.json'),
+                         'receipts/cancel_by_tag/{tag}.json')
+        with self.assertRaises(pypo.ValidationError):
+            pypo.message.cancel_retries_by_tag(app_key, 'a,b', transport=pypo.transport.NullTransport())
+        with self.assertRaises(pypo.ValidationError):
+            pypo.message.push_message(app_key, user_key, 'tagged', priority=pypo.PRIORITIES.EMERGENCY, retry=30,
+                                      expire=3600, tags=['no spaces'], transport=pypo.transport.NullTransport())
+
+
+class TestForm(unittest.TestCase):
+    def test_fragment(self):
+        fragment = pypo.Fragment(token=app_key, title='Alert & more')
+        form = pypo.Form(fragment, user=user_key, message='Disk full')
+        self.assertEqual(form['title'], 'Alert & more')
+        self.assertEqual(pypo._base.encode_form(form), fragment.encoded + b'&user=' + user_key.encode('utf-8') +
+                         b'&message=Disk+full')
+
+        form['title'] = 'Changed'
+        self.assertEqual(dict(parse_qsl(pypo._base.encode_form(form).decode('utf-8')))['title'], 'Changed')
+        del form['title']
+        self.assertNotIn('title', dict(parse_qsl(pypo._base.encode_form(form).decode('utf-8'))))
+
+    def test_post_body(self):
+        memory = pypo.transport.MemoryTransport()
+        pypo.message.push_message(app_key, user_key, 'x' * 1024, url='https://example.com/?a=1&b=2', transport=memory)
+        request = memory.requests[0]
+        self.assertEqual(request.url, pypo.base_url + 'messages.json')
+        self.assertEqual(request.headers['Content-Type'], 'application/x-www-form-urlencoded')
+        self.assertEqual(request.params['url'], 'https://example.com/?a=1&b=2')
+        self.assertEqual(len(request.params['message']), 1024)
+
+
+class TestValidation(unittest.TestCase):
+    def test_rejected_before_sending(self):
+        with mock.patch('pypushover._base.requests.post') as post:
+            with self.assertRaises(pypo.ValidationError):
+                pypo.message.push_message(app_key, user_key, 'x' * 1025)
+            with self.assertRaises(pypo.ValidationError):
+                pypo.message.push_message(app_key, user_key, 'Bad sound', sound='not_a_sound')
+            with self.assertRaises(ValueError):
+                pypo.message.push_message(app_key, user_key, 'Bad priority', priority=5)
+            with self.assertRaises(pypo.PushoverError):
+                pypo.groups.add_user(app_key, group_key, 'not a user key')
+            with self.assertRaises(pypo.ValidationError):
+                pypo.verification.verify_user(app_key, user_key, device='not a device!')
+        self.assertFalse(post.called)
+
+    def test_valid_message_sent(self):
+        with mock.patch('pypushover._base.requests.post', return_value=fake_response()) as post:
+            pypo.message.push_message(app_key, user_key, 'Valid', title='t' * 250, device=['phone', 'desk-top'],
+                                      sound=pypo.SOUNDS.SHORT_BIKE, priority=pypo.PRIORITIES.HIGH)
+        self.assertEqual(posted_fields(post)['device'], 'phone,desk-top')
+        self.assertNotIn('params', post.call_args[1])
+        self.assertEqual(post.call_args[1]['headers']['Content-Type'], 'application/x-www-form-urlencoded')
+
+    def test_batch(self):
+        messages = [
+            {'token': app_key, 'user': user_key, 'message': 'valid'},
+            {'token': app_key, 'user': 'invalid', 'message': 'invalid user'},
+            {'token': app_key, 'user': user_key, 'message': ''},
+        ]
+        errors = pypo.validation.validate_messages(messages)
+        self.assertEqual([i for i, _ in errors], [1, 2])
+        self.assertEqual(errors[0][1], ['`user` must be 30 letters and digits'])
+
+
+class TestCli(unittest.TestCase):
+    def send(self, lines, **kwargs):
+        output = io.StringIO()
+        with mock.patch.object(requests.Session, 'post', side_effect=lambda *a, **kw: fake_response()) as post:
+            counts = pypo.cli.send_lines(lines, output, token=app_key, user=user_key, **kwargs)
+        results = sorted((json.loads(line) for line in output.getvalue().splitlines()), key=lambda r: r['line'])
+        return counts, results, post
+
+    def test_send_lines(self):
+        lines = ['{"message": "Message %d"}\n' % i for i in range(50)]
+        counts, results, post = self.send(lines, workers=4)
+        self.assertEqual(counts, (50, 0))
+        self.assertEqual([r['line'] for r in results], list(range(1, 51)))
+        self.assertEqual(post.call_count, 50)
+        self.assertEqual(results[0], {'line': 1, 'status': 1, 'request': 'req'})
+
+    def test_failed_lines(self):
+        lines = ['{"message": "Valid"}\n', 'not json\n', '\n', '{"title": "no message"}\n',
+                 '{"message": "Invalid user", "user": "invalid"}\n']
+        counts, results, post = self.send(lines)
+        self.assertEqual(counts, (1, 3))
+        self.assertEqual([(r['line'], r['status']) for r in results], [(1, 1), (2, 0), (4, 0), (5, 0)])
+        self.assertEqual(results[3]['errors'], ['`user` must be 30 letters and digits'])
+        self.assertEqual(post.call_count, 1)
+
+    def test_rate(self):
+        start = time.time()
+        self.send(['{"message": "Paced"}\n'] * 5, rate=50)
+        self.assertGreaterEqual(time.time() - start, 0.08)
+
+    def test_main(self):
+        with mock.patch.object(pypo.cli, 'send_lines', return_value=(2, 1)) as send_lines:
+            self.assertEqual(pypo.cli.main(['--token', app_key, '--user', user_key, '--workers', '3']), 1)
+        self.assertEqual(send_lines.call_args[1]['workers'], 3)
+
+
+class TestTransport(unittest.TestCase):
+    def test_memory(self):
+        memory = pypo.transport.MemoryTransport()
+        pm = pypo.message.MessageManager(app_key, user_key, transport=memory)
+        res = pm.push_message('In memory', title='memory')
+        self.assertEqual(res.request_id, 'memory')
+        request = memory.requests[0]
+        self.assertEqual((request.method, request.url), ('POST', pypo.base_url + 'messages.json'))
+        self.assertEqual(request.params['title'], 'memory')
+
+        pypo.message.push_message(app_key, user_key, 'with image', attachment=b'image', transport=memory)
+        self.assertIn(b'\r\n\r\nimage\r\n', memory.requests[1].body)
+
+    def test_memory_errors(self):
+        memory = pypo.transport.MemoryTransport(lambda request: pypo.PushoverResponse(
+            json.dumps({'status': 0, 'errors': ['user is invalid']}).encode('utf-8'), 400
+        ))
+        with self.assertRaises(pypo.PushoverError):
+            pypo.message.push_message(app_key, user_key, 'Rejected', transport=memory)
+
+    def test_null(self):
+        with mock.patch('pypushover._base.requests.post') as post:
+            res = pypo.message.push_message(app_key, user_key, 'Dropped', transport=pypo.transport.NullTransport())
+        self.assertEqual(res.status, 1)
+        self.assertFalse(post.called)
+
+    def test_registry_transport(self):
+        memory = pypo.transport.MemoryTransport()
+        with pypo.registry.AppRegistry(transport=memory) as apps:
+            apps.message_manager(app_key, user_key).push_message('Through the registry')
+        self.assertEqual(len(memory.requests), 1)
+
+    def test_urllib3(self):
+        import http.server
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                posted = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+                body = json.dumps({'status': 1, 'request': self.path, 'posted': posted}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('X-Limit-App-Remaining', '7')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever).start()
+        url = 'http://127.0.0.1:{}/1/messages.json'.format(server.server_port)
+        transport = pypo.transport.Urllib3Transport()
+        try:
+            res = pypo.send(url, {'message': 'over urllib3'}, transport=transport)
+        finally:
+            transport.close()
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(res.request_id, '/1/messages.json')
+        self.assertEqual(res['posted'], 'message=over+urllib3')
+        self.assertEqual(res.app_remaining, 7)
+
+    def test_http2_form_body(self):
+        httpx = mock.Mock()
+        client = httpx.Client.return_value
+        client.request.return_value = mock.Mock(content=b'{"status": 1, "request": "h2"}', status_code=200,
+                                                headers={})
+        with mock.patch.dict('sys.modules', {'httpx': httpx}):
+            transport = pypo.transport.HTTP2Transport()
+        res = pypo.send(pypo.base_url + 'messages.json', {'token': 'x', 'message': 'over h2'}, transport=transport)
+        self.assertEqual(res.request_id, 'h2')
+        kwargs = client.request.call_args[1]
+        self.assertEqual(kwargs['content'], b'token=x&message=over+h2')
+        self.assertEqual(kwargs['headers']['Content-Length'], str(len(kwargs['content'])))
+
+    def test_connection_errors_retried(self):
+        transport = pypo.transport.Urllib3Transport()
+        with self.assertRaises(requests.ConnectionError) as cm:
+            pypo.send('http://127.0.0.1:9/1/messages.json', {}, transport=transport,
+                      retry_policy=pypo.retry.NO_RETRY)
+        self.assertIsNotNone(pypo.retry.RetryPolicy().retry_delay(1, 'POST', error=cm.exception))
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.memory = pypo.transport.MemoryTransport(lambda request: pypo.PushoverResponse(
+            json.dumps({'status': 1, 'request': request.params.get('message'), 'secret': 'hidden'}).encode('utf-8'),
+            headers={'X-Limit-App-Remaining': '5'}
+        ))
+        self.recorder = pypo.cassette.Recorder(self.memory)
+
+    def test_record(self):
+        pm = pypo.message.MessageManager(app_key, user_key, transport=self.recorder)
+        pm.push_message('first')
+        pypo.message.check_receipt(app_key, receipt, transport=self.recorder)
+
+        first, second = self.recorder.entries
+        self.assertEqual(first['params']['token'], pypo.cassette.REDACTED)
+        self.assertEqual(first['params']['user'], pypo.cassette.REDACTED)
+        self.assertEqual(first['params']['message'], 'first')
+        self.assertEqual(first['content']['secret'], pypo.cassette.REDACTED)
+        self.assertEqual(first['headers'], {'X-Limit-App-Remaining': '5'})
+        self.assertGreaterEqual(first['duration'], 0)
+        self.assertEqual(second['url'], pypo.base_url + 'receipts/{key}.json')
+        self.assertNotIn(app_key, json.dumps(self.recorder.entries))
+
+    def test_replay(self):
+        pm = pypo.message.MessageManager(app_key, user_key, transport=self.recorder)
+        pm.push_message('first')
+        pm.push_message('second')
+        self.recorder.entries.append({'method': 'GET', 'url': pypo.base_url + 'receipts/{key}.json',
+                                      'duration': 0.05, 'error': 'ReadTimeout'})
+
+        path = os.path.join(tempfile.mkdtemp(), 'cassette.ndjson')
+        self.recorder.save(path)
+        replay = pypo.cassette.ReplayTransport(path)
+        pm = pypo.message.MessageManager(app_key, user_key, transport=replay)
+        self.assertEqual(pm.push_message('replayed').request_id, 'first')
+        self.assertEqual(pm.push_message('replayed').app_remaining, 5)
+        with self.assertRaises(LookupError):
+            pm.push_message('no response left')
+
+        start = time.time()
+        with self.assertRaises(requests.ReadTimeout):
+            pypo.message.check_receipt(app_key, receipt, transport=pypo.cassette.ReplayTransport(path, speed=1),
+                                       retry_policy=pypo.retry.NO_RETRY)
+        self.assertGreaterEqual(time.time() - start, 0.05)
+        self.assertEqual(replay.served(), 2)
+
+
+def exit_worker(request):
+    os._exit(1)
+
+
+class TestDispatcher(unittest.TestCase):
+    def dispatcher(self, response, **kwargs):
+        transport_factory = functools.partial(pypo.transport.MemoryTransport, response)
+        return pypo.dispatcher.ShardedDispatcher(processes=2, threads=2, transport_factory=transport_factory, **kwargs)
+
+    def test_submit(self):
+        response = pypo.PushoverResponse(json.dumps({'status': 1, 'request': 'sharded'}).encode('utf-8'),
+                                         headers={'X-Limit-App-Limit': '10000', 'X-Limit-App-Remaining': '9000',
+                                                  'X-Limit-App-Reset': '1893456000'})
+        with self.dispatcher(response) as dispatcher:
+            futures = [dispatcher.submit(app_key, 'u{:029d}'.format(i), 'Sharded') for i in range(20)]
+            results = [future.result(timeout=10) for future in futures]
+            limit = dispatcher.rate_limit(app_key)
+        self.assertEqual(set(res.request_id for res in results), {'sharded'})
+        self.assertEqual((limit.limit, limit.reset), (10000, 1893456000))
+        self.assertTrue(8981 <= limit.remaining <= 9000)  # the messages sent after the first response were drawn
+        self.assertIsNone(dispatcher.rate_limit('t' * 30).remaining)
+
+    def test_errors(self):
+        with self.dispatcher(None) as dispatcher:
+            future = dispatcher.submit(app_key, 'invalid', 'Invalid user')
+            with self.assertRaises(pypo.ValidationError):
+                future.result(timeout=10)
+        with self.assertRaises(RuntimeError):
+            dispatcher.submit(app_key, user_key, 'Closed')
+
+    def test_limit_drawn_per_message(self):
+        response = pypo.PushoverResponse(json.dumps({'status': 1, 'request': 'drawn'}).encode('utf-8'),
+                                         headers={'X-Limit-App-Remaining': '50', 'X-Limit-App-Reset': '1893456000'})
+        with self.dispatcher(response) as dispatcher:
+            for i in range(4):
+                dispatcher.submit(app_key, user_key, 'Drawn').result(timeout=10)
+            self.assertEqual(dispatcher.rate_limit(app_key).remaining, 47)
+
+    def test_unpicklable_message(self):
+        with self.dispatcher(None) as dispatcher:
+            with self.assertRaises(TypeError):
+                dispatcher.submit(app_key, user_key, 'Unpicklable', attachment=threading.Lock())
+            self.assertEqual(dispatcher._futures, {})
+
+    def test_late_result(self):
+        with self.dispatcher(None) as dispatcher:
+            dispatcher._results.put((-1, None, (b'{"status": 1}', 200, {})))  # a job already failed, or a duplicate
+            self.assertEqual(dispatcher.submit(app_key, user_key, 'After').result(timeout=10).request_id, 'memory')
+            self.assertTrue(dispatcher._collector.is_alive())
+
+    def test_worker_exit(self):
+        dispatcher = self.dispatcher(exit_worker)
+        future = dispatcher.submit(app_key, user_key, 'Lost')
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=10)
+        with self.assertRaises(RuntimeError):
+            dispatcher.submit(app_key, user_key, 'To a dead worker')
+        dispatcher.close(wait=False)
+
+    def test_shared_limit(self):
+        response = pypo.PushoverResponse(json.dumps({'status': 1, 'request': 'last'}).encode('utf-8'),
+                                         headers={'X-Limit-App-Remaining': '0', 'X-Limit-App-Reset': '1893456000'})
+        with self.dispatcher(response, rate=100) as dispatcher:
+            self.assertEqual(dispatcher.submit(app_key, user_key, 'Last').result(timeout=10).request_id, 'last')
+            with self.assertRaises(pypo.PushoverError):
+                dispatcher.submit(app_key, 'v' * 30, 'Over the limit').result(timeout=10)
+
+
+class TestDigest(unittest.TestCase):
+    def setUp(self):
+        self.memory = pypo.transport.MemoryTransport()
+        self.pm = pypo.message.MessageManager(app_key, user_key, transport=self.memory)
+
+    def test_window(self):
+        digest = pypo.digest.DigestManager(self.pm, window=0.1)
+        digest.push_message('Backup done', title='nightly', priority=pypo.PRIORITIES.LOW)
+        digest.push_message('Cache warmed', priority=pypo.PRIORITIES.LOW)
+        digest.push_message('Other user', priority=pypo.PRIORITIES.LOW, user=group_key)
+        self.assertIsNotNone(digest.push_message('Disk full', priority=pypo.PRIORITIES.HIGH))
+        self.assertEqual(len(self.memory.requests), 1)
+        self.assertEqual(digest.pending(), 3)
+
+        time.sleep(0.3)
+        self.assertEqual(digest.pending(), 0)
+        summaries = sorted((r.params for r in list(self.memory.requests)[1:]), key=lambda p: p['title'])
+        self.assertEqual(summaries[0]['title'], '1 notifications')
+        self.assertEqual(summaries[0]['user'], group_key)
+        self.assertEqual(summaries[1]['title'], '2 notifications')
+        self.assertEqual(summaries[1]['message'], 'nightly: Backup done\nCache warmed')
+        self.assertEqual(summaries[1]['priority'], str(pypo.PRIORITIES.LOW))
+        digest.close()
+
+    def test_thresholds(self):
+        digest = pypo.digest.DigestManager(self.pm, window=60, max_messages=3)
+        for i in range(7):
+            digest.push_message('Event {}'.format(i), priority=pypo.PRIORITIES.LOWEST)
+        self.assertEqual(len(self.memory.requests), 2)
+        self.assertEqual(self.memory.requests[0].params['message'], 'Event 0\nEvent 1\nEvent 2')
+
+        for i in range(3):
+            digest.push_message('x' * 400, priority=pypo.PRIORITIES.LOW)
+        self.assertEqual(len(self.memory.requests), 3)
+        self.assertEqual(len(self.memory.requests[2].params['message']), 801)
+
+        digest.close()
+        self.assertEqual(len(self.memory.requests), 5)
+        self.assertEqual(digest.pending(), 0)
+        with self.assertRaises(RuntimeError):
+            digest.push_message('Closed', priority=pypo.PRIORITIES.LOW)
+
+    def test_failed_summary_kept(self):
+        down = [True]
+
+        def respond(request):
+            if down[0]:
+                raise requests.ConnectionError('down')
+            return {'status': 1, 'request': 'up'}
+
+        self.memory.response = respond
+        digest = pypo.digest.DigestManager(self.pm, window=60, max_messages=2)
+        for i in range(2):
+            self.assertIsNone(digest.push_message('Event {}'.format(i), priority=pypo.PRIORITIES.LOW))  # not raised
+        digest.push_message('Other user', priority=pypo.PRIORITIES.LOW, user=group_key)
+        self.assertEqual(digest.pending(), 3)
+        with self.assertRaises(requests.ConnectionError):
+            digest.flush()
+        self.assertEqual(digest.pending(), 3)
+
+        down[0] = False
+        self.assertEqual(len(digest.flush()), 2)
+        self.assertEqual(digest.pending(), 0)
+        self.assertIn('Event 0\nEvent 1', [r.params['message'] for r in self.memory.requests])
+
+        # refused by the Pushover servers: not sent again
+        self.memory.response = pypo.PushoverResponse(b'{"status": 0, "errors": ["user is invalid"]}', 400)
+        digest.push_message('Refused', priority=pypo.PRIORITIES.LOW)
+        with self.assertRaises(pypo.PushoverError):
+            digest.flush()
+        self.assertEqual(digest.pending(), 0)
+        digest.close()
+
+    def test_dropped_arguments_refused(self):
+        digest = pypo.digest.DigestManager(self.pm)
+        with self.assertRaises(TypeError):
+            digest.push_message('Link', priority=pypo.PRIORITIES.LOW, url='https://example.com', sound='magic')
+        digest.push_message('Kept', priority=pypo.PRIORITIES.LOW, title='nightly', sound=None)
+        self.assertIsNotNone(digest.push_message('Sent', priority=pypo.PRIORITIES.HIGH, url='https://example.com'))
+        self.assertEqual(digest.pending(), 1)
+        digest.close()
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.memory = pypo.transport.MemoryTransport()
+
+    def messages(self):
+        return [r.params['message'] for r in list(self.memory.requests)]
+
+    def test_schedule(self):
+        with pypo.scheduler.Scheduler(transport=self.memory) as scheduler:
+            now = time.time()
+            scheduler.schedule(now + 0.2, app_key, user_key, 'second')
+            scheduler.schedule(datetime.datetime.fromtimestamp(now + 0.1), app_key, user_key, 'first')
+            cancelled = scheduler.schedule(now + 0.1, app_key, user_key, 'cancelled')
+            scheduler.schedule(now + 3600, app_key, user_key, 'later')
+            self.assertTrue(scheduler.cancel(cancelled))
+            self.assertFalse(scheduler.cancel(cancelled))
+            time.sleep(0.4)
+            self.assertEqual(self.messages(), ['first', 'second'])
+            self.assertEqual([job.message for job in scheduler.jobs()], ['later'])
+
+    def test_recurring(self):
+        with pypo.scheduler.Scheduler(transport=self.memory) as scheduler:
+            job = scheduler.schedule(time.time() + 0.05, app_key, user_key, 'recurring', every=0.1)
+            time.sleep(0.32)
+            scheduler.cancel(job)
+        self.assertEqual(self.messages(), ['recurring'] * 3)
+
+    def test_many_jobs(self):
+        with pypo.scheduler.Scheduler(transport=self.memory) as scheduler:
+            now = time.time()
+            jobs = [scheduler.schedule(now + 3600 + i, app_key, user_key, 'later') for i in range(20000)]
+            for job in jobs[:15000]:
+                scheduler.cancel(job)
+            self.assertLess(len(scheduler._heap), 15000)
+            scheduler.schedule(now + 0.1, app_key, user_key, 'on time')
+            time.sleep(0.2)
+            self.assertEqual(self.messages(), ['on time'])
+            self.assertEqual(len(scheduler), 5000)
+
+    def test_persistence(self):
+        path = os.path.join(tempfile.mkdtemp(), 'jobs.db')
+        scheduler = pypo.scheduler.Scheduler(path=path, transport=self.memory)
+        scheduler.schedule(time.time() + 0.2, app_key, user_key, 'persisted', title='kept')
+        scheduler.close()
+        self.assertEqual(self.messages(), [])
+
+        with pypo.scheduler.Scheduler(path=path, transport=self.memory) as scheduler:
+            self.assertEqual(len(scheduler), 1)
+            time.sleep(0.3)
+        self.assertEqual(self.memory.requests[0].params['title'], 'kept')
+        with pypo.scheduler.Scheduler(path=path) as scheduler:
+            self.assertEqual(len(scheduler), 0)
+
+    def test_registry(self):
+        with pypo.registry.AppRegistry(transport=self.memory) as apps:
+            apps.scheduler.schedule(time.time(), app_key, user_key, 'through the registry')
+            time.sleep(0.1)
+        self.assertEqual(self.messages(), ['through the registry'])
+
+
+class TestFanOut(unittest.TestCase):
+    def setUp(self):
+        self.groups = {group_key: set()}
+        self.disabled = set()
+        self.created = 0
+        self.locked = []
+
+        def api(request):
+            path = request.url[len(pypo.base_url):]
+            self.locked.append(self.fan._lock.locked())
+            if path == 'groups.json':
+                self.created += 1
+                key = 'c{:029d}'.format(self.created)
+                self.groups[key] = set()
+                return {'status': 1, 'group': key}
+            if path.startswith('groups/'):
+                key, _, action = path[len('groups/'):].partition('/')
+                if action == 'add_user.json':
+                    if request.params['user'].startswith('x'):
+                        return pypo.PushoverResponse(b'{"status": 0, "errors": ["user is invalid"]}', 400)
+                    self.groups[key].add(request.params['user'])
+                elif action == 'delete_user.json':
+                    if request.params['user'].startswith('s'):
+                        return pypo.PushoverResponse(b'{"status": 0, "errors": ["server error"]}', 400)
+                    self.groups[key].discard(request.params['user'])
+                elif action == 'enable_user.json':
+                    self.disabled.discard(request.params['user'])
+                else:
+                    return {'status': 1, 'users': [{'user': user, 'disabled': user in self.disabled}
+                                                   for user in self.groups[key[:-5]]]}
+            return {'status': 1}
+
+        self.memory = pypo.transport.MemoryTransport(api)
+        self.fan = pypo.fanout.FanOut(app_key, group_keys=[group_key], max_groups=2, transport=self.memory)
+        self.users = ['u{:029d}'.format(i) for i in range(10)]
+
+    def pushes(self):
+        return [r.params['user'] for r in self.memory.requests if r.url.endswith('messages.json')]
+
+    def calls(self, users, message='Fan-out'):
+        start = len(self.memory.requests)
+        self.fan.push_message(users, message)
+        return len(self.memory.requests) - start
+
+    def test_group_reused(self):
+        self.groups[group_key].update(self.users)
+        self.assertEqual(self.calls(self.users), 2)  # group info, then the group push
+        self.assertEqual(self.calls(self.users), 1)
+        self.assertEqual(self.pushes(), [group_key, group_key])
+
+        # a close set updates the group rather than pushing to each user
+        self.assertEqual(self.calls(self.users[:9]), 2)
+        self.assertEqual(self.groups[group_key], set(self.users[:9]))
+        self.assertEqual(self.calls(self.users[:9]), 1)
+
+    def test_repeated_sets_get_a_group(self):
+        self.assertEqual(self.calls(self.users[:2]), 2)  # under min_recipients
+        self.assertEqual(self.calls(self.users[:5]), 6)  # group info, then 5 pushes
+        self.assertEqual(self.calls(self.users[:5]), 6)  # group updated, then pushed to
+        self.assertEqual(self.calls(self.users[:5]), 1)
+        self.assertEqual(self.calls(self.users[5:]), 5)
+        self.assertEqual(self.calls(self.users[5:]), 7)  # new group created
+        self.assertEqual(len(self.groups), 2)
+        self.assertEqual(self.calls(self.users[5:]), 1)
+        self.assertEqual(self.calls(self.users[:5]), 1)
+
+    def test_invalid_users(self):
+        users = self.users[:4] + ['x' * 30]
+        self.groups[group_key].update(self.users[:4])
+        self.assertEqual(len(self.fan.push_message(users, 'Fan-out')), 2)
+        self.assertEqual(self.pushes(), [group_key, 'x' * 30])
+        self.assertEqual(self.calls(users), 2)  # the invalid user is not added again
+        self.assertEqual(self.groups[group_key], set(self.users[:4]))
+
+    def test_disabled_users(self):
+        self.groups[group_key].update(self.users[:5])
+        self.disabled.add(self.users[4])
+        self.assertEqual(self.calls(self.users[:5]), 3)  # group info, enabling the disabled user, then the group push
+        self.assertEqual(self.disabled, set())
+        self.assertTrue(any(r.url.endswith('enable_user.json') for r in self.memory.requests))
+        self.assertEqual(self.calls(self.users[:5]), 1)
+
+    def test_failed_update(self):
+        stuck = 's' * 30
+        self.groups[group_key].update(self.users[:5] + [stuck])
+        with self.assertRaises(pypo.PushoverError):
+            self.fan.push_message(self.users[:4], 'Fan-out')
+        self.assertEqual(self.fan.groups()[group_key], frozenset(self.groups[group_key]))
+        self.assertNotIn(group_key, self.pushes())
+        self.assertFalse(any(self.locked))  # no call made while holding the lock of the fan-out
+
+    def test_refreshed_while_sending(self):
+        self.groups[group_key].update(self.users[:5])
+        delivery_group = self.fan._delivery_group
+
+        def refreshed(*args):
+            group = delivery_group(*args)
+            self.fan.refresh()
+            return group
+
+        with mock.patch.object(self.fan, '_delivery_group', side_effect=refreshed):
+            self.fan.push_message(self.users[:4], 'Fan-out')
+        self.assertEqual(self.groups[group_key], set(self.users[:4]))
+        self.assertEqual(self.pushes(), [group_key])
+
+
+class TestCallback(unittest.TestCase):
+    fields = {'receipt': 'r' * 30, 'acknowledged': '1', 'acknowledged_at': '1400000000', 'acknowledged_by': user_key,
+              'acknowledged_by_device': device_id}
+
+    def test_receiver(self):
+        acks = []
+        with pypo.callback.CallbackReceiver(host='127.0.0.1') as receiver:
+            receiver.add_handler(acks.append)
+            future = receiver.expect(self.fields['receipt'])
+            self.assertEqual(receiver.pending(), [self.fields['receipt']])
+
+            self.assertEqual(requests.post(receiver.url + 'x', data=self.fields).status_code, 404)
+            self.assertEqual(requests.get(receiver.url).status_code, 405)
+            self.assertEqual(requests.post(receiver.url, data={}).status_code, 400)
+            self.assertEqual(requests.post(receiver.url, data=self.fields).status_code, 200)
+
+            ack = future.result(timeout=5)
+            self.assertEqual(ack.acknowledged_by, user_key)
+            self.assertEqual(ack.acknowledged_at, 1400000000)
+            self.assertEqual(acks, [ack])
+            self.assertEqual(receiver.pending(), [])
+
+            # an acknowledgement received before its receipt is expected resolves it right away
+            requests.post(receiver.url, data=dict(self.fields, receipt='s' * 30))
+            self.assertTrue(receiver.expect('s' * 30).done())
+
+            unanswered = receiver.expect('t' * 30)
+        self.assertTrue(unanswered.cancelled())
+
+    def test_async_receiver(self):
+        body = '&'.join('{}={}'.format(k, v) for k, v in self.fields.items()).encode('utf-8')
+
+        async def run():
+            acks = []
+
+            async def handler(ack):
+                acks.append(ack)
+
+            async with pypo.callback.AsyncCallbackReceiver(host='127.0.0.1') as receiver:
+                receiver.add_handler(handler)
+                future = receiver.expect(self.fields['receipt'])
+                reader, writer = await asyncio.open_connection('127.0.0.1', receiver.port)
+                writer.write('POST {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n\r\n'.format(
+                    receiver.path, len(body)).encode('latin-1') + body)
+                status = await reader.readline()
+                ack = await asyncio.wait_for(future, 5)
+                writer.close()
+            return status, ack, acks
+
+        status, ack, acks = asyncio.run(run())
+        self.assertTrue(status.startswith(b'HTTP/1.1 200'))
+        self.assertEqual(ack.receipt, self.fields['receipt'])
+        self.assertEqual(acks, [ack])
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_stand_in_server(self):
+        with pypo.loadtest.StandInServer() as server:
+            transport = server.transport(pool_size=4)
+            res = pypo.message.push_message(app_key, user_key, 'stand-in', priority=pypo.PRIORITIES.EMERGENCY,
+                                            retry=30, expire=3600, transport=transport)
+            self.assertEqual(len(res['receipt']), 30)
+            self.assertEqual(pypo.groups.info(app_key, group_key, transport=transport)['name'], 'stand-in')
+            self.assertTrue(pypo.verification.verify_user(app_key, user_key, transport=transport))
+            self.assertEqual(server.requests, 3)
+            transport.close()
+
+    def test_open_loop(self):
+        calls = []
+        report = pypo.loadtest.run(lambda: calls.append(time.sleep(0.02)), rate=100, concurrency=1, requests=10)
+        self.assertEqual(report.requests, 10)
+        # a single worker falls behind the schedule: the wait for the worker counts in the latency
+        self.assertGreater(report.percentile(99), 0.1)
+        self.assertEqual(report.error_rate, 0)
+
+    def test_closed_loop_errors(self):
+        def fail():
+            raise pypo.PushoverError(['load'])
+
+        report = pypo.loadtest.run(pypo.loadtest.mix(fail, lambda: None), concurrency=4, requests=200)
+        self.assertEqual(report.requests, 200)
+        self.assertGreater(report.errors['PushoverError'], 0)
+        self.assertIn('p999', report.summary())
+
+    def test_main(self):
+        out = io.StringIO()
+        with mock.patch('sys.stdout', out):
+            self.assertEqual(pypo.loadtest.main(['-o', 'push,receipt', '-n', '20', '-c', '2', '--json']), 0)
+        summary = json.loads(out.getvalue())
+        self.assertEqual(summary['requests'], 20)
+        self.assertEqual(summary['errors'], {})
+
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    """
+    Answers the few Redis commands used by `limiter.RedisLimiter`, for tests that don't need a Redis server.  The Lua
+    scripts of the limiter are run by their Python equivalents.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        self.data = {}  # value and expiry time of each key
+        self.lock = threading.Lock()
+        self.lost_replies = 0  # the number of commands run whose connection is then closed without a reply
+        socketserver.ThreadingTCPServer.__init__(self, ('127.0.0.1', 0), RedisStandInHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def run(self, command):
+        name, args = command[0].upper(), command[1:]
+        now = time.time()
+        for key in [key for key, (_, expiry) in self.data.items() if expiry is not None and expiry <= now]:
+            del self.data[key]
+        if name == 'EVAL':
+            keys, argv = args[2:2 + int(args[1])], args[2 + int(args[1]):]
+            return self.scripts[args[0]](self, keys, argv)
+        if name in ('DECR', 'INCR', 'DECRBY'):
+            value, expiry = self.data.get(args[0], ('0', None))
+            value = int(value) + (1 if name == 'INCR' else -1 if name == 'DECR' else -int(args[1]))
+            self.data[args[0]] = str(value), expiry
+            return value
+        if name == 'TTL':
+            value, expiry = self.data.get(args[0], (None, None))
+            return -2 if value is None else -1 if expiry is None else int(expiry - now)
+        if name == 'SET':
+            options = [arg.upper() for arg in args[2:]]
+            if 'NX' in options and args[0] in self.data:
+                return None
+            expiry = float(args[3 + options.index('EXAT')]) if 'EXAT' in options else None
+            if 'KEEPTTL' in options:
+                expiry = self.data.get(args[0], (None, None))[1]
+            self.data[args[0]] = args[1], expiry
+            return 'OK'
+        if name == 'GET':
+            return self.data.get(args[0], (None, ))[0]
+        if name == 'MGET':
+            return [self.data.get(key, (None, ))[0] for key in args]
+        if name == 'DEL':
+            return int(self.data.pop(args[0], None) is not None)
+        return 'OK'
+
+
+def _acquire(server, keys, argv):
+    remaining = server.run(('GET', keys[0]))
+    if remaining is None or server.run(('TTL', keys[0])) < 0:
+        return 1
+    if int(remaining) <= 0:
+        return 0
+    server.run(('DECR', keys[0]))
+    return 1
+
+
+def _release(server, keys, argv):
+    if server.run(('TTL', keys[0])) > 0:
+        server.run(('INCR', keys[0]))
+    return 0
+
+
+def _update(server, keys, argv):
+    current = server.run(('GET', keys[0]))
+    if current is None or server.run(('TTL', keys[0])) < 0:
+        server.run(('SET', keys[0], argv[0], 'EXAT', argv[2]))
+    elif int(argv[0]) < int(current):
+        server.run(('SET', keys[0], argv[0], 'KEEPTTL'))
+    server.run(('SET', keys[1], '{}:{}'.format(argv[1], argv[2]), 'EXAT', argv[2]))
+    return 0
+
+
+RedisStandIn.scripts = {pypo.limiter._ACQUIRE: _acquire, pypo.limiter._RELEASE: _release,
+                        pypo.limiter._UPDATE: _update}
+
+
+class RedisStandInHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        queued = None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                command.append(self.rfile.read(length + 2)[:-2].decode('utf-8'))
+            name = command[0].upper()
+            with self.server.lock:
+                if name == 'MULTI':
+                    queued, reply = [], 'OK'
+                elif name == 'EXEC':
+                    queued, reply = None, [self.server.run(c) for c in queued]
+                elif queued is not None:
+                    queued.append(command)
+                    reply = 'QUEUED'
+                else:
+                    reply = self.server.run(command)
+                if self.server.lost_replies:
+                    self.server.lost_replies -= 1
+                    return
+            self.wfile.write(self.encode(reply))
+
+    def encode(self, reply):
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, int):
+            return ':{}\r\n'.format(reply).encode('ascii')
+        if isinstance(reply, list):
+            return '*{}\r\n'.format(len(reply)).encode('ascii') + b''.join(self.encode(r) for r in reply)
+        if reply in ('OK', 'QUEUED'):
+            return '+{}\r\n'.format(reply).encode('ascii')
+        return '${}\r\n{}\r\n'.format(len(reply), reply).encode('utf-8')
+
+
+class TestLimiter(unittest.TestCase):
+    def setUp(self):
+        self.reset = int(time.time()) + 3600
+
+    def assertShared(self, first, second):
+        self.assertTrue(first.acquire(app_key))  # unknown budget
+        first.update(app_key, 7500, 2, self.reset)
+        second.update(app_key, 7500, 5, self.reset)  # an older response: the budget is only ever lowered
+        self.assertTrue(first.acquire(app_key))
+        self.assertTrue(second.acquire(app_key))
+        self.assertFalse(first.acquire(app_key))
+        self.assertFalse(second.acquire(app_key))
+        first.release(app_key)
+        self.assertTrue(second.acquire(app_key))
+        state = second.state(app_key)
+        self.assertEqual((state.limit, state.remaining, state.reset), (7500, 0, self.reset))
+        self.assertIsNone(first.state('other token').remaining)
+
+    def test_sqlite(self):
+        path = os.path.join(tempfile.mkdtemp(), 'budgets.db')
+        with pypo.limiter.SQLiteLimiter(path) as first, pypo.limiter.SQLiteLimiter(path) as second:
+            self.assertShared(first, second)
+            first.update('other token', 7500, 0, int(time.time()) - 1)  # a period already over
+            self.assertTrue(second.acquire('other token'))
+
+    def test_redis(self):
+        server = RedisStandIn()
+        try:
+            port = server.server_address[1]
+            with pypo.limiter.RedisLimiter(port=port) as first, pypo.limiter.RedisLimiter(port=port) as second:
+                self.assertShared(first, second)
+                first.close()  # reconnects
+                self.assertFalse(first.acquire(app_key))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_redis_reply_lost(self):
+        server = RedisStandIn()
+        try:
+            with pypo.limiter.RedisLimiter(port=server.server_address[1]) as limiter:
+                limiter.update(app_key, 7500, 5, self.reset)
+                server.lost_replies = 1
+                with self.assertRaises(EOFError):
+                    limiter.acquire(app_key)
+                self.assertEqual(limiter.state(app_key).remaining, 4)  # drawn once, not sent again
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_registry(self):
+        path = os.path.join(tempfile.mkdtemp(), 'budgets.db')
+        with pypo.loadtest.StandInServer(limit=3) as server:
+            first = pypo.registry.AppRegistry(transport=server.transport(pool_size=1),
+                                              limiter=pypo.limiter.SQLiteLimiter(path))
+            second = pypo.registry.AppRegistry(transport=server.transport(pool_size=1),
+                                               limiter=pypo.limiter.SQLiteLimiter(path))
+            for registry in (first, second, first):
+                registry.message_manager(app_key, user_key).push_message('shared')
+            with self.assertRaises(pypo.PushoverError):
+                second.message_manager(app_key, user_key).push_message('over the limit')
+            self.assertEqual(server.requests, 3)
+            pypo.groups.info(app_key, group_key, registry=second)  # not a message
+            first.close()
+            second.close()
+
+    def test_release_unsent(self):
+        limiter = pypo.limiter.SQLiteLimiter(':memory:')
+        limiter.update(app_key, 7500, 5, self.reset)
+        transport = mock.Mock()
+        transport.request.side_effect = RuntimeError('unsent')
+        registry = pypo.registry.AppRegistry(transport=transport, limiter=limiter)
+        with self.assertRaises(RuntimeError):
+            pypo.message.push_message(app_key, user_key, 'unsent', registry=registry)
+        self.assertEqual(limiter.state(app_key).remaining, 5)
+        registry.close()
+
+    def test_release_queued(self):
+        limiter = pypo.limiter.SQLiteLimiter(':memory:')
+        limiter.update(app_key, 7500, 5, self.reset)
+        fallback = pypo.breaker.QueueFallback()
+        breakers = pypo.breaker.BreakerRegistry(min_requests=1, fallback=fallback)
+        breakers.get(pypo.base_url, app_key).record(False)
+        registry = pypo.registry.AppRegistry(transport=mock.Mock(), limiter=limiter, breakers=breakers)
+        for _ in range(3):
+            self.assertTrue(registry.message_manager(app_key, user_key).push_message('queued')['queued'])
+        self.assertEqual(len(fallback), 3)
+        self.assertEqual(limiter.state(app_key).remaining, 5)
+        registry.close()
+
+    def test_unknown_reset(self):
+        limiter = mock.Mock(spec=pypo.limiter.Limiter)
+        registry = pypo.registry.AppRegistry(limiter=limiter)
+        registry.update_rate_limit(app_key, {'X-Limit-App-Limit': '7500', 'X-Limit-App-Remaining': '5'})
+        self.assertIsNone(registry.rate_limit(app_key).reset)
+        self.assertFalse(limiter.update.called)
+
+        registry.update_rate_limit(app_key, {'X-Limit-App-Remaining': '4', 'X-Limit-App-Reset': str(self.reset)})
+        limiter.update.assert_called_once_with(app_key, 7500, 4, self.reset)
+        registry.close()
+
+
+class TestDeadLetter(unittest.TestCase):
+    def setUp(self):
+        self.bad = 'b' * 30
+
+        def respond(request):
+            if request.params['user'] == self.bad:
+                body = {'user': 'invalid', 'errors': ['user identifier is invalid'], 'status': 0, 'request': 'r1'}
+            elif request.params.get('device') == 'old':
+                body = {'errors': ['device name is not valid for user'], 'status': 0, 'request': 'r2'}
+            elif request.params.get('title') == 'rejected':
+                body = {'errors': ['application token is invalid'], 'status': 0}
+            else:
+                return {'status': 1, 'request': 'sent'}
+            return pypo.PushoverResponse(json.dumps(body).encode('utf-8'), 400)
+
+        self.memory = pypo.transport.MemoryTransport(respond)
+        self.registry = pypo.registry.AppRegistry(transport=self.memory, blocklist=pypo.deadletter.Blocklist(),
+                                                  dead_letters=pypo.deadletter.DeadLetterStore())
+        self.pm = self.registry.message_manager(app_key)
+
+    def tearDown(self):
+        self.registry.close()
+
+    def test_invalid_user(self):
+        for _ in range(3):
+            with self.assertRaises(pypo.PushoverError):
+                self.pm.push_message('blocked', user=self.bad)
+        self.assertEqual(len(self.memory.requests), 1)
+        self.assertIn(self.bad, self.registry.blocklist)
+
+        letters = self.registry.dead_letters.letters(user=self.bad)
+        self.assertEqual([letter.error for letter in letters], ['PushoverError'])  # not the local refusals
+        self.assertEqual(letters[0].errors, ['user identifier is invalid'])
+        self.assertEqual((letters[0].status_code, letters[0].request_id), (400, 'r1'))
+        self.assertEqual(letters[0].fields['message'], 'blocked')
+
+        self.registry.blocklist.remove(self.bad)
+        self.memory.response = lambda request: {'status': 1, 'request': 'resent'}
+        self.assertEqual(self.registry.dead_letters.resend(letters[0].id, registry=self.registry).request_id,
+                         'resent')
+        self.assertEqual(len(self.registry.dead_letters), 0)
+
+    def test_invalid_device(self):
+        with self.assertRaises(pypo.PushoverError):
+            self.pm.push_message('to an old device', user=user_key, device='old')
+        with self.assertRaises(pypo.BlockedRecipientError):
+            self.pm.push_message('to an old device', user=user_key, device='old')
+        self.pm.push_message('to every device', user=user_key)
+        self.assertEqual(len(self.memory.requests), 2)
+
+    def test_other_errors(self):
+        for _ in range(2):
+            with self.assertRaises(pypo.PushoverError):
+                self.pm.push_message('refused', user=user_key, title='rejected')
+        self.assertEqual(len(self.memory.requests), 2)
+        self.assertEqual(len(self.registry.blocklist), 0)
+        self.assertEqual(len(self.registry.dead_letters), 2)
+        self.assertEqual(len(self.registry.dead_letters.letters(user=user_key, limit=1)), 1)
+        self.assertEqual(self.registry.dead_letters.letters(user=self.bad), [])
+
+    def test_blocklist_bounds(self):
+        blocklist = pypo.deadletter.Blocklist(ttl=60, capacity=2)
+        for user in ('a', 'b', 'c'):
+            blocklist.add(user, reason='invalid')
+        blocklist.add('d', ttl=-1)
+        self.assertEqual([entry[0] for entry in blocklist.entries()], ['c'])
+        self.assertEqual(blocklist.blocked('c', device='phone'), 'invalid')
+        self.assertIsNone(blocklist.blocked('d'))
+
+
 class TestBasic(unittest.TestCase):
     def test_inv_app_token(self):
         inv_pm = pypo.message.MessageManager(group_key, user_key)